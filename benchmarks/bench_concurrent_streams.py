@@ -0,0 +1,174 @@
+"""
+Concurrency check / benchmark of the Responses API -> `GenericStreamingChunk`
+translation.
+
+Runs many Responses API streams concurrently (every stream yields to the event
+loop after every event, so the events of all the streams are interleaved the
+way they are when the proxy serves several Claude Code sessions at once) and
+checks that every stream emits exactly its own tool call - with the right
+name, id and arguments. Reports the translation throughput.
+
+That check alone would pass with a translation state shared by all the
+streams as well (every tool call also comes with an `output_item.done` and in
+`response.completed`, which make up for a lost tool call), so it is preceded
+by a regression check of the per-stream state: two streams whose tool calls
+only finish at `response.function_call_arguments.done`, translated in
+lockstep.
+
+Usage:
+    uv run python -m benchmarks.bench_concurrent_streams --streams 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import time
+
+os.environ["WRITE_TRACES_TO_FILES"] = "false"
+
+# pylint: disable=wrong-import-position
+from benchmarks.fixtures import make_responses_events, to_litellm_events
+from common.utils import StreamTranslator
+
+
+def _make_stream(stream_idx: int, text_words: int) -> tuple[list, dict]:
+    rng = random.Random(stream_idx)
+    name = f"tool_{stream_idx}"
+    arguments = {"stream": stream_idx, "file_path": f"/repo/src/module_{stream_idx}.py", "n": rng.randint(0, 10**6)}
+    response_id = f"resp_{stream_idx}"
+    events = to_litellm_events(
+        make_responses_events(
+            text_words=text_words, tool_calls=[(name, arguments)], seed=stream_idx, response_id=response_id
+        )
+    )
+    expected = {"name": name, "id": f"fc_{response_id}_0", "arguments": arguments}
+    return events, expected
+
+
+def _make_done_only_stream(stream_idx: int) -> tuple[list, dict]:
+    """
+    A stream whose tool call is only finished by `response.function_call_arguments.done`
+    (no `output_item.done` for it, and no tool calls in `response.completed`).
+    """
+    name = f"done_only_tool_{stream_idx}"
+    arguments = {"stream": stream_idx, "file_path": f"/repo/src/done_only_{stream_idx}.py"}
+    response_id = f"resp_done_only_{stream_idx}"
+    events = []
+    for event in make_responses_events(
+        text_words=3, tool_calls=[(name, arguments)], seed=stream_idx, response_id=response_id
+    ):
+        if event["type"] == "response.output_item.done" and event["item"]["type"] == "function_call":
+            continue
+        if event["type"] == "response.completed":
+            output = [item for item in event["response"]["output"] if item["type"] != "function_call"]
+            event = {**event, "response": {**event["response"], "output": output}}
+        events.append(event)
+    expected = {"name": name, "id": f"fc_{response_id}_0", "arguments": arguments}
+    return to_litellm_events(events), expected
+
+
+def _check_interleaved_done_only_streams(stream_tool_arguments: bool) -> bool:
+    """Translate two done-only streams event by event in turn - each must emit its own tool call."""
+    streams = [_make_done_only_stream(idx) for idx in range(2)]
+    translators = [StreamTranslator(stream_tool_arguments=stream_tool_arguments) for _ in streams]
+    tool_uses: list[list[dict]] = [[] for _ in streams]
+    for step in itertools.zip_longest(*(events for events, _ in streams)):
+        for idx, event in enumerate(step):
+            if event is None:
+                continue
+            generic_chunk = translators[idx].to_generic_streaming_chunk(event)
+            if generic_chunk["tool_use"]:
+                _collect_tool_use(tool_uses[idx], generic_chunk["tool_use"])
+    for idx, translator in enumerate(translators):
+        eof_chunk = translator.eof_finalize_chunk()
+        if eof_chunk and eof_chunk["tool_use"]:
+            _collect_tool_use(tool_uses[idx], eof_chunk["tool_use"])
+    return all(_check(stream_tool_uses, expected) for stream_tool_uses, (_, expected) in zip(tool_uses, streams))
+
+
+def _collect_tool_use(tool_uses: list[dict], tool_use: dict) -> None:
+    # Reassemble the tool calls the way the client does: a tool_use with a name starts a new tool call, the rest
+    # are continuations (argument deltas) of the last one
+    if tool_use["function"]["name"] or not tool_uses:
+        tool_uses.append({**tool_use, "function": dict(tool_use["function"])})
+    else:
+        tool_uses[-1]["function"]["arguments"] += tool_use["function"]["arguments"]
+
+
+async def _consume(events: list, stream_tool_arguments: bool) -> list[dict]:
+    # Mirrors `ClaudeCodeRouter.astreaming()`: one translator per stream
+    translator = StreamTranslator(stream_tool_arguments=stream_tool_arguments)
+    tool_uses: list[dict] = []
+    for event in events:
+        generic_chunk = translator.to_generic_streaming_chunk(event)
+        if generic_chunk["tool_use"]:
+            _collect_tool_use(tool_uses, generic_chunk["tool_use"])
+        await asyncio.sleep(0)
+    eof_chunk = translator.eof_finalize_chunk()
+    if eof_chunk and eof_chunk["tool_use"]:
+        _collect_tool_use(tool_uses, eof_chunk["tool_use"])
+    return tool_uses
+
+
+def _check(tool_uses: list[dict], expected: dict) -> bool:
+    if len(tool_uses) != 1:
+        return False
+    tool_use = tool_uses[0]
+    return (
+        tool_use["id"] == expected["id"]
+        and tool_use["function"]["name"] == expected["name"]
+        and json.loads(tool_use["function"]["arguments"]) == expected["arguments"]
+    )
+
+
+async def _run(streams: list[tuple[list, dict]], stream_tool_arguments: bool) -> tuple[float, int]:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_consume(events, stream_tool_arguments) for events, _ in streams))
+    elapsed = time.perf_counter() - start
+    failures = sum(not _check(tool_uses, expected) for tool_uses, (_, expected) in zip(results, streams))
+    return elapsed, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200, help="Number of concurrent streams")
+    parser.add_argument("--text-words", type=int, default=200, help="Text deltas per stream")
+    parser.add_argument(
+        "--stream-tool-arguments", action="store_true", help="Stream the tool call arguments (STREAM_TOOL_ARGUMENTS)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    streams = [_make_stream(idx, args.text_words) for idx in range(args.streams)]
+    num_events = sum(len(events) for events, _ in streams)
+
+    # The translator logs every tool call it sees - keep the output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        interleaved_ok = _check_interleaved_done_only_streams(args.stream_tool_arguments)
+        elapsed, failures = asyncio.run(_run(streams, args.stream_tool_arguments))
+
+    result = {
+        "interleaved_done_only": "ok" if interleaved_ok else "FAILED",
+        "streams": args.streams,
+        "events": num_events,
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(num_events / elapsed),
+        "failed_streams": failures,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>15}: {value}")
+
+    if failures or not interleaved_ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+End-to-end concurrency benchmark: how many concurrent Claude Code streams one
+proxy process can serve.
+
+Starts the proxy (`config.yaml` with `claude_code_router`, see
+`benchmarks/proxy_process.py`) pointed at a local mock upstream
+(`benchmarks/mock_upstream.py`) that streams synthetic responses with the
+given latency (`--latency`, until the first event) and token rate
+(`--token-rate`, per stream). Then, for every concurrency level, keeps that
+many Anthropic `/v1/messages` streaming clients busy (closed loop - every
+client starts its next stream as soon as the previous one is done) for
+`--duration` seconds, and reports per level:
+- throughput - `streams_per_s` and (streamed) `tokens_per_s`
+- the time to the first token the proxy adds to the upstream's
+  (`added_ttfb_ms`, p50/p95/p99 - see `replay_traces._match_upstream()`)
+- the CPU utilization of the proxy process (1.0 - one core)
+- its peak RSS during the level, and the RSS per stream (the growth over the
+  idle RSS, divided by the number of streams)
+
+The saturation point is the first level where the proxy runs out of CPU
+(`--saturation`) or the throughput stops scaling with the concurrency. The
+capacity is the highest level within the CPU limit whose added TTFB p95 is
+within `--max-added-ttfb-ms`.
+
+The clients and the mock run in this process - if its own CPU utilization
+(`harness_cpu`) gets close to 1.0, the harness is the bottleneck, not the
+proxy.
+
+Usage:
+    uv run python -m benchmarks.bench_e2e_concurrency --concurrency 1 4 16 64 --duration 30
+    uv run python -m benchmarks.bench_e2e_concurrency --token-rate 0 --latency 0  # the proxy overhead only
+    uv run python -m benchmarks.bench_e2e_concurrency --proxy-env ALWAYS_USE_RESPONSES_API=true --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+from benchmarks.fixtures import to_anthropic_request
+from benchmarks.mock_upstream import MockUpstream
+from benchmarks.proxy_process import ProxyProcess
+from benchmarks.recordings import Recording, synthetic_recording
+from benchmarks.replay_traces import _match_upstream, _percentiles
+from common.request_id import REQUEST_ID_HEADER
+
+# How often the RSS of the proxy is sampled during a level
+_RSS_SAMPLE_INTERVAL_S = 0.05
+# The throughput has stopped scaling if it grows by less than this share of
+# the concurrency growth (e.g. 4x the streams - at least 2.5x the throughput)
+_MIN_SCALING = 0.5
+_TOKEN_DATA = 'data: {"type": "content_block_delta"'
+
+
+@dataclass
+class StreamTiming:
+    """`time.perf_counter()` values of a `/v1/messages` stream."""
+
+    recording: str
+    fingerprint: Optional[str]
+    sent_at: float
+    first_byte_at: Optional[float] = None
+    first_token_at: Optional[float] = None
+    done_at: Optional[float] = None
+    tokens: int = 0
+    status: Optional[int] = None
+    request_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _is_token(data_line: str) -> bool:
+    """
+    Whether a `content_block_delta` has any content - the mock streams a word (a
+    token) per text or tool argument delta. (The lifecycle events of the
+    upstream stream come out as empty deltas.)
+    """
+    delta = json.loads(data_line[len("data: ") :]).get("delta") or {}
+    return bool(delta.get("text") or delta.get("partial_json") or delta.get("thinking"))
+
+
+async def _stream(client: httpx.AsyncClient, recording: Recording, body: dict, headers: dict) -> StreamTiming:
+    timing = StreamTiming(recording=recording.name, fingerprint=recording.fingerprint, sent_at=time.perf_counter())
+    try:
+        async with client.stream("POST", "/v1/messages", json=body, headers=headers) as response:
+            timing.status = response.status_code
+            timing.request_id = response.headers.get(REQUEST_ID_HEADER)
+            async for line in response.aiter_lines():
+                if timing.first_byte_at is None:
+                    timing.first_byte_at = time.perf_counter()
+                if line.startswith(_TOKEN_DATA) and _is_token(line):
+                    timing.tokens += 1
+                    if timing.first_token_at is None:
+                        timing.first_token_at = time.perf_counter()
+            if response.status_code != 200:
+                timing.error = f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        timing.error = repr(e)
+    timing.done_at = time.perf_counter()
+    return timing
+
+
+async def _run_level(
+    client: httpx.AsyncClient,
+    sessions: list[tuple[Recording, dict]],
+    *,
+    concurrency: int,
+    duration_s: float,
+    headers: dict[str, str],
+) -> tuple[list[StreamTiming], float]:
+    """Keep `concurrency` clients streaming for `duration_s`. Returns the timings and the elapsed time."""
+    started_at = time.perf_counter()
+    deadline = started_at + duration_s
+
+    async def _client(client_idx: int) -> list[StreamTiming]:
+        timings = []
+        stream_idx = client_idx
+        while time.perf_counter() < deadline:
+            recording, body = sessions[stream_idx % len(sessions)]
+            timings.append(await _stream(client, recording, body, headers))
+            stream_idx += concurrency
+        return timings
+
+    per_client = await asyncio.gather(*(_client(idx) for idx in range(concurrency)))
+    return [timing for timings in per_client for timing in timings], time.perf_counter() - started_at
+
+
+async def _sample_rss(proxy: ProxyProcess, samples: list[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = proxy.memory()["rss"]
+        if rss:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), _RSS_SAMPLE_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _level_report(
+    concurrency: int,
+    timings: list[StreamTiming],
+    mock: MockUpstream,
+    elapsed_s: float,
+    *,
+    proxy_cpu_s: Optional[float],
+    harness_cpu_s: float,
+    rss_samples: list[int],
+    idle_rss: Optional[int],
+) -> dict[str, Any]:
+    done = [timing for timing in timings if not timing.error]
+    matches = _match_upstream(timings, mock.timings)
+    client_ttfb, added_ttfb, stream_s = [], [], []
+    for idx, timing in enumerate(timings):
+        if timing.error:
+            continue
+        stream_s.append(timing.done_at - timing.sent_at)
+        if timing.first_token_at is None:
+            continue
+        client_ttfb.append((timing.first_token_at - timing.sent_at) * 1000)
+        upstream = matches.get(idx)
+        if upstream is not None and upstream.first_content_at is not None:
+            upstream_ttfb = upstream.first_content_at - upstream.received_at
+            added_ttfb.append((timing.first_token_at - timing.sent_at - upstream_ttfb) * 1000)
+
+    errors: dict[str, int] = {}
+    for timing in timings:
+        if timing.error:
+            errors[timing.error] = errors.get(timing.error, 0) + 1
+
+    report: dict[str, Any] = {
+        "concurrency": concurrency,
+        "streams": len(done),
+        "failed": len(timings) - len(done),
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 2),
+        "streams_per_s": round(len(done) / elapsed_s, 2),
+        "tokens_per_s": round(sum(timing.tokens for timing in done) / elapsed_s, 1),
+        "stream_s_mean": round(sum(stream_s) / len(stream_s), 2) if stream_s else None,
+        "ttfb_ms": _percentiles(client_ttfb),
+        "added_ttfb_ms": _percentiles(added_ttfb),
+        "matched_upstream": len(matches),
+        "proxy_cpu": round(proxy_cpu_s / elapsed_s, 3) if proxy_cpu_s is not None else None,
+        "harness_cpu": round(harness_cpu_s / elapsed_s, 3),
+        "peak_rss_mb": None,
+        "rss_per_stream_kb": None,
+    }
+    if rss_samples:
+        peak_rss = max(rss_samples)
+        report["peak_rss_mb"] = round(peak_rss / 2**20, 1)
+        if idle_rss:
+            report["rss_per_stream_kb"] = round(max(0, peak_rss - idle_rss) / 1024 / concurrency, 1)
+    return report
+
+
+def _saturation(levels: list[dict[str, Any]], args: argparse.Namespace) -> dict[str, Any]:
+    saturated_at = None
+    for prev, level in zip([None] + levels, levels):
+        if level["proxy_cpu"] is not None and level["proxy_cpu"] >= args.saturation:
+            saturated_at = {"concurrency": level["concurrency"], "reason": "cpu"}
+            break
+        if prev and level["streams_per_s"] / prev["streams_per_s"] - 1 < _MIN_SCALING * (
+            level["concurrency"] / prev["concurrency"] - 1
+        ):
+            saturated_at = {"concurrency": level["concurrency"], "reason": "throughput"}
+            break
+
+    capacity = None
+    for level in levels:
+        added_ttfb_p95 = level["added_ttfb_ms"]["p95"]
+        within_cpu = level["proxy_cpu"] is None or level["proxy_cpu"] < args.saturation
+        if level["failed"] or not within_cpu or added_ttfb_p95 is None or added_ttfb_p95 > args.max_added_ttfb_ms:
+            break
+        capacity = level["concurrency"]
+    return {"saturation_point": saturated_at, "capacity": capacity}
+
+
+async def _run(args: argparse.Namespace) -> dict[str, Any]:
+    # A word per event - the token rate is the event rate
+    recordings = [
+        synthetic_recording(
+            seed,
+            turns=args.turns,
+            text_words=args.tokens,
+            tool_calls=args.tool_calls,
+            first_event_delay_s=args.latency,
+            event_interval_s=1 / args.token_rate if args.token_rate > 0 else 0.0,
+        )
+        for seed in range(args.sessions)
+    ]
+    sessions = [(recording, to_anthropic_request(recording.request)) for recording in recordings]
+    mock = MockUpstream(recordings)
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    max_concurrency = max(args.concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    timeout = httpx.Timeout(600.0, connect=10.0)
+
+    levels = []
+    async with mock.serving() as mock_url:
+        proxy_env = {
+            "OPENAI_REQUEST": "api",
+            "CLAUDE_CODE_PROXY_OPENAI_API_BASE": f"{mock_url}/v1",
+            "OPENAI_API_KEY": "mock",
+            "WRITE_TRACES_TO_FILES": "false",
+            **dict(env.split("=", 1) for env in args.proxy_env),
+        }
+        proxy = ProxyProcess(env=proxy_env, config=args.config, port=args.port)
+        await asyncio.to_thread(proxy.start)
+        try:
+            async with httpx.AsyncClient(base_url=proxy.base_url, limits=limits, timeout=timeout) as client:
+                # Not measured: warms up the imports, caches and connections
+                await asyncio.gather(*(_stream(client, *sessions[idx % len(sessions)], headers) for idx in range(4)))
+                idle_rss = proxy.memory()["rss"]
+
+                for concurrency in args.concurrency:
+                    mock.timings.clear()
+                    rss_samples: list[int] = []
+                    stop = asyncio.Event()
+                    sampler = asyncio.create_task(_sample_rss(proxy, rss_samples, stop))
+                    cpu_before, harness_cpu_before = proxy.cpu_s(), time.process_time()
+
+                    timings, elapsed_s = await _run_level(
+                        client, sessions, concurrency=concurrency, duration_s=args.duration, headers=headers
+                    )
+
+                    cpu_after, harness_cpu_after = proxy.cpu_s(), time.process_time()
+                    stop.set()
+                    await sampler
+                    level = _level_report(
+                        concurrency,
+                        timings,
+                        mock,
+                        elapsed_s,
+                        proxy_cpu_s=cpu_after - cpu_before if cpu_before is not None and cpu_after else None,
+                        harness_cpu_s=harness_cpu_after - harness_cpu_before,
+                        rss_samples=rss_samples,
+                        idle_rss=idle_rss,
+                    )
+                    levels.append(level)
+                    if not args.json:
+                        print(
+                            f"concurrency {concurrency:>4}: {level['streams_per_s']:>7} streams/s "
+                            f"{level['tokens_per_s']:>9} tokens/s, added TTFB p95 {level['added_ttfb_ms']['p95']} ms, "
+                            f"proxy CPU {level['proxy_cpu']}, failed {level['failed']}",
+                            flush=True,
+                        )
+        finally:
+            await asyncio.to_thread(proxy.stop)
+
+    return {
+        "upstream": {
+            "latency_s": args.latency,
+            "token_rate": args.token_rate,
+            "tokens": args.tokens,
+            "tool_calls": args.tool_calls,
+            "turns": args.turns,
+        },
+        "idle_rss_mb": round(idle_rss / 2**20, 1) if idle_rss else None,
+        "levels": levels,
+        **_saturation(levels, args),
+        "mock_upstream": mock.stats(),
+        "proxy_log": str(proxy.log_path),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64], help="Concurrency levels"
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    parser.add_argument("--latency", type=float, default=1.0, help="Upstream seconds until the first event")
+    parser.add_argument("--token-rate", type=float, default=60.0, help="Upstream tokens per second (0 - no limit)")
+    parser.add_argument("--tokens", type=int, default=300, help="Text tokens per response")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Tool calls per response")
+    parser.add_argument("--turns", type=int, default=20, help="Conversation length of every request")
+    parser.add_argument("--sessions", type=int, default=16, help="Distinct conversations to cycle through")
+    parser.add_argument("--saturation", type=float, default=0.85, help="Proxy CPU utilization deemed saturated")
+    parser.add_argument("--max-added-ttfb-ms", type=float, default=100.0, help="Added TTFB p95 for the capacity")
+    parser.add_argument("--proxy-env", action="append", default=[], help="KEY=VALUE for the started proxy")
+    parser.add_argument("--config", type=Path, default=Path("config.yaml"), help="Config of the started proxy")
+    parser.add_argument("--port", type=int, help="Port of the started proxy (default: a free one)")
+    parser.add_argument("--api-key", default=os.getenv("LITELLM_MASTER_KEY"), help="Key for the proxy, if needed")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    result = asyncio.run(_run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print()
+    for key, value in result.items():
+        if key != "levels":
+            print(f"{key:>20}: {json.dumps(value) if isinstance(value, dict) else value}")
+    print(
+        f"\n{'conc':>5} {'streams/s':>10} {'tokens/s':>10} {'TTFB p50':>9} {'added p50':>10} {'added p95':>10} "
+        f"{'proxy CPU':>10} {'harness':>8} {'RSS MB':>8} {'KB/stream':>10} {'failed':>7}"
+    )
+    for level in result["levels"]:
+        print(
+            f"{level['concurrency']:>5} {level['streams_per_s']:>10} {level['tokens_per_s']:>10} "
+            f"{level['ttfb_ms']['p50']!s:>9} {level['added_ttfb_ms']['p50']!s:>10} "
+            f"{level['added_ttfb_ms']['p95']!s:>10} {level['proxy_cpu']!s:>10} {level['harness_cpu']:>8} "
+            f"{level['peak_rss_mb']!s:>8} {level['rss_per_stream_kb']!s:>10} {level['failed']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
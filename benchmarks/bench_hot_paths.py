@@ -0,0 +1,323 @@
+"""
+Micro-benchmark suite of the per-request hot paths of the proxy:
+
+- `convert_chat_messages_to_respapi()` - a whole conversation (`cold`, the
+  conversion cache is empty) and the next turn of it (`next_turn`, the
+  previous turn is cached and only the new messages are converted)
+- `convert_chat_params_to_respapi()` - with 25 tool schemas, `cold` and with
+  the tools cached (`warm`)
+- `StreamTranslator.to_generic_streaming_chunk()` - per event of Responses API
+  streams (synthetic ones, or the ones recorded in `--traces`)
+- `convert_respapi_to_model_response()` - the final responses of those streams
+- `RoutedRequest()` - the whole request preparation, `cold` and `next_turn`
+
+The conversations are Claude Code sessions of 10, 100 and 500 turns (see
+`benchmarks/fixtures.py`) with images and long tool results.
+
+Every case reports the min / median / mean / p95 wall time per operation.
+The median is what `--baseline` compares against: with `--baseline
+previous.json` the run fails (exit code 1) if any case got slower than
+`--max-regression` allows - e.g. in CI, with the results of the main branch
+as the baseline.
+
+Usage:
+    uv run python -m benchmarks.bench_hot_paths --output results.json
+    uv run python -m benchmarks.bench_hot_paths --turns 10 100 --only messages --json
+    uv run python -m benchmarks.bench_hot_paths --traces .traces/ --only stream
+    uv run python -m benchmarks.bench_hot_paths --baseline results.json --max-regression 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+os.environ.setdefault("ALWAYS_USE_RESPONSES_API", "true")
+os.environ["WRITE_TRACES_TO_FILES"] = "false"
+
+# pylint: disable=wrong-import-position
+from benchmarks.fixtures import make_conversation, make_params, payload_size, to_litellm_events
+from benchmarks.recordings import RESPONSES, as_responses_recording, load_recordings, synthetic_recording
+from claude_code_proxy.claude_code_router import RoutedRequest
+from common.utils import (
+    RESPAPI_MESSAGES_CACHE,
+    RESPAPI_TOOLS_CACHE,
+    StreamTranslator,
+    convert_chat_messages_to_respapi,
+    convert_chat_params_to_respapi,
+    convert_respapi_to_model_response,
+)
+
+REPO_ROOT = Path(__file__).parent.parent
+
+DEFAULT_TURNS = (10, 100, 500)
+# Every n-th user message carries an image
+IMAGE_EVERY = 5
+# Words per tool result (~4.5 KB - file contents, command output)
+TOOL_RESULT_WORDS = 700
+SYNTHETIC_STREAMS = 5
+
+
+@dataclass
+class Case:
+    name: str
+    # One timed sample (it may do more than one operation - see `ops_per_sample`)
+    op: Callable[[], Any]
+    # Runs (untimed) before every sample
+    setup: Optional[Callable[[], Any]] = None
+    ops_per_sample: int = 1
+    # What one operation processes (e.g. the size of the conversation)
+    info: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class CaseResult:
+    name: str
+    # Operations timed
+    ops: int
+    min_us: float
+    median_us: float
+    mean_us: float
+    p95_us: float
+    info: dict[str, Any]
+
+
+def _clear_caches() -> None:
+    RESPAPI_MESSAGES_CACHE.clear()
+    RESPAPI_TOOLS_CACHE.clear()
+
+
+def _time_case(case: Case, *, min_time_s: float, min_ops: int) -> CaseResult:
+    """Time the case until both `min_ops` operations and `min_time_s` seconds are reached."""
+    # Warm up (imports, lazily built tables, etc.)
+    if case.setup:
+        case.setup()
+    case.op()
+
+    samples_ns: list[float] = []
+    spent_ns = 0
+    clock = time.perf_counter_ns
+    while len(samples_ns) * case.ops_per_sample < min_ops or spent_ns < min_time_s * 1e9:
+        if case.setup:
+            case.setup()
+        start = clock()
+        case.op()
+        elapsed = clock() - start
+        spent_ns += elapsed
+        samples_ns.append(elapsed / case.ops_per_sample)
+
+    samples_us = sorted(sample / 1000 for sample in samples_ns)
+    return CaseResult(
+        name=case.name,
+        ops=len(samples_ns) * case.ops_per_sample,
+        min_us=round(samples_us[0], 3),
+        median_us=round(statistics.median(samples_us), 3),
+        mean_us=round(statistics.fmean(samples_us), 3),
+        p95_us=round(samples_us[min(len(samples_us) - 1, int(len(samples_us) * 0.95))], 3),
+        info=case.info,
+    )
+
+
+def _routed_request(messages: list, params: dict) -> RoutedRequest:
+    return RoutedRequest(
+        calling_method="astreaming",
+        model="claude-sonnet-4-5-20250929",
+        messages_original=messages,
+        params_original=params,
+        stream=True,
+    )
+
+
+def _params_cases(params: dict[str, Any]) -> Iterator[Case]:
+    info = {"tools": len(params["tools"]), "payload_kb": round(payload_size(params) / 1024, 1)}
+    yield Case("params/cold", lambda: convert_chat_params_to_respapi(params), setup=_clear_caches, info=info)
+    yield Case("params/warm", lambda: convert_chat_params_to_respapi(params), info=info)
+
+
+def _load_streams(traces: list[Path]) -> list[list[Any]]:
+    """The (parsed) Responses API streams to translate."""
+    if traces:
+        recordings = [as_responses_recording(rec) for rec in load_recordings(traces)]
+    else:
+        recordings = [synthetic_recording(seed, tool_calls=seed % 3) for seed in range(SYNTHETIC_STREAMS)]
+    return [
+        to_litellm_events([event for _, event in recording.events])
+        for recording in recordings
+        if recording.api == RESPONSES and recording.events
+    ]
+
+
+def _stream_cases(streams: list[list[Any]], source: str) -> Iterator[Case]:
+    num_events = sum(len(stream) for stream in streams)
+    final_responses = [stream[-1].response for stream in streams if getattr(stream[-1], "response", None) is not None]
+    info = {"source": source, "streams": len(streams), "events": num_events}
+
+    def _translate_streams() -> None:
+        # The streams are translated as a whole (the translator keeps state), the time is per event
+        for stream in streams:
+            convert = StreamTranslator().to_generic_streaming_chunk
+            for event in stream:
+                convert(event)
+
+    def _convert_responses() -> None:
+        for response in final_responses:
+            convert_respapi_to_model_response(response)
+
+    if num_events:
+        yield Case("stream/per_event", _translate_streams, ops_per_sample=num_events, info=info)
+    if final_responses:
+        yield Case(
+            "model_response",
+            _convert_responses,
+            ops_per_sample=len(final_responses),
+            info={"source": source, "responses": len(final_responses)},
+        )
+
+
+def _conversation_cases(turns: int, params: dict[str, Any]) -> Iterator[Case]:
+    messages = make_conversation(turns, image_every=IMAGE_EVERY, tool_result_words=TOOL_RESULT_WORDS, seed=turns)
+    # The previous turn of the same session (the last assistant message and
+    # its tool result are new)
+    previous_turn = messages[:-2]
+    info = {"turns": turns, "messages": len(messages), "payload_kb": round(payload_size(messages) / 1024, 1)}
+
+    def _cache_previous_turn() -> None:
+        _clear_caches()
+        convert_chat_messages_to_respapi(previous_turn)
+
+    def _cache_previous_routed_request() -> None:
+        _clear_caches()
+        _routed_request(previous_turn, params)
+
+    def _convert() -> None:
+        convert_chat_messages_to_respapi(messages)
+
+    def _route() -> None:
+        _routed_request(messages, params)
+
+    yield Case(f"messages/cold/{turns}", _convert, setup=_clear_caches, info=info)
+    yield Case(f"messages/next_turn/{turns}", _convert, setup=_cache_previous_turn, info=info)
+    yield Case(f"routed_request/cold/{turns}", _route, setup=_clear_caches, info=info)
+    yield Case(f"routed_request/next_turn/{turns}", _route, setup=_cache_previous_routed_request, info=info)
+
+
+def _all_cases(args: argparse.Namespace) -> Iterator[Case]:
+    # The fixtures are only built for the groups that are run
+    params = make_params()
+    if _selected(args, "params"):
+        yield from _params_cases(params)
+    if _selected(args, "stream", "model_response"):
+        yield from _stream_cases(_load_streams(args.traces), "traces" if args.traces else "synthetic")
+    for turns in args.turns:
+        if _selected(args, "messages", "routed_request"):
+            yield from _conversation_cases(turns, params)
+
+
+def _selected(args: argparse.Namespace, *names: str) -> bool:
+    return not args.only or any(pattern in name for pattern in args.only for name in names)
+
+
+def _meta() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "litellm": version("litellm"),
+        "platform": platform.platform(),
+        "unit": "us/op",
+    }
+
+
+def _compare(results: list[CaseResult], baseline_path: Path, max_regression: float) -> list[dict[str, Any]]:
+    """The cases whose median got slower than in the baseline by more than `max_regression` (a fraction)."""
+    baseline = {case["name"]: case for case in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base or not base["median_us"]:
+            continue
+        change = result.median_us / base["median_us"] - 1
+        if change > max_regression:
+            regressions.append(
+                {
+                    "name": result.name,
+                    "baseline_median_us": base["median_us"],
+                    "median_us": result.median_us,
+                    "change": round(change, 3),
+                }
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=list(DEFAULT_TURNS), help="Conversation lengths")
+    parser.add_argument("--traces", type=Path, nargs="*", default=[], help="Take the streams from these traces")
+    parser.add_argument("--only", nargs="*", default=[], help="Run only the cases whose name contains any of these")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum time spent per case (seconds)")
+    parser.add_argument("--min-ops", type=int, default=5, help="Minimum operations per case")
+    parser.add_argument("--output", type=Path, help="Write the results (JSON) into this file")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    parser.add_argument("--baseline", type=Path, help="Compare with the results (JSON) of a previous run")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="The slowdown (of the median) --baseline tolerates"
+    )
+    args = parser.parse_args()
+
+    results: list[CaseResult] = []
+    for case in _all_cases(args):
+        if not _selected(args, case.name):
+            continue
+        # ModelRoute prints the route and the translator logs tool calls - keep the output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = _time_case(case, min_time_s=args.min_time, min_ops=args.min_ops)
+        results.append(result)
+        if not args.json:
+            print(f"{result.name:<34} {result.median_us:>12.1f} us", file=sys.stderr)
+
+    report: dict[str, Any] = {"meta": _meta(), "results": [asdict(result) for result in results]}
+    regressions = None
+    if args.baseline:
+        regressions = report["regressions"] = _compare(results, args.baseline, args.max_regression)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\n{'case':<34} {'ops':>7} {'min us':>12} {'median us':>12} {'mean us':>12} {'p95 us':>12}")
+        for result in results:
+            print(
+                f"{result.name:<34} {result.ops:>7} {result.min_us:>12.1f} {result.median_us:>12.1f} "
+                f"{result.mean_us:>12.1f} {result.p95_us:>12.1f}"
+            )
+        if regressions is not None:
+            print(f"\n{len(regressions)} regression(s) over {args.max_regression:.0%} against {args.baseline}")
+            for regression in regressions:
+                print(
+                    f"  {regression['name']}: {regression['baseline_median_us']} -> "
+                    f"{regression['median_us']} us ({regression['change']:+.0%})"
+                )
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Memory / CPU benchmark of `RoutedRequest` construction over a growing session.
+
+Simulates a Claude Code session where the whole (growing) conversation is
+resent on every turn and reports, per turn, the CPU time it takes to build a
+`RoutedRequest` (which includes the ChatCompletions -> Responses API
+conversion) and the peak of transient allocations it causes. As a reference,
+the cost of a full `deepcopy()` of the same messages and params (what every
+turn used to pay before the copy-on-write request model) is reported too.
+
+Usage:
+    uv run python -m benchmarks.bench_request_memory --turns 200 --step 20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import time
+import tracemalloc
+from copy import deepcopy
+
+os.environ.setdefault("ALWAYS_USE_RESPONSES_API", "true")
+os.environ["WRITE_TRACES_TO_FILES"] = "false"
+
+# pylint: disable=wrong-import-position
+from benchmarks.fixtures import make_conversation, make_params, payload_size
+from claude_code_proxy.claude_code_router import RoutedRequest
+
+
+def _build_routed_request(messages: list, params: dict) -> RoutedRequest:
+    # ModelRoute prints the route on every request - keep the output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        return RoutedRequest(
+            calling_method="astreaming",
+            model="claude-sonnet-4-5-20250929",
+            messages_original=messages,
+            params_original=params,
+            stream=True,
+        )
+
+
+def _measure(fn, repeat: int) -> tuple[float, int]:
+    """Return (best CPU seconds, peak traced bytes) of `fn()` over `repeat` runs."""
+    best_cpu = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best_cpu = min(best_cpu, time.process_time() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best_cpu, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200, help="Length of the simulated session (in turns)")
+    parser.add_argument("--step", type=int, default=25, help="Report every n-th turn")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best CPU time is taken)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    params = make_params()
+
+    results = []
+    for turns in range(args.step, args.turns + 1, args.step):
+        messages = make_conversation(turns)
+
+        cow_cpu, cow_peak = _measure(lambda m=messages: _build_routed_request(m, params), args.repeat)
+        copy_cpu, copy_peak = _measure(lambda m=messages: (deepcopy(m), deepcopy(params)), args.repeat)
+
+        results.append(
+            {
+                "turns": turns,
+                "messages": len(messages),
+                "payload_kb": round(payload_size(messages) / 1024, 1),
+                "routed_request_ms": round(cow_cpu * 1000, 3),
+                "routed_request_peak_kb": round(cow_peak / 1024, 1),
+                "full_deepcopy_ms": round(copy_cpu * 1000, 3),
+                "full_deepcopy_peak_kb": round(copy_peak / 1024, 1),
+            }
+        )
+
+    # ru_maxrss is in kilobytes on Linux (and in bytes on macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.json:
+        print(json.dumps({"results": results, "max_rss": max_rss}, indent=2))
+        return
+
+    header = (
+        f"{'turns':>6} {'msgs':>6} {'payload KB':>11} {'RR ms':>9} {'RR peak KB':>11} "
+        f"{'deepcopy ms':>12} {'deepcopy peak KB':>17}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['turns']:>6} {r['messages']:>6} {r['payload_kb']:>11} {r['routed_request_ms']:>9} "
+            f"{r['routed_request_peak_kb']:>11} {r['full_deepcopy_ms']:>12} {r['full_deepcopy_peak_kb']:>17}"
+        )
+    print(f"\nmax RSS: {max_rss}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Token refresh stampede check.
+
+Starts a local stand-in for the OpenAI OAuth token endpoint (which, like the
+real one, rotates refresh tokens - reusing an old refresh token fails) and a
+stand-in API that answers 401 to everything but the latest access token. Then
+fires `--requests` concurrent requests with an expired token in each of
+`--processes` worker processes (all sharing one temporary .env file) and
+reports how many times the token endpoint was hit. With the single-flight
+refresh it must be hit exactly once (plus `--token-failures` retried
+attempts), and every request must succeed on its retry with the new token.
+
+Usage:
+    uv run python -m benchmarks.bench_token_refresh --requests 100 --processes 4
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog (5) can't take a burst of concurrent requests
+    request_queue_size = 1024
+
+
+def _make_jwt(generation: int) -> str:
+    def _b64(obj: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).decode("ascii").rstrip("=")
+
+    payload = {
+        "client_id": "app_bench",
+        "exp": int(time.time()) + 30 * 24 * 60 * 60,
+        "https://api.openai.com/auth": {"chatgpt_account_id": "acc_bench"},
+        "generation": generation,
+    }
+    return f"{_b64({'alg': 'none'})}.{_b64(payload)}.sig"
+
+
+class _StandInState:
+    def __init__(self, latency_s: float, failures: int) -> None:
+        self.latency_s = latency_s
+        self.failures = failures
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.access_token = _make_jwt(0)
+        self.refresh_token = "rt_0"
+        self.token_requests = 0
+        self.rejected_refresh_tokens = 0
+
+
+def _make_handler(state: _StandInState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+            pass
+
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if self.path == "/oauth/token":
+                time.sleep(state.latency_s)
+                with state.lock:
+                    state.token_requests += 1
+                    if state.token_requests <= state.failures:
+                        self._reply(503, {"error": "temporarily_unavailable"})
+                        return
+                    if body.get("refresh_token") != state.refresh_token:
+                        state.rejected_refresh_tokens += 1
+                        self._reply(400, {"error": "invalid_grant"})
+                        return
+                    state.generation += 1
+                    state.access_token = _make_jwt(state.generation)
+                    state.refresh_token = f"rt_{state.generation}"
+                    self._reply(200, {"access_token": state.access_token, "refresh_token": state.refresh_token})
+                return
+
+            # The stand-in API
+            with state.lock:
+                valid = self.headers.get("Authorization") == f"Bearer {state.access_token}"
+            self._reply(200 if valid else 401, {"ok": valid})
+
+    return Handler
+
+
+async def _simulate_request(client, api_url: str, env_path: Path) -> bool:
+    # pylint: disable=import-outside-toplevel
+    from common.refresh import on_auth_error_async
+
+    for attempt in range(2):
+        token = os.environ["OPENAI_API_KEY_SUBSCRIPTION"]
+        response = await client.post(api_url, json={}, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code == 200:
+            return True
+        if attempt == 0 and response.status_code == 401:
+            await on_auth_error_async(env_path, failed_token=token)
+    return False
+
+
+def _worker(base_url: str, env_path: str, num_requests: int, results) -> None:
+    import httpx  # pylint: disable=import-outside-toplevel
+
+    async def _run() -> int:
+        async with httpx.AsyncClient(timeout=60) as client:
+            outcomes = await asyncio.gather(
+                *(_simulate_request(client, f"{base_url}/v1/responses", Path(env_path)) for _ in range(num_requests)),
+                return_exceptions=True,
+            )
+        return sum(1 for outcome in outcomes if outcome is True)
+
+    results.put(asyncio.run(_run()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Concurrent requests per process")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes sharing the .env file")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Latency of the stand-in token endpoint")
+    parser.add_argument(
+        "--token-failures", type=int, default=0, help="Answer the first n token requests with HTTP 503 (retries)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    state = _StandInState(args.latency_ms / 1000, args.token_failures)
+    server = _StandInServer(("127.0.0.1", 0), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env_path = Path(tmp_dir) / ".env"
+        initial = {
+            # An access token the stand-in API no longer accepts
+            "OPENAI_API_KEY_SUBSCRIPTION": _make_jwt(-1),
+            "OPENAI_ACCOUNT_ID": "acc_bench",
+            "OPENAI_REFRESH_KEY_SUBSCRIPTION": state.refresh_token,
+            "OPENAI_CLIENT_ID_SUBSCRIPTION": "app_bench",
+            "OPENAI_SUBSCRIPTION_EXPIRES_AT": str(int(time.time()) + 30 * 24 * 60 * 60),
+        }
+        env_path.write_text("".join(f"{key}={value}\n" for key, value in initial.items()), encoding="utf-8")
+        os.environ.update(initial)
+        os.environ["OPENAI_TOKEN_URL"] = f"{base_url}/oauth/token"
+
+        start = time.perf_counter()
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_worker, args=(base_url, str(env_path), args.requests, results))
+            for _ in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        succeeded = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+    server.shutdown()
+
+    result = {
+        "requests": args.requests * args.processes,
+        "processes": args.processes,
+        "succeeded": succeeded,
+        "token_requests": state.token_requests,
+        "rejected_refresh_tokens": state.rejected_refresh_tokens,
+        "elapsed_s": round(elapsed, 3),
+    }
+    ok = succeeded == result["requests"] and state.token_requests == 1 + args.token_failures
+
+    if args.json:
+        print(json.dumps({**result, "ok": ok}, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>24}: {value}")
+        print(f"{'result':>24}: {'OK' if ok else 'FAILED'}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
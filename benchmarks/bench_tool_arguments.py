@@ -0,0 +1,115 @@
+"""
+Benchmark of the buffering of streamed tool call arguments.
+
+Translates the Responses API events of a single large `Write` tool call (its
+arguments streamed in small deltas, the way the provider sends them) for
+growing argument sizes and reports the CPU time spent on the events of the
+tool call. The time per KB should stay flat as the arguments grow (linear
+scaling).
+
+Also reports after how many of these events the client gets to see the tool
+call for the first time (compare the default mode with
+`--stream-tool-arguments`).
+
+Usage:
+    uv run python -m benchmarks.bench_tool_arguments --sizes-kb 25 50 100 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import time
+from typing import Optional
+
+os.environ["WRITE_TRACES_TO_FILES"] = "false"
+
+# pylint: disable=wrong-import-position
+from benchmarks.fixtures import _text, make_responses_events, to_litellm_events
+from common.utils import StreamTranslator
+
+_TOOL_CALL_EVENTS = (
+    "response.output_item.added",
+    "response.function_call_arguments.delta",
+    "response.function_call_arguments.done",
+    "response.output_item.done",
+)
+
+
+def _make_events(size_kb: int, delta_size: int) -> tuple[list, str]:
+    content = _text(random.Random(size_kb), size_kb * 1024 // 6)[: size_kb * 1024]
+    arguments = {"file_path": "/repo/src/generated.py", "content": content}
+    events = make_responses_events(text_words=0, tool_calls=[("Write", arguments)], args_chunk_size=delta_size)
+    # Only the events of the tool call are of interest (the rest is constant overhead)
+    events = [
+        event
+        for event in events
+        if event["type"] in _TOOL_CALL_EVENTS
+        and (event.get("item") or {}).get("type", "function_call") == "function_call"
+    ]
+    return to_litellm_events(events), json.dumps(arguments)
+
+
+def _translate(events: list, stream_tool_arguments: bool) -> tuple[float, str, Optional[int]]:
+    translator = StreamTranslator(stream_tool_arguments=stream_tool_arguments)
+    arg_chunks = []
+    first_visible_event = None
+    start = time.process_time()
+    for event_idx, event in enumerate(events):
+        tool_use = translator.to_generic_streaming_chunk(event)["tool_use"]
+        if tool_use is not None:
+            arg_chunks.append(tool_use["function"]["arguments"])
+            if first_visible_event is None:
+                first_visible_event = event_idx
+    elapsed = time.process_time() - start
+    eof_chunk = translator.eof_finalize_chunk()
+    if eof_chunk is not None and eof_chunk["tool_use"] is not None:
+        arg_chunks.append(eof_chunk["tool_use"]["function"]["arguments"])
+    return elapsed, "".join(arg_chunks), first_visible_event
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[25, 50, 100, 200], help="Argument sizes in KB")
+    parser.add_argument("--delta-size", type=int, default=8, help="Characters per arguments delta")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best CPU time is taken)")
+    parser.add_argument(
+        "--stream-tool-arguments", action="store_true", help="Stream the tool call arguments (STREAM_TOOL_ARGUMENTS)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = []
+    for size_kb in args.sizes_kb:
+        events, expected_arguments = _make_events(size_kb, args.delta_size)
+        best = float("inf")
+        # The translator logs every tool call it sees - keep the output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.repeat):
+                elapsed, arguments, first_visible_event = _translate(events, args.stream_tool_arguments)
+                best = min(best, elapsed)
+        if arguments != expected_arguments:
+            raise SystemExit(f"Arguments of the {size_kb} KB tool call were not reassembled correctly")
+        results.append(
+            {
+                "size_kb": size_kb,
+                "events": len(events),
+                "first_visible_event": first_visible_event,
+                "ms": round(best * 1000, 2),
+                "us_per_kb": round(best * 1_000_000 / size_kb, 1),
+            }
+        )
+
+    if args.json:
+        print(json.dumps({"results": results}, indent=2))
+        return
+
+    print(f"{'size KB':>8} {'events':>8} {'visible at':>11} {'ms':>9} {'us/KB':>9}")
+    for r in results:
+        print(f"{r['size_kb']:>8} {r['events']:>8} {r['first_visible_event']:>11} {r['ms']:>9} {r['us_per_kb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Cost of WRITE_TRACES_TO_FILES for the request handlers.
+
+Traces `--streams` requests (a request trace of a `--turns`-turn conversation
+plus a trace of every chunk of a streamed response with `--text-words` words)
+into a temporary directory and reports the time the handlers spend in the
+tracing calls (what the event loop pays), the time until everything is on
+disk, the size of the traces, and the trace writer's counters.
+
+Usage:
+    uv run python -m benchmarks.bench_tracing --streams 20 --turns 50
+    uv run python -m benchmarks.bench_tracing --format jsonl --compression gzip
+    uv run python -m benchmarks.bench_tracing --format jsonl --session  # a growing session
+    uv run python -m benchmarks.bench_tracing --sample-rate 0 --tail --interesting-every 10
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=20, help="Number of traced requests")
+    parser.add_argument("--turns", type=int, default=50, help="Conversation length of every request")
+    parser.add_argument("--text-words", type=int, default=300, help="Streamed words per response")
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Trace the turns of one growing session (the conversation grows up to --turns) instead",
+    )
+    parser.add_argument("--block", action="store_true", help="Block instead of dropping when the queue is full")
+    parser.add_argument("--format", choices=("markdown", "jsonl"), default="markdown", help="TRACE_FORMAT")
+    parser.add_argument("--compression", choices=("zstd", "gzip", "none"), default="zstd", help="TRACE_COMPRESSION")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="TRACE_SAMPLE_RATE")
+    parser.add_argument("--tail", action="store_true", help="TRACE_TAIL_SAMPLING")
+    parser.add_argument(
+        "--interesting-every",
+        type=int,
+        default=0,
+        help="Make every n-th request worth keeping for tail-based sampling (it needs the EOF fallback)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    return parser.parse_args()
+
+
+# The trace settings are read upon import
+ARGS = _parse_args()
+TMP_DIR = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+os.environ["TRACES_DIR"] = TMP_DIR.name
+os.environ["TRACE_FORMAT"] = ARGS.format
+os.environ["TRACE_COMPRESSION"] = ARGS.compression
+os.environ["TRACE_SAMPLE_RATE"] = str(ARGS.sample_rate)
+os.environ["TRACE_TAIL_SAMPLING"] = str(ARGS.tail)
+
+# pylint: disable=wrong-import-position
+from benchmarks.fixtures import make_conversation, make_params, make_responses_events, to_litellm_events
+from common.trace_writer import BLOCK, TRACE_WRITER
+from common.tracing import (
+    TRACE_SAMPLER,
+    finish_streaming_trace,
+    mark_trace,
+    write_request_trace,
+    write_streaming_chunk_trace,
+)
+from common.utils import StreamTranslator
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main() -> None:
+    args = ARGS
+    if args.block:
+        TRACE_WRITER.full_policy = BLOCK
+
+    conversation = make_conversation(args.turns)
+    params = make_params()
+    events = to_litellm_events(
+        make_responses_events(text_words=args.text_words, tool_calls=[("Read", {"file_path": "/repo/src/a.py"})])
+    )
+
+    handler_s = 0.0
+    chunks = 0
+    start = time.perf_counter()
+    for stream_idx in range(args.streams):
+        trace_id = f"20250101_000000_000_{stream_idx:03d}"
+        translator = StreamTranslator()
+        if args.session:
+            messages = conversation[: len(conversation) * (stream_idx + 1) // args.streams]
+        else:
+            messages = conversation
+        generic_chunks = [translator.to_generic_streaming_chunk(event) for event in events]
+
+        call_start = time.perf_counter()
+        write_request_trace(
+            trace_id=trace_id,
+            calling_method="astreaming",
+            target_model="openai/gpt-5-codex",
+            messages_original=messages,
+            params_original=params,
+            messages_complapi=messages,
+            params_complapi=params,
+        )
+        for chunk_idx, (event, generic_chunk) in enumerate(zip(events, generic_chunks)):
+            write_streaming_chunk_trace(
+                trace_id=trace_id,
+                calling_method="astreaming",
+                chunk_idx=chunk_idx,
+                respapi_chunk=event,
+                generic_chunk=generic_chunk,
+            )
+        if args.interesting_every and stream_idx % args.interesting_every == 0:
+            mark_trace(trace_id, "eof_fallback")
+        finish_streaming_trace(trace_id=trace_id)
+        handler_s += time.perf_counter() - call_start
+        chunks += len(events)
+
+    TRACE_WRITER.flush()
+    total_s = time.perf_counter() - start
+    writer_busy_s = TRACE_WRITER.busy_s
+
+    result = {
+        "streams": args.streams,
+        "chunks": chunks,
+        "handler_ms_per_request": round(handler_s * 1000 / args.streams, 3),
+        "handler_us_per_chunk": round(handler_s * 1e6 / (chunks + args.streams), 2),
+        "until_on_disk_s": round(total_s, 3),
+        "writer_thread_ms_per_request": round(writer_busy_s * 1000 / args.streams, 3),
+        "disk_kb": round(_dir_size(TMP_DIR.name) / 1024, 1),
+        "writer": TRACE_WRITER.stats(),
+        "sampler": TRACE_SAMPLER.stats(),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for key, value in result.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Synthetic, deterministic Claude Code payloads for the benchmarks.
+
+The shapes mimic what LiteLLM hands over to `ClaudeCodeRouter` (i.e. Anthropic
+`/v1/messages` requests that were already converted to the ChatCompletions
+format): a system message with a content array, user turns with
+`<system-reminder>` blocks, assistant turns with tool calls, long tool results
+and a couple of dozen tool JSON schemas. `to_anthropic_request()` turns them
+back into the `/v1/messages` bodies Claude Code sends (for the end-to-end
+benchmarks).
+"""
+
+import json
+import random
+from typing import Any, Optional
+
+_WORDS = (
+    "agent apply argument buffer cache client commit config context convert debug deploy diff "
+    "edit error event file function handler index input item model module output parse patch "
+    "proxy read request response route schema stream test token tool trace turn update write"
+).split()
+
+_TOOL_NAMES = [
+    "Task",
+    "Bash",
+    "Glob",
+    "Grep",
+    "ExitPlanMode",
+    "Read",
+    "Edit",
+    "MultiEdit",
+    "Write",
+    "NotebookEdit",
+    "WebFetch",
+    "TodoWrite",
+    "WebSearch",
+    "BashOutput",
+    "KillShell",
+    "SlashCommand",
+    "ListMcpResources",
+    "ReadMcpResource",
+    "mcp__ide__getDiagnostics",
+    "mcp__ide__executeCode",
+    "mcp__github__create_issue",
+    "mcp__github__get_pull_request",
+    "mcp__github__list_commits",
+    "mcp__github__search_code",
+    "mcp__github__create_pull_request",
+]
+
+# A 1x1 transparent PNG, repeated to get a realistically sized base64 payload
+_IMAGE_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=" * 400
+
+
+def _text(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(num_words))
+
+
+def make_tools(num_tools: int = 25, seed: int = 0) -> list[dict[str, Any]]:
+    """Generate ChatCompletions-style function tools (plus Anthropic's web_search)."""
+    rng = random.Random(seed)
+    tools: list[dict[str, Any]] = []
+    for idx in range(num_tools - 1):
+        name = _TOOL_NAMES[idx % len(_TOOL_NAMES)]
+        properties = {
+            f"param_{p}": {
+                "type": rng.choice(["string", "integer", "boolean"]),
+                "description": _text(rng, 25),
+            }
+            for p in range(rng.randint(2, 8))
+        }
+        tools.append(
+            {
+                "type": "function",
+                "function": {
+                    "name": name if idx < len(_TOOL_NAMES) else f"{name}_{idx}",
+                    "description": _text(rng, rng.randint(80, 400)),
+                    "parameters": {
+                        "type": "object",
+                        "properties": properties,
+                        "required": sorted(properties)[:2],
+                        "additionalProperties": False,
+                        "$schema": "http://json-schema.org/draft-07/schema#",
+                    },
+                },
+            }
+        )
+    tools.append({"type": "web_search_20250305", "name": "web_search", "max_uses": 8})
+    return tools
+
+
+def make_conversation(
+    num_turns: int,
+    *,
+    seed: int = 0,
+    tool_result_words: int = 600,
+    image_every: int = 0,
+    system_reminders: bool = True,
+) -> list[dict[str, Any]]:
+    """
+    Generate a Claude Code conversation with `num_turns` agentic turns.
+
+    Every turn is a user message (or a tool result) followed by an assistant
+    message with a tool call. If `image_every` is set, every n-th user message
+    also carries an image.
+    """
+    rng = random.Random(seed)
+    messages: list[dict[str, Any]] = [
+        {
+            "role": "system",
+            "content": [
+                {"type": "text", "text": "x-anthropic-billing-header: cc_version=2.0.0; cc_entrypoint=cli"},
+                {"type": "text", "text": "You are Claude Code, Anthropic's official CLI for Claude."},
+                {
+                    "type": "text",
+                    "text": _text(rng, 3000),
+                    "cache_control": {"type": "ephemeral"},
+                },
+            ],
+        }
+    ]
+
+    for turn in range(num_turns):
+        if turn == 0 or turn % 7 == 0:
+            content: list[dict[str, Any]] = []
+            if system_reminders:
+                content.append({"type": "text", "text": f"<system-reminder>\n{_text(rng, 120)}\n</system-reminder>"})
+            content.append({"type": "text", "text": _text(rng, rng.randint(10, 80))})
+            if image_every and turn % image_every == 0:
+                content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{_IMAGE_B64}"}})
+            content[-1]["cache_control"] = {"type": "ephemeral"}
+            messages.append({"role": "user", "content": content})
+
+        call_id = f"toolu_{seed:02d}{turn:06d}"
+        tool_name = rng.choice(_TOOL_NAMES[:12])
+        messages.append(
+            {
+                "role": "assistant",
+                "content": _text(rng, rng.randint(0, 40)) or None,
+                "tool_calls": [
+                    {
+                        "id": call_id,
+                        "type": "function",
+                        "function": {
+                            "name": tool_name,
+                            "arguments": json.dumps({"file_path": f"/repo/src/{rng.choice(_WORDS)}.py"}),
+                        },
+                    }
+                ],
+            }
+        )
+        messages.append(
+            {
+                "role": "tool",
+                "tool_call_id": call_id,
+                "content": [{"type": "text", "text": _text(rng, tool_result_words)}],
+            }
+        )
+
+    return messages
+
+
+def make_params(num_tools: int = 25, seed: int = 0) -> dict[str, Any]:
+    """Generate `optional_params` the way LiteLLM passes them to the router."""
+    return {
+        "max_tokens": 32000,
+        "temperature": 1,
+        "tools": make_tools(num_tools, seed=seed),
+        "tool_choice": "auto",
+        "metadata": {"user_id": "user_0123456789abcdef_account__session_00000000-0000-0000-0000-000000000000"},
+        "stream_options": {"include_usage": True},
+    }
+
+
+def payload_size(obj: Any) -> int:
+    """Size of the JSON representation of `obj` in bytes."""
+    return len(json.dumps(obj).encode("utf-8"))
+
+
+def _anthropic_content(content: Any) -> list[dict[str, Any]]:
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    blocks = []
+    for part in content:
+        if part.get("type") == "image_url":
+            media_type, _, data = part["image_url"]["url"].removeprefix("data:").partition(";base64,")
+            block = {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": data}}
+            if "cache_control" in part:
+                block["cache_control"] = part["cache_control"]
+            blocks.append(block)
+        else:
+            blocks.append(part)
+    return blocks
+
+
+def to_anthropic_request(request: dict[str, Any]) -> dict[str, Any]:
+    """
+    The Anthropic `/v1/messages` body (what Claude Code actually sends) of a
+    ChatCompletions request made of the fixtures above. Tool results and the
+    user message after them are merged into one user message.
+    """
+    system: list[dict[str, Any]] = []
+    messages: list[dict[str, Any]] = []
+    for message in request["messages"]:
+        role = message["role"]
+        if role == "system":
+            system.extend(_anthropic_content(message["content"]))
+            continue
+        if role == "assistant":
+            content = _anthropic_content(message.get("content"))
+            content += [
+                {
+                    "type": "tool_use",
+                    "id": call["id"],
+                    "name": call["function"]["name"],
+                    "input": json.loads(call["function"]["arguments"]),
+                }
+                for call in message.get("tool_calls") or []
+            ]
+        elif role == "tool":
+            role = "user"
+            content = [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": message["tool_call_id"],
+                    "content": _anthropic_content(message["content"]),
+                }
+            ]
+        else:
+            content = _anthropic_content(message["content"])
+
+        if messages and messages[-1]["role"] == role:
+            messages[-1]["content"].extend(content)
+        else:
+            messages.append({"role": role, "content": content})
+
+    tools = []
+    for tool in request.get("tools") or []:
+        if tool.get("type") == "function":
+            fn = tool["function"]
+            tools.append({"name": fn["name"], "description": fn["description"], "input_schema": fn["parameters"]})
+        else:
+            tools.append(tool)
+
+    body = {
+        "model": request["model"],
+        "system": system,
+        "messages": messages,
+        "tools": tools,
+        "max_tokens": request.get("max_tokens", 32000),
+        "temperature": request.get("temperature", 1),
+        "stream": request.get("stream", True),
+    }
+    if request.get("metadata"):
+        body["metadata"] = request["metadata"]
+    if request.get("tool_choice") == "auto":
+        body["tool_choice"] = {"type": "auto"}
+    return body
+
+
+def make_responses_events(
+    *,
+    text_words: int = 200,
+    tool_calls: Optional[list[tuple[str, dict[str, Any]]]] = None,
+    args_chunk_size: int = 24,
+    seed: int = 0,
+    response_id: str = "resp_0",
+) -> list[dict[str, Any]]:
+    """
+    Generate the (raw, JSON) events of a Responses API stream: a reasoning item,
+    an assistant message streamed word by word and then the given tool calls
+    with their arguments streamed in `args_chunk_size` character deltas.
+    """
+    rng = random.Random(seed)
+    events: list[dict[str, Any]] = []
+    output: list[dict[str, Any]] = []
+
+    def _emit(event_type: str, **fields: Any) -> None:
+        events.append({"type": event_type, "sequence_number": len(events), **fields})
+
+    base_response = {
+        "id": response_id,
+        "object": "response",
+        "created_at": 1760000000,
+        "status": "in_progress",
+        "model": "gpt-5-codex",
+        "output": [],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+    _emit("response.created", response=dict(base_response))
+    _emit("response.in_progress", response=dict(base_response))
+
+    reasoning = {"id": f"rs_{response_id}", "type": "reasoning", "summary": []}
+    _emit("response.output_item.added", output_index=0, item=reasoning)
+    _emit("response.output_item.done", output_index=0, item=reasoning)
+    output.append(reasoning)
+
+    if text_words:
+        msg_id = f"msg_{response_id}"
+        output_index = len(output)
+        message = {"id": msg_id, "type": "message", "status": "in_progress", "role": "assistant", "content": []}
+        _emit("response.output_item.added", output_index=output_index, item=message)
+        part = {"type": "output_text", "text": "", "annotations": [], "logprobs": []}
+        _emit("response.content_part.added", item_id=msg_id, output_index=output_index, content_index=0, part=part)
+        words = [rng.choice(_WORDS) for _ in range(text_words)]
+        for idx, word in enumerate(words):
+            _emit(
+                "response.output_text.delta",
+                item_id=msg_id,
+                output_index=output_index,
+                content_index=0,
+                delta=word if idx == 0 else f" {word}",
+            )
+        text = " ".join(words)
+        _emit("response.output_text.done", item_id=msg_id, output_index=output_index, content_index=0, text=text)
+        part = {**part, "text": text}
+        _emit("response.content_part.done", item_id=msg_id, output_index=output_index, content_index=0, part=part)
+        message = {**message, "status": "completed", "content": [part]}
+        _emit("response.output_item.done", output_index=output_index, item=message)
+        output.append(message)
+
+    for tool_idx, (name, arguments) in enumerate(tool_calls or []):
+        item_id = f"fc_{response_id}_{tool_idx}"
+        output_index = len(output)
+        args_str = json.dumps(arguments)
+        item = {
+            "id": item_id,
+            "type": "function_call",
+            "status": "in_progress",
+            "call_id": f"call_{response_id}_{tool_idx}",
+            "name": name,
+            "arguments": "",
+        }
+        _emit("response.output_item.added", output_index=output_index, item=item)
+        for pos in range(0, len(args_str), args_chunk_size):
+            _emit(
+                "response.function_call_arguments.delta",
+                item_id=item_id,
+                output_index=output_index,
+                delta=args_str[pos : pos + args_chunk_size],
+            )
+        _emit("response.function_call_arguments.done", item_id=item_id, output_index=output_index, arguments=args_str)
+        item = {**item, "status": "completed", "arguments": args_str}
+        _emit("response.output_item.done", output_index=output_index, item=item)
+        output.append(item)
+
+    _emit(
+        "response.completed",
+        response={
+            **base_response,
+            "status": "completed",
+            "output": output,
+            "usage": {
+                "input_tokens": 1000,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": text_words + 50,
+                "output_tokens_details": {"reasoning_tokens": 50},
+                "total_tokens": 1050 + text_words,
+            },
+        },
+    )
+    return events
+
+
+def to_litellm_events(events: list[dict[str, Any]]) -> list[Any]:
+    """Parse raw Responses API events the same way LiteLLM does when it streams them."""
+    # pylint: disable=import-outside-toplevel
+    from litellm.llms.openai.responses.transformation import OpenAIResponsesAPIConfig
+
+    return [OpenAIResponsesAPIConfig.get_event_model_class(event["type"])(**event) for event in events]
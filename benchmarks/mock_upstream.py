@@ -0,0 +1,221 @@
+"""
+A local stand-in for the upstream APIs: the OpenAI Responses API
+(`/v1/responses`, or `/backend-api/codex/responses` of the ChatGPT
+subscription) and the ChatCompletions API (`/v1/chat/completions`).
+
+It serves recorded responses (see `benchmarks/recordings.py`), streamed with
+the recorded timings (scaled by `speed`). An upstream request is matched to
+its recording by the fingerprint of its last message. If there is no match, the
+recordings are served in turn.
+
+The mock keeps the timings of every request it serves (`UpstreamTiming`),
+with the request ID the proxy sends upstream (`x-client-request-id`, see
+`common/request_id.py`), so a load generator can tell the upstream time from
+the time added by the proxy. (LiteLLM's ChatCompletions -> Responses API
+bridge doesn't pass the header on - match those requests by their recording.)
+
+Usage (standalone, e.g. against a proxy started with
+`OPENAI_REQUEST=api CLAUDE_CODE_PROXY_OPENAI_API_BASE=http://127.0.0.1:8999/v1`):
+    uv run python -m benchmarks.mock_upstream .traces/ --port 8999
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from benchmarks.recordings import (
+    CHAT,
+    RESPONSES,
+    Recording,
+    as_responses_recording,
+    fingerprint,
+    load_recordings,
+    synthetic_recording,
+)
+from common.request_id import OUTBOUND_REQUEST_ID_HEADER
+
+# Recorded gaps shorter than this are not slept (the events go out together)
+_MIN_SLEEP_S = 0.0005
+# The first event the proxy has anything to pass on to the client for (the
+# lifecycle events before it, e.g. `response.created`, are not passed on)
+_RESPONSES_CONTENT_EVENTS = frozenset(
+    {"response.output_text.delta", "response.function_call_arguments.delta", "response.completed"}
+)
+
+
+def _is_content_event(api: str, event: dict[str, Any]) -> bool:
+    if api == CHAT:
+        return any(
+            (choice.get("delta") or {}).get("content") or (choice.get("delta") or {}).get("tool_calls")
+            for choice in event.get("choices") or []
+        )
+    if event.get("type") == "response.output_item.added":
+        return (event.get("item") or {}).get("type") == "function_call"
+    return event.get("type") in _RESPONSES_CONTENT_EVENTS
+
+
+@dataclass
+class UpstreamTiming:
+    """`time.perf_counter()` values of an upstream request."""
+
+    received_at: float
+    recording: str
+    # The fingerprint of the request, if it matched a recording
+    fingerprint: Optional[str]
+    request_id: Optional[str] = None
+    first_content_at: Optional[float] = None
+    last_event_at: Optional[float] = None
+
+
+class MockUpstream:
+    def __init__(self, recordings: list[Recording], *, speed: float = 1.0) -> None:
+        self.speed = speed
+        # The ChatCompletions streams can be served by the Responses API too
+        # (see `as_responses_recording()`), as long as there is no actual
+        # Responses API recording of the same request
+        responses_fingerprints = {rec.fingerprint for rec in recordings if rec.api == RESPONSES}
+        recordings = recordings + [
+            as_responses_recording(rec)
+            for rec in recordings
+            if rec.api == CHAT and rec.events and rec.fingerprint not in responses_fingerprints
+        ]
+        self._recordings = {api: [rec for rec in recordings if rec.api == api] for api in (RESPONSES, CHAT)}
+        self._by_fingerprint = {(rec.api, rec.fingerprint): rec for rec in recordings if rec.fingerprint is not None}
+        self._round_robin = {api: itertools.cycle(recs) for api, recs in self._recordings.items() if recs}
+
+        self.timings: list[UpstreamTiming] = []
+        self.requests = 0
+        self.matched = 0
+        self.unmatched = 0
+        self.errors = 0
+
+        self.app = Starlette(routes=[Route("/{path:path}", self._handle, methods=["POST"])])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "requests": self.requests,
+            "matched": self.matched,
+            "unmatched": self.unmatched,
+            "errors": self.errors,
+        }
+
+    def _pick(self, api: str, body: dict[str, Any]) -> tuple[Optional[Recording], bool]:
+        messages = body.get("input") if api == RESPONSES else body.get("messages")
+        recording = self._by_fingerprint.get((api, fingerprint(messages if isinstance(messages, list) else None)))
+        if recording is not None:
+            self.matched += 1
+            return recording, True
+        if api not in self._round_robin:
+            return None, False
+        self.unmatched += 1
+        return next(self._round_robin[api]), False
+
+    async def _handle(self, request: Request) -> Response:
+        received_at = time.perf_counter()
+        path = request.url.path.rstrip("/")
+        if path.endswith("/responses"):
+            api = RESPONSES
+        elif path.endswith("/chat/completions"):
+            api = CHAT
+        else:
+            return JSONResponse({"error": {"message": f"Unknown endpoint: {path}"}}, status_code=404)
+
+        self.requests += 1
+        body = await request.json()
+        recording, matched = self._pick(api, body)
+        if recording is None:
+            self.errors += 1
+            return JSONResponse({"error": {"message": f"No recordings for the {api} API"}}, status_code=501)
+
+        timing = UpstreamTiming(
+            received_at=received_at,
+            recording=recording.name,
+            fingerprint=recording.fingerprint if matched else None,
+            request_id=request.headers.get(OUTBOUND_REQUEST_ID_HEADER),
+        )
+        self.timings.append(timing)
+
+        if not body.get("stream"):
+            if recording.response is None:
+                self.errors += 1
+                return JSONResponse({"error": {"message": f"{recording.name} has no final response"}}, status_code=501)
+            await asyncio.sleep(recording.duration_s * self.speed)
+            timing.first_content_at = timing.last_event_at = time.perf_counter()
+            return JSONResponse(recording.response)
+        return StreamingResponse(self._stream(api, recording, timing), media_type="text/event-stream")
+
+    async def _stream(self, api: str, recording: Recording, timing: UpstreamTiming) -> AsyncIterator[bytes]:
+        # Sleep until the (scaled) recorded time of every event, so the gaps
+        # don't drift with the time it takes to send the events
+        due_at = timing.received_at
+        for delay, event in recording.events:
+            due_at += delay * self.speed
+            wait = due_at - time.perf_counter()
+            if wait > _MIN_SLEEP_S:
+                await asyncio.sleep(wait)
+
+            if api == RESPONSES:
+                yield f"event: {event.get('type')}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+            else:
+                yield f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+            timing.last_event_at = time.perf_counter()
+            if timing.first_content_at is None and _is_content_event(api, event):
+                timing.first_content_at = timing.last_event_at
+
+        if api == CHAT:
+            yield b"data: [DONE]\n\n"
+
+    @asynccontextmanager
+    async def serving(self, host: str = "127.0.0.1", port: int = 0) -> AsyncIterator[str]:
+        """Serve in the running event loop. Yields the base URL (`port=0` picks a free port)."""
+        server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        task = asyncio.create_task(server.serve())
+        while not server.started:
+            if task.done():
+                task.result()  # Raises the startup error
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        try:
+            yield f"http://{host}:{port}"
+        finally:
+            server.should_exit = True
+            await task
+
+
+async def _serve_forever(mock: MockUpstream, host: str, port: int) -> None:
+    async with mock.serving(host, port) as base_url:
+        print(f"Serving the mock upstream at {base_url} (CLAUDE_CODE_PROXY_OPENAI_API_BASE={base_url}/v1)")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", type=Path, help="Traces (files or folders) to serve")
+    parser.add_argument("--synthetic", type=int, default=0, help="Serve this many synthetic streams instead")
+    parser.add_argument("--speed", type=float, default=1.0, help="Scale the recorded timings (0 - no delays)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.paths) + [synthetic_recording(seed) for seed in range(args.synthetic)]
+    if not recordings:
+        parser.error("nothing to serve - pass traces or --synthetic")
+    print(f"Loaded {len(recordings)} recordings")
+    asyncio.run(_serve_forever(MockUpstream(recordings, speed=args.speed), args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
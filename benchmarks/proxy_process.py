@@ -0,0 +1,143 @@
+"""
+Runs the LiteLLM proxy (`config.yaml` with `claude_code_router`) as a child
+process for the end-to-end benchmarks, and reads its CPU time and memory from
+`/proc` (Linux only - elsewhere these are `None`).
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).parent.parent
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_cpu_s(pid: int) -> Optional[float]:
+    """User + system CPU time of the process."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text(encoding="ascii")
+    except OSError:
+        return None
+    # The fields after the (parenthesized, possibly space-containing) command name
+    fields = stat.rpartition(")")[2].split()
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+
+def process_memory(pid: int) -> dict[str, Optional[int]]:
+    """The current (`VmRSS`) and the peak (`VmHWM`) resident set size, in bytes."""
+    memory: dict[str, Optional[int]] = {"rss": None, "peak_rss": None}
+    try:
+        status = Path(f"/proc/{pid}/status").read_text(encoding="ascii")
+    except OSError:
+        return memory
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            memory["rss" if key == "VmRSS" else "peak_rss"] = int(value.split()[0]) * 1024
+    return memory
+
+
+class ProxyProcess:
+    """
+    `with ProxyProcess(env={...}) as proxy:` starts the proxy, waits until it
+    is up, and stops it on exit. Its output goes to `proxy.log_path`.
+    """
+
+    def __init__(
+        self,
+        *,
+        env: Optional[dict[str, str]] = None,
+        config: Path = REPO_ROOT / "config.yaml",
+        port: Optional[int] = None,
+        startup_timeout_s: float = 120.0,
+    ) -> None:
+        self.env = env or {}
+        self.config = config
+        self.port = port or free_port()
+        self.startup_timeout_s = startup_timeout_s
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.log_path: Optional[Path] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    def start(self) -> None:
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+            **self.env,
+        }
+        with tempfile.NamedTemporaryFile(prefix="proxy-", suffix=".log", delete=False) as log_file:
+            self.log_path = Path(log_file.name)
+            self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+                [
+                    sys.executable,
+                    "-m",
+                    "litellm.proxy.proxy_cli",
+                    "--config",
+                    str(self.config),
+                    "--host",
+                    "127.0.0.1",
+                    "--port",
+                    str(self.port),
+                ],
+                cwd=REPO_ROOT,
+                env=env,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+        self._wait_until_up()
+
+    def _wait_until_up(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout_s
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"The proxy exited with {self._process.returncode} (see {self.log_path})")
+            try:
+                if httpx.get(f"{self.base_url}/health/liveliness", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.stop()
+        raise RuntimeError(f"The proxy didn't start in {self.startup_timeout_s}s (see {self.log_path})")
+
+    def stop(self) -> None:
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def cpu_s(self) -> Optional[float]:
+        return process_cpu_s(self.pid) if self.pid else None
+
+    def memory(self) -> dict[str, Optional[int]]:
+        return process_memory(self.pid) if self.pid else {"rss": None, "peak_rss": None}
+
+    def __enter__(self) -> "ProxyProcess":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
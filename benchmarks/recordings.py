@@ -0,0 +1,368 @@
+"""
+Recorded upstream responses (and the requests that led to them) for the load
+tests - read from the traces the proxy writes (`WRITE_TRACES_TO_FILES=true`,
+either `TRACE_FORMAT`), or generated (`synthetic_recording()`).
+
+Only the JSONL traces have timings (every record is timestamped). The chunks
+of a markdown trace are replayed `default_interval_s` apart.
+
+LiteLLM bridges some routes (e.g. `openai/gpt-5-codex` without
+`ALWAYS_USE_RESPONSES_API`) from the ChatCompletions API to the Responses API
+on its own, so their traces only have the ChatCompletions chunks -
+`as_responses_recording()` turns them back into a Responses API stream.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from benchmarks.fixtures import make_conversation, make_params, make_responses_events
+from common.tracing_in_jsonl import read_trace_records
+
+RESPONSES = "responses"
+CHAT = "chat"
+
+_STREAMING_METHODS = ("streaming", "astreaming")
+_JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+_MD_REQUEST_SUFFIX = "_REQUEST.md"
+
+# The fingerprint only looks at the longer strings (texts, tool arguments and
+# results), not at item types, roles or ids, which differ between the formats
+_FINGERPRINT_MIN_STR_LEN = 20
+_FINGERPRINT_SKIPPED_KEYS = frozenset({"type", "role"})
+_SYSTEM_ROLES = ("system", "developer")
+
+
+@dataclass
+class Recording:
+    name: str
+    api: str  # RESPONSES or CHAT
+    # The events of the upstream stream, each with the delay since the
+    # previous one (the first one - since the upstream request)
+    events: list[tuple[float, dict[str, Any]]] = field(default_factory=list)
+    # The final response (served to non-streaming upstream requests), and how
+    # long it took if it wasn't streamed
+    response: Optional[dict[str, Any]] = None
+    response_delay_s: float = 0.0
+    # The ChatCompletions request to send to the proxy to replay it
+    request: Optional[dict[str, Any]] = None
+    # See `fingerprint()` - matches the upstream request to its recording
+    fingerprint: Optional[str] = None
+
+    @property
+    def duration_s(self) -> float:
+        return sum(delay for delay, _ in self.events) or self.response_delay_s
+
+
+def fingerprint(messages: Optional[list[Any]]) -> Optional[str]:
+    """
+    A digest of the last message (or Responses API input item) of a request -
+    not counting the system messages the proxy may add at the end.
+    """
+    last_message = next(
+        (
+            message
+            for message in reversed(messages or [])
+            if not isinstance(message, dict) or message.get("role") not in _SYSTEM_ROLES
+        ),
+        None,
+    )
+    strings: list[str] = []
+
+    def _walk(value: Any) -> None:
+        if isinstance(value, str):
+            if len(value) >= _FINGERPRINT_MIN_STR_LEN:
+                strings.append(value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in _FINGERPRINT_SKIPPED_KEYS:
+                    _walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                _walk(item)
+
+    _walk(last_message)
+    if not strings:
+        return None
+    return hashlib.blake2b("\0".join(strings).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _request_body(request_record: dict[str, Any]) -> Optional[dict[str, Any]]:
+    if request_record.get("messages_original") is None:
+        return None
+    body = {key: value for key, value in (request_record.get("params_original") or {}).items() if value is not None}
+    body["model"] = request_record.get("requested_model")
+    body["messages"] = request_record["messages_original"]
+    body["stream"] = request_record.get("calling_method") in _STREAMING_METHODS
+    return body
+
+
+def recording_from_records(name: str, records: Iterable[dict[str, Any]], default_interval_s: float = 0.0) -> Recording:
+    """Build a recording out of trace records (see `common/tracing_in_jsonl.py`)."""
+    request_record: dict[str, Any] = {}
+    respapi_events: list[tuple[float, dict]] = []
+    complapi_events: list[tuple[float, dict]] = []
+    response_record: dict[str, Any] = {}
+    response_delay_s = 0.0
+    last_time: Optional[float] = None
+
+    for record in records:
+        event = record.get("event")
+        record_time = record.get("time")
+        if record_time is not None and last_time is not None:
+            delay = max(record_time - last_time, 0.0)
+        else:
+            delay = default_interval_s
+        if record_time is not None:
+            last_time = record_time
+
+        if event == "request":
+            request_record = record
+        elif event == "chunk":
+            if record.get("respapi_chunk") is not None:
+                respapi_events.append((delay, record["respapi_chunk"]))
+            elif record.get("complapi_chunk") is not None:
+                complapi_events.append((delay, record["complapi_chunk"]))
+        elif event == "response":
+            response_record = record
+            if record_time is not None and request_record.get("time") is not None:
+                response_delay_s = max(record_time - request_record["time"], 0.0)
+
+    is_respapi = bool(respapi_events) or response_record.get("response_respapi") is not None
+    api = RESPONSES if is_respapi else CHAT
+
+    response = response_record.get("response_respapi" if is_respapi else "response_complapi")
+    if response is None and respapi_events and respapi_events[-1][1].get("type") == "response.completed":
+        response = respapi_events[-1][1].get("response")
+
+    outbound_messages = request_record.get("messages_respapi" if is_respapi else "messages_complapi")
+    return Recording(
+        name=name,
+        api=api,
+        events=respapi_events if is_respapi else complapi_events,
+        response=response,
+        response_delay_s=response_delay_s,
+        request=_request_body(request_record),
+        fingerprint=fingerprint(outbound_messages),
+    )
+
+
+def _responses_usage(usage: Optional[dict[str, Any]]) -> dict[str, Any]:
+    usage = usage or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens") or 0,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": usage.get("completion_tokens") or 0,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": usage.get("total_tokens") or 0,
+    }
+
+
+def _chat_to_responses_events(chunks: list[tuple[float, dict[str, Any]]]) -> list[tuple[float, dict[str, Any]]]:
+    """The text and the tool calls of a ChatCompletions stream, as Responses API events (with the same timings)."""
+    events: list[tuple[float, dict[str, Any]]] = []
+    pending_delay = 0.0
+
+    def _emit(event_type: str, **fields: Any) -> None:
+        nonlocal pending_delay
+        events.append((pending_delay, {"type": event_type, "sequence_number": len(events), **fields}))
+        pending_delay = 0.0
+
+    first_chunk = chunks[0][1] if chunks else {}
+    response_id = f"resp_{first_chunk.get('id', '0')}"
+    base_response = {
+        "id": response_id,
+        "object": "response",
+        "created_at": first_chunk.get("created", 0),
+        "status": "in_progress",
+        "model": first_chunk.get("model"),
+        "output": [],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+    _emit("response.created", response=dict(base_response))
+
+    output: list[dict[str, Any]] = []
+    message: Optional[dict[str, Any]] = None
+    tool_calls: dict[int, dict[str, Any]] = {}
+    usage = None
+    for delay, chunk in chunks:
+        pending_delay += delay
+        usage = chunk.get("usage") or usage
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content"):
+                if message is None:
+                    message = {"id": f"msg_{response_id}", "type": "message", "status": "in_progress"}
+                    message.update(role="assistant", content=[{"type": "output_text", "text": "", "annotations": []}])
+                    output.append(message)
+                    _emit("response.output_item.added", output_index=len(output) - 1, item=dict(message, content=[]))
+                message["content"][0]["text"] += delta["content"]
+                _emit(
+                    "response.output_text.delta",
+                    item_id=message["id"],
+                    output_index=output.index(message),
+                    content_index=0,
+                    delta=delta["content"],
+                )
+            for tool_call in delta.get("tool_calls") or []:
+                function = tool_call.get("function") or {}
+                item = tool_calls.get(tool_call.get("index", 0))
+                if item is None:
+                    item = {"id": f"fc_{response_id}_{len(tool_calls)}", "type": "function_call"}
+                    item.update(status="in_progress", call_id=tool_call.get("id"), name=function.get("name"))
+                    item["arguments"] = ""
+                    tool_calls[tool_call.get("index", 0)] = item
+                    output.append(item)
+                    _emit("response.output_item.added", output_index=len(output) - 1, item=dict(item))
+                if function.get("arguments"):
+                    item["arguments"] += function["arguments"]
+                    _emit(
+                        "response.function_call_arguments.delta",
+                        item_id=item["id"],
+                        output_index=output.index(item),
+                        delta=function["arguments"],
+                    )
+
+    for output_index, item in enumerate(output):
+        item["status"] = "completed"
+        if item["type"] == "message":
+            text = item["content"][0]["text"]
+            _emit(
+                "response.output_text.done", item_id=item["id"], output_index=output_index, content_index=0, text=text
+            )
+        else:
+            _emit(
+                "response.function_call_arguments.done",
+                item_id=item["id"],
+                output_index=output_index,
+                arguments=item["arguments"],
+            )
+        _emit("response.output_item.done", output_index=output_index, item=item)
+    _emit(
+        "response.completed",
+        response={**base_response, "status": "completed", "output": output, "usage": _responses_usage(usage)},
+    )
+    return events
+
+
+def as_responses_recording(recording: Recording) -> Recording:
+    """The recording of a ChatCompletions stream as a Responses API stream (see the module docstring)."""
+    if recording.api == RESPONSES:
+        return recording
+    events = _chat_to_responses_events(recording.events)
+    return replace(recording, api=RESPONSES, events=events, response=events[-1][1]["response"])
+
+
+# Markdown traces (see `render_*()` in `common/tracing_in_markdown.py`)
+
+_MD_SECTION_RE = re.compile(
+    r"^### (Original \(Claude Code -> Proxy\)|ChatCompletions API|Responses API):\n```json\n(.*?)\n```$",
+    re.MULTILINE | re.DOTALL,
+)
+_MD_FIELD_SUFFIXES = {
+    "Original (Claude Code -> Proxy)": "original",
+    "ChatCompletions API": "complapi",
+    "Responses API": "respapi",
+}
+_MD_ROUTING_RE = re.compile(r"^- \*\*Requested Model \(Claude Code\):\*\* `(.*)`$", re.MULTILINE)
+_MD_CALLING_METHOD_RE = re.compile(r"^# (\w+)$", re.MULTILINE)
+_MD_CHUNK_RE = re.compile(r"^## Response Chunk #\d+$", re.MULTILINE)
+
+
+def _md_sections(text: str) -> dict[str, Any]:
+    return {_MD_FIELD_SUFFIXES[match[1]]: json.loads(match[2]) for match in _MD_SECTION_RE.finditer(text)}
+
+
+def _read_markdown_records(request_path: Path) -> Iterator[dict[str, Any]]:
+    stem = request_path.name[: -len(_MD_REQUEST_SUFFIX)]
+    text = request_path.read_text(encoding="utf-8")
+
+    calling_method = _MD_CALLING_METHOD_RE.search(text)
+    requested_model = _MD_ROUTING_RE.search(text)
+    messages_text, _, params_text = text.partition("## Request Params\n")
+    request = {"event": "request", "calling_method": calling_method[1].lower() if calling_method else None}
+    if requested_model:
+        request["requested_model"] = requested_model[1]
+    request.update((f"messages_{key}", value) for key, value in _md_sections(messages_text).items())
+    request.update((f"params_{key}", value) for key, value in _md_sections(params_text).items())
+    yield request
+
+    stream_path = request_path.with_name(f"{stem}_RESPONSE_STREAM.md")
+    if stream_path.exists():
+        for chunk_text in _MD_CHUNK_RE.split(stream_path.read_text(encoding="utf-8"))[1:]:
+            sections = _md_sections(chunk_text)
+            yield {
+                "event": "chunk",
+                "respapi_chunk": sections.get("respapi"),
+                "complapi_chunk": sections.get("complapi"),
+            }
+
+    response_path = request_path.with_name(f"{stem}_RESPONSE.md")
+    if response_path.exists():
+        sections = _md_sections(response_path.read_text(encoding="utf-8"))
+        yield {
+            "event": "response",
+            "response_respapi": sections.get("respapi"),
+            "response_complapi": sections.get("complapi"),
+        }
+
+
+def load_recordings(paths: Iterable[Path], default_interval_s: float = 0.0) -> list[Recording]:
+    """Load the traces (files or folders with them) that have a recorded response."""
+    trace_paths: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            trace_paths.extend(
+                sorted(
+                    child
+                    for child in path.iterdir()
+                    if child.is_file() and child.name.endswith(_JSONL_SUFFIXES + (_MD_REQUEST_SUFFIX,))
+                )
+            )
+        else:
+            trace_paths.append(path)
+
+    recordings = []
+    for trace_path in trace_paths:
+        if trace_path.name.endswith(_MD_REQUEST_SUFFIX):
+            records = _read_markdown_records(trace_path)
+        else:
+            records = read_trace_records(trace_path)
+        recording = recording_from_records(trace_path.name, records, default_interval_s)
+        if recording.events or recording.response is not None:
+            recordings.append(recording)
+    return recordings
+
+
+def synthetic_recording(
+    seed: int,
+    *,
+    turns: int = 20,
+    text_words: int = 200,
+    tool_calls: int = 1,
+    first_event_delay_s: float = 0.0,
+    event_interval_s: float = 0.0,
+    model: str = "claude-sonnet-4-5-20250929",
+) -> Recording:
+    """A Responses API stream (see `benchmarks/fixtures.py`) and a Claude Code request for it."""
+    messages = make_conversation(turns, seed=seed)
+    events = make_responses_events(
+        text_words=text_words,
+        tool_calls=[(f"tool_{idx}", {"file_path": f"/repo/src/module_{seed}_{idx}.py"}) for idx in range(tool_calls)],
+        seed=seed,
+        response_id=f"resp_{seed}",
+    )
+    return Recording(
+        name=f"synthetic-{seed}",
+        api=RESPONSES,
+        events=[(first_event_delay_s if idx == 0 else event_interval_s, event) for idx, event in enumerate(events)],
+        response=events[-1]["response"],
+        request={"model": model, "messages": messages, **make_params(seed=seed), "stream": True},
+        # The conversion keeps the texts of the last message (a tool result) as they are
+        fingerprint=fingerprint(messages),
+    )
@@ -0,0 +1,317 @@
+"""
+Trace replay load generator.
+
+Replays recorded Claude Code requests (the traces the proxy writes with
+`WRITE_TRACES_TO_FILES=true` - JSONL traces have the timings, see
+`benchmarks/recordings.py`) against the proxy, at a given concurrency and
+(optionally) rate. The proxy is pointed at a local mock upstream
+(`benchmarks/mock_upstream.py`), which streams the recorded responses back
+with the recorded timings, so there is no network involved and the traffic
+has the shape of real Claude Code sessions.
+
+The proxy is started (with `config.yaml`) unless `--proxy-url` is given. It
+is started in the `api` mode (`CLAUDE_CODE_PROXY_OPENAI_API_BASE` pointing at
+the mock), so no OpenAI credentials are needed.
+
+Reports the latency the proxy adds to the upstream, matching every request to
+its upstream request (see `_match_upstream()`):
+- `pre_upstream` - from sending the request to the mock receiving it
+- `ttfb` - the client's time to first byte minus the upstream's (to the
+  first event with any content)
+- `total` - the client's total time minus the upstream's
+(p50/p95/p99, in ms), and the CPU time per request and the memory growth of
+the proxy process.
+
+The requests are replayed through `/v1/chat/completions` - the traces record
+the requests the way LiteLLM hands them over to the router (in the
+ChatCompletions format), not the original `/v1/messages` bodies.
+
+Usage:
+    uv run python -m benchmarks.replay_traces .traces/ --concurrency 16 --requests 500
+    uv run python -m benchmarks.replay_traces --synthetic 20 --speed 0  # no traces needed
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+from benchmarks.mock_upstream import MockUpstream, UpstreamTiming
+from benchmarks.proxy_process import ProxyProcess, free_port
+from benchmarks.recordings import Recording, load_recordings, synthetic_recording
+from common.request_id import REQUEST_ID_HEADER
+
+_PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class ClientTiming:
+    """`time.perf_counter()` values of a request to the proxy."""
+
+    recording: str
+    fingerprint: Optional[str]
+    sent_at: float
+    first_byte_at: Optional[float] = None
+    done_at: Optional[float] = None
+    status: Optional[int] = None
+    request_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _percentiles(values: list[float]) -> dict[str, Optional[float]]:
+    if not values:
+        return {f"p{p}": None for p in _PERCENTILES}
+    if len(values) == 1:
+        return {f"p{p}": round(values[0], 2) for p in _PERCENTILES}
+    cut_points = statistics.quantiles(values, n=100, method="inclusive")
+    return {f"p{p}": round(cut_points[p - 1], 2) for p in _PERCENTILES}
+
+
+async def _send(client: httpx.AsyncClient, recording: Recording, headers: dict[str, str]) -> ClientTiming:
+    timing = ClientTiming(recording=recording.name, fingerprint=recording.fingerprint, sent_at=time.perf_counter())
+    try:
+        async with client.stream("POST", "/v1/chat/completions", json=recording.request, headers=headers) as response:
+            timing.status = response.status_code
+            timing.request_id = response.headers.get(REQUEST_ID_HEADER)
+            async for data in response.aiter_bytes():
+                if data and timing.first_byte_at is None:
+                    timing.first_byte_at = time.perf_counter()
+            if response.status_code != 200:
+                timing.error = f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        timing.error = repr(e)
+    timing.done_at = time.perf_counter()
+    return timing
+
+
+async def _replay(
+    client: httpx.AsyncClient,
+    recordings: list[Recording],
+    *,
+    requests: int,
+    concurrency: int,
+    rate: float,
+    headers: dict[str, str],
+) -> list[ClientTiming]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(idx: int) -> ClientTiming:
+        async with semaphore:
+            return await _send(client, recordings[idx % len(recordings)], headers)
+
+    tasks = []
+    started_at = time.perf_counter()
+    for idx in range(requests):
+        if rate > 0:
+            # Open loop: the requests arrive at the given rate (as long as the
+            # concurrency allows), no matter how long they take
+            wait = started_at + idx / rate - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        tasks.append(asyncio.create_task(_one(idx)))
+    return await asyncio.gather(*tasks)
+
+
+def _match_upstream(timings: list[ClientTiming], upstream_timings: list[UpstreamTiming]) -> dict[int, UpstreamTiming]:
+    """
+    The upstream request of every successful request (by its index): by the
+    request ID if the proxy passed it on, otherwise by the request fingerprint
+    (see `benchmarks/recordings.py`), in the order they were sent (the proxy handles the requests roughly first come,
+    first served).
+    """
+    by_request_id: dict[str, UpstreamTiming] = {}
+    by_fingerprint: dict[str, list[UpstreamTiming]] = defaultdict(list)
+    for upstream in upstream_timings:
+        if upstream.last_event_at is None:
+            continue
+        if upstream.request_id is not None:
+            # (If LiteLLM retried the request - the last attempt, which got served)
+            by_request_id[upstream.request_id] = upstream
+        elif upstream.fingerprint is not None:
+            by_fingerprint[upstream.fingerprint].append(upstream)
+
+    matches: dict[int, UpstreamTiming] = {}
+    pending: dict[str, list[int]] = defaultdict(list)
+    for idx in sorted(range(len(timings)), key=lambda idx: timings[idx].sent_at):
+        timing = timings[idx]
+        if timing.error:
+            continue
+        if timing.request_id in by_request_id:
+            matches[idx] = by_request_id[timing.request_id]
+        elif timing.fingerprint is not None:
+            pending[timing.fingerprint].append(idx)
+    for request_fingerprint, indices in pending.items():
+        matches.update(zip(indices, by_fingerprint.get(request_fingerprint, [])))
+    return matches
+
+
+def _report(
+    timings: list[ClientTiming], mock: MockUpstream, elapsed_s: float, proxy: Optional[ProxyProcess], **extra: Any
+) -> dict[str, Any]:
+    matches = _match_upstream(timings, mock.timings)
+    pre_upstream, ttfb, total, client_ttfb, client_total = [], [], [], [], []
+    for idx, timing in enumerate(timings):
+        if timing.error:
+            continue
+        client_total.append((timing.done_at - timing.sent_at) * 1000)
+        if timing.first_byte_at is not None:
+            client_ttfb.append((timing.first_byte_at - timing.sent_at) * 1000)
+        upstream = matches.get(idx)
+        if upstream is None:
+            continue
+        pre_upstream.append((upstream.received_at - timing.sent_at) * 1000)
+        if timing.first_byte_at is not None and upstream.first_content_at is not None:
+            upstream_ttfb = upstream.first_content_at - upstream.received_at
+            ttfb.append((timing.first_byte_at - timing.sent_at - upstream_ttfb) * 1000)
+        upstream_total = upstream.last_event_at - upstream.received_at
+        total.append((timing.done_at - timing.sent_at - upstream_total) * 1000)
+
+    errors: dict[str, int] = {}
+    for timing in timings:
+        if timing.error:
+            errors[timing.error] = errors.get(timing.error, 0) + 1
+
+    return {
+        **extra,
+        "requests": len(timings),
+        "failed": sum(errors.values()),
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 3),
+        "requests_per_s": round(len(timings) / elapsed_s, 2),
+        "matched_upstream": len(matches),
+        "matched_by_request_id": sum(upstream.request_id is not None for upstream in matches.values()),
+        "proxy_added_ms": {
+            "pre_upstream": _percentiles(pre_upstream),
+            "ttfb": _percentiles(ttfb),
+            "total": _percentiles(total),
+        },
+        "client_ms": {"ttfb": _percentiles(client_ttfb), "total": _percentiles(client_total)},
+        "mock_upstream": mock.stats(),
+        "proxy_log": str(proxy.log_path) if proxy else None,
+    }
+
+
+async def _run(args: argparse.Namespace, recordings: list[Recording]) -> dict[str, Any]:
+    mock = MockUpstream(recordings, speed=args.speed)
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(600.0, connect=10.0)
+
+    async with mock.serving(port=args.mock_port) as mock_url:
+        proxy = None
+        proxy_url = args.proxy_url
+        if proxy_url is None:
+            proxy_env = {
+                "OPENAI_REQUEST": "api",
+                "CLAUDE_CODE_PROXY_OPENAI_API_BASE": f"{mock_url}/v1",
+                "OPENAI_API_KEY": "mock",
+                "WRITE_TRACES_TO_FILES": "false",
+                **dict(env.split("=", 1) for env in args.proxy_env),
+            }
+            proxy = ProxyProcess(env=proxy_env, config=args.config, port=args.port)
+            await asyncio.to_thread(proxy.start)
+            proxy_url = proxy.base_url
+
+        try:
+            async with httpx.AsyncClient(base_url=proxy_url, limits=limits, timeout=timeout) as client:
+                # Not measured: the first requests warm up the imports, caches and connections
+                await _replay(
+                    client, recordings, requests=args.warmup, concurrency=args.concurrency, rate=0, headers=headers
+                )
+                mock.timings.clear()
+                cpu_before = proxy.cpu_s() if proxy else None
+                memory_before = proxy.memory() if proxy else {}
+
+                started_at = time.perf_counter()
+                timings = await _replay(
+                    client,
+                    recordings,
+                    requests=args.requests or len(recordings),
+                    concurrency=args.concurrency,
+                    rate=args.rate,
+                    headers=headers,
+                )
+                elapsed_s = time.perf_counter() - started_at
+
+                cpu_after = proxy.cpu_s() if proxy else None
+                memory_after = proxy.memory() if proxy else {}
+        finally:
+            if proxy:
+                await asyncio.to_thread(proxy.stop)
+
+    proxy_stats: dict[str, Any] = {}
+    if cpu_before is not None and cpu_after is not None:
+        proxy_stats["cpu_s"] = round(cpu_after - cpu_before, 3)
+        proxy_stats["cpu_ms_per_request"] = round((cpu_after - cpu_before) * 1000 / len(timings), 2)
+        proxy_stats["cpu_utilization"] = round((cpu_after - cpu_before) / elapsed_s, 3)
+    if memory_before.get("rss") and memory_after.get("rss"):
+        proxy_stats["rss_before_mb"] = round(memory_before["rss"] / 2**20, 1)
+        proxy_stats["rss_after_mb"] = round(memory_after["rss"] / 2**20, 1)
+        proxy_stats["rss_growth_mb"] = round((memory_after["rss"] - memory_before["rss"]) / 2**20, 1)
+        proxy_stats["peak_rss_mb"] = round(memory_after["peak_rss"] / 2**20, 1)
+
+    return _report(
+        timings,
+        mock,
+        elapsed_s,
+        proxy,
+        recordings=len(recordings),
+        concurrency=args.concurrency,
+        rate=args.rate,
+        speed=args.speed,
+        proxy_process=proxy_stats,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", type=Path, help="Traces (files or folders) to replay")
+    parser.add_argument("--synthetic", type=int, default=0, help="Replay this many synthetic sessions (no traces)")
+    parser.add_argument("--requests", type=int, default=0, help="Requests to send (default: one per recording)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at most")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (default: as fast as possible)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Scale the recorded timings (0 - no delays)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests to send first")
+    parser.add_argument("--shuffle", action="store_true", help="Replay the recordings in random order")
+    parser.add_argument("--proxy-url", help="Use a running proxy (pointed at the mock with --mock-port)")
+    parser.add_argument("--proxy-env", action="append", default=[], help="KEY=VALUE for the started proxy")
+    parser.add_argument("--config", type=Path, default=Path("config.yaml"), help="Config of the started proxy")
+    parser.add_argument("--port", type=int, help="Port of the started proxy (default: a free one)")
+    parser.add_argument("--mock-port", type=int, default=0, help="Port of the mock upstream (default: a free one)")
+    parser.add_argument("--api-key", default=os.getenv("LITELLM_MASTER_KEY"), help="Key for the proxy, if needed")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    if args.proxy_url and not args.mock_port:
+        parser.error("--proxy-url needs --mock-port (the proxy has to be pointed at the mock)")
+    args.port = args.port or free_port()
+
+    recordings = load_recordings(args.paths) + [synthetic_recording(seed) for seed in range(args.synthetic)]
+    recordings = [recording for recording in recordings if recording.request is not None]
+    if not recordings:
+        parser.error("nothing to replay - pass traces (with the requests in them) or --synthetic")
+    if args.shuffle:
+        random.shuffle(recordings)
+
+    result = asyncio.run(_run(args, recordings))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>20}: {json.dumps(value) if isinstance(value, dict) else value}")
+
+    if result["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from copy import deepcopy
-from typing import AsyncGenerator, Callable, Generator, Optional, Union
+import time
+from typing import Any, AsyncGenerator, Callable, Generator, Optional, Union
 
 import httpx
 import litellm
@@ -16,23 +16,39 @@ from litellm import (
     ResponsesAPIStreamingResponse,
 )
 
-from claude_code_proxy.proxy_config import CODEX_SUBSCRIPTION_INSTRUCTIONS, ENFORCE_ONE_TOOL_CALL_PER_RESPONSE, OPENAI_REQUEST, SYSTEM_REMINDER_REMOVE, get_openai_account_id, get_openai_api_key_subscription
+from common.log import setup_logging
+
+# Before the imports below - some of the modules log as they are imported (the
+# token refresh in `proxy_config`, the OpenTelemetry setup)
+setup_logging()
+
+# pylint: disable=wrong-import-position
+from claude_code_proxy.proxy_config import CODEX_SUBSCRIPTION_INSTRUCTIONS, ENFORCE_ONE_TOOL_CALL_PER_RESPONSE, OPENAI_API_BASE, OPENAI_REQUEST, STREAM_TOOL_ARGUMENTS, SYSTEM_REMINDER_REMOVE, get_openai_account_id, get_openai_api_key_subscription
+from claude_code_proxy.proxy_app import install_proxy_app_hooks
 from claude_code_proxy.route_model import ModelRoute
 from common.refresh import ensure_token_fresh, on_auth_error, ensure_token_fresh_async, on_auth_error_async
 from common.config import WRITE_TRACES_TO_FILES
-from common.tracing_in_markdown import (
+from common.http_pool import HTTP_CLIENT_POOL
+from common.metrics import CHAT_COMPLETIONS_API, RESPONSES_API, RequestMetrics
+from common.otel import NOOP_SPAN, child_span, fail_span, inject_trace_context, start_span, start_stream_phases
+from common.profiling import REQUEST_PROFILER
+from common.request_id import OUTBOUND_REQUEST_ID_HEADER, current_request_id
+from common.tracing import (
+    finish_streaming_trace,
+    mark_trace,
+    write_error_trace,
     write_request_trace,
     write_response_trace,
     write_streaming_chunk_trace,
 )
 from common.utils import (
     ProxyError,
+    StreamTranslator,
     convert_chat_messages_to_respapi,
     convert_chat_params_to_respapi,
     convert_respapi_to_model_response,
+    generate_request_id,
     generate_timestamp_utc,
-    to_generic_streaming_chunk,
-    responses_eof_finalize_chunk,
 )
 
 
@@ -48,10 +64,42 @@ class RoutedRequest:
         api_base: str = None,
         headers: dict = None,
         litellm_params: dict = None,
+        span: Any = NOOP_SPAN,
     ) -> None:
+        started_at = time.perf_counter()
         self.timestamp = generate_timestamp_utc()
+        # The ID of the inbound request (see `common/request_id.py`), or a new
+        # one if the router is called outside of the proxy app
+        self.request_id = current_request_id() or generate_request_id()
+        # Unique per attempt (an auth retry is traced separately), and the
+        # trace files still sort by time
+        self.trace_id = f"{self.timestamp}_{self.request_id}"
         self.calling_method = calling_method
-        self.model_route = ModelRoute(model)
+        # The OpenTelemetry span of the request (see `common/otel.py`)
+        self.span = span
+        with child_span(span, "route_model"):
+            self.model_route = ModelRoute(model, request_id=self.request_id)
+        api = RESPONSES_API if self.model_route.use_responses_api else CHAT_COMPLETIONS_API
+        self.metrics = RequestMetrics(
+            target_model=self.model_route.target_model,
+            remapped=self.model_route.remapped_to != self.model_route.requested_model,
+            api=api,
+            calling_method=calling_method,
+        )
+        # A no-op unless the requests are being profiled (see `common/profiling.py`)
+        self.profile = REQUEST_PROFILER.claim(
+            requested_model=self.model_route.requested_model,
+            target_model=self.model_route.target_model,
+            request_id=self.request_id,
+        )
+        span.set_attributes(
+            {
+                "proxy.request_id": self.request_id,
+                "proxy.requested_model": self.model_route.requested_model,
+                "proxy.target_model": self.model_route.target_model,
+                "proxy.api": api,
+            }
+        )
         self.api_base = api_base
         self.headers = headers
         self.litellm_params = litellm_params or {}
@@ -59,8 +107,13 @@ class RoutedRequest:
         self.messages_original = messages_original
         self.params_original = params_original
 
-        self.messages_complapi = deepcopy(self.messages_original)
-        self.params_complapi = deepcopy(self.params_original)
+        # Copy-on-write: only the containers are copied here. The few entries
+        # the proxy rewrites (the system prompt slice, `<system-reminder>`
+        # blocks, metadata, temperature, etc.) are REPLACED with new objects
+        # further down, everything else is shared with the original request
+        # and MUST NOT be mutated in place.
+        self.messages_complapi = list(self.messages_original)
+        self.params_complapi = dict(self.params_original)
 
         self.params_complapi.update(self.model_route.extra_params)
         self.params_complapi["stream"] = stream
@@ -71,29 +124,35 @@ class RoutedRequest:
             self.params_complapi.pop("temperature", None)
 
         # For Langfuse
-        trace_name = f"{self.timestamp}-OUTBOUND-{self.calling_method}"
-        self.params_complapi.setdefault("metadata", {})["trace_name"] = trace_name
-
-        if not self.model_route.is_target_anthropic:
-            self._adapt_complapi_for_non_anthropic_models()
-
-        if self.model_route.use_responses_api:
-            self.messages_respapi = convert_chat_messages_to_respapi(self.messages_complapi)
-            self.params_respapi = convert_chat_params_to_respapi(self.params_complapi)
-        else:
-            self.messages_respapi = None
-            self.params_respapi = None
+        trace_name = f"{self.trace_id}-OUTBOUND-{self.calling_method}"
+        self.params_complapi["metadata"] = {**(self.params_complapi.get("metadata") or {}), "trace_name": trace_name}
+
+        with self.profile:
+            if not self.model_route.is_target_anthropic:
+                self._adapt_complapi_for_non_anthropic_models()
+
+            if self.model_route.use_responses_api:
+                with child_span(span, "convert_messages", {"proxy.messages": len(self.messages_complapi)}):
+                    self.messages_respapi = convert_chat_messages_to_respapi(self.messages_complapi)
+                with child_span(span, "convert_params"):
+                    self.params_respapi = convert_chat_params_to_respapi(
+                        self.params_complapi, parallel_tool_calls=self.model_route.parallel_tool_calls
+                    )
+            else:
+                self.messages_respapi = None
+                self.params_respapi = None
 
         # Resolve outbound API base URL from provider prefix
         target_provider = self.model_route.target_model.split("/")[0] if "/" in self.model_route.target_model else None
         _PROVIDER_API_BASES = {
-            "openai": "https://chatgpt.com/backend-api/codex" if OPENAI_REQUEST == "subscription" else "https://api.openai.com",
+            "openai": "https://chatgpt.com/backend-api/codex" if OPENAI_REQUEST == "subscription" else OPENAI_API_BASE,
             "openai-sub": "https://chatgpt.com/backend-api/codex",
             "anthropic": "https://api.anthropic.com",
             "gemini": "https://generativelanguage.googleapis.com",
             "azure": "https://<resource>.openai.azure.com",
         }
         self.outbound_api_base = _PROVIDER_API_BASES.get(target_provider)
+        self.outbound_provider = target_provider
 
         # Use subscription API key when targeting ChatGPT subscription endpoint
         _is_subscription = (
@@ -103,6 +162,7 @@ class RoutedRequest:
         _api_key_sub = get_openai_api_key_subscription()
         _account_id = get_openai_account_id()
         self.outbound_api_key = _api_key_sub if (_is_subscription and _api_key_sub) else None
+        self.outbound_account_id = _account_id if _is_subscription else None
 
         # Subscription endpoint adjustments
         if _is_subscription:
@@ -119,27 +179,53 @@ class RoutedRequest:
                 self.params_complapi.pop("metadata", None)
 
         # Outbound headers for subscription endpoint
-        self.outbound_headers = {}
+        self.outbound_headers = {OUTBOUND_REQUEST_ID_HEADER: self.request_id}
         if _is_subscription and _account_id:
             self.outbound_headers["chatgpt-account-id"] = _account_id
+        # (A no-op unless OpenTelemetry tracing is enabled)
+        inject_trace_context(self.outbound_headers, span)
 
         if WRITE_TRACES_TO_FILES:
-            write_request_trace(
-                timestamp=self.timestamp,
-                calling_method=self.calling_method,
-                inbound_api_base=self.api_base,
-                inbound_headers=self.headers,
-                outbound_api_base=self.outbound_api_base,
-                target_model=self.model_route.target_model,
-                requested_model=self.model_route.requested_model,
-                use_responses_api=self.model_route.use_responses_api,
-                messages_original=self.messages_original,
-                params_original=self.params_original,
-                messages_complapi=self.messages_complapi,
-                params_complapi=self.params_complapi,
-                messages_respapi=self.messages_respapi,
-                params_respapi=self.params_respapi,
-            )
+            with self.profile:
+                write_request_trace(
+                    trace_id=self.trace_id,
+                    calling_method=self.calling_method,
+                    request_id=self.request_id,
+                    inbound_api_base=self.api_base,
+                    inbound_headers=self.headers,
+                    outbound_api_base=self.outbound_api_base,
+                    target_model=self.model_route.target_model,
+                    requested_model=self.model_route.requested_model,
+                    use_responses_api=self.model_route.use_responses_api,
+                    messages_original=self.messages_original,
+                    params_original=self.params_original,
+                    messages_complapi=self.messages_complapi,
+                    params_complapi=self.params_complapi,
+                    messages_respapi=self.messages_respapi,
+                    params_respapi=self.params_respapi,
+                )
+
+        self.metrics.routed_request_built(time.perf_counter() - started_at)
+
+    def outbound_client(
+        self, client: Optional[Union[HTTPHandler, AsyncHTTPHandler]], *, is_async: bool
+    ) -> Optional[Union[HTTPHandler, AsyncHTTPHandler]]:
+        """
+        The client for the outbound LiteLLM call: the one that was passed to
+        the router, if any, otherwise the pooled (long-lived) one for the
+        target provider and account.
+
+        NOTE: For ChatCompletions calls to non-Anthropic providers LiteLLM
+        expects the provider's own SDK client rather than an httpx-based
+        handler, so for those LiteLLM still manages its clients on its own.
+        """
+        if client is not None:
+            return client
+        if not (self.model_route.use_responses_api or self.model_route.is_target_anthropic):
+            return None
+        if is_async:
+            return HTTP_CLIENT_POOL.get_async_handler(self.outbound_provider, self.outbound_account_id)
+        return HTTP_CLIENT_POOL.get_sync_handler(self.outbound_provider, self.outbound_account_id)
 
     def _adapt_complapi_for_non_anthropic_models(self) -> None:
         """
@@ -163,13 +249,16 @@ class RoutedRequest:
             and isinstance(self.messages_complapi[0].get("content"), list)
             and len(self.messages_complapi[0]["content"]) > 2
         ):
-            self.messages_complapi[0]["content"] = self.messages_complapi[0]["content"][2:]
+            self.messages_complapi[0] = {
+                **self.messages_complapi[0],
+                "content": self.messages_complapi[0]["content"][2:],
+            }
 
         # Strip <system-reminder> text blocks from user messages
         if SYSTEM_REMINDER_REMOVE:
-            for msg in self.messages_complapi:
+            for msg_idx, msg in enumerate(self.messages_complapi):
                 if msg.get("role") == "user" and isinstance(msg.get("content"), list):
-                    msg["content"] = [
+                    content = [
                         item for item in msg["content"]
                         if not (
                             isinstance(item, dict)
@@ -178,6 +267,10 @@ class RoutedRequest:
                             and item["text"].startswith("<system-reminder>\n")
                         )
                     ]
+                    if len(content) != len(msg["content"]):
+                        # Only the messages that actually contained reminders
+                        # get copied
+                        self.messages_complapi[msg_idx] = {**msg, "content": content}
 
 
         if (
@@ -190,17 +283,18 @@ class RoutedRequest:
             # to make sure non-Anthropic models don't fail because of exceeding
             # max_tokens
             self.params_complapi["max_tokens"] = 100
-            self.messages_complapi[0]["role"] = "system"
-            self.messages_complapi[0][
-                "content"
-            ] = "The intention of this request is to test connectivity. Please respond with a single word: OK"
+            self.messages_complapi[0] = {
+                **self.messages_complapi[0],
+                "role": "system",
+                "content": "The intention of this request is to test connectivity. Please respond with a single word: OK",
+            }
             return
 
         system_prompt_items = []
 
         # Only add the instruction if at least two tools and/or functions are present in the request (in total)
         num_tools = len(self.params_complapi.get("tools") or []) + len(self.params_complapi.get("functions") or [])
-        if ENFORCE_ONE_TOOL_CALL_PER_RESPONSE and num_tools > 1:
+        if ENFORCE_ONE_TOOL_CALL_PER_RESPONSE and not self.model_route.parallel_tool_calls and num_tools > 1:
             # Add the single tool call instruction as the last message
             # TODO Get rid of this hack after the token conversion code in
             #  `common/utils.py` is reimplemented. (Seems that it's not the
@@ -263,6 +357,10 @@ class ClaudeCodeRouter(CustomLLM):
     ) -> ModelResponse:
         ensure_token_fresh()
         for _attempt in range(2):
+            # To tell whether a 401 needs a refresh or the token was refreshed
+            # in the meantime (by a concurrent request)
+            api_key_sub = get_openai_api_key_subscription()
+            routed_request = None
             try:
                 routed_request = RoutedRequest(
                     calling_method="completion",
@@ -274,7 +372,14 @@ class ClaudeCodeRouter(CustomLLM):
                     headers=headers,
                     litellm_params=litellm_params,
                 )
+                if _attempt > 0:
+                    routed_request.metrics.auth_retry()
+                    if WRITE_TRACES_TO_FILES:
+                        # Retried after an auth error - keep the trace even if
+                        # it wasn't sampled
+                        mark_trace(routed_request.trace_id, "auth_retry")
 
+                routed_request.metrics.upstream_started()
                 if routed_request.model_route.use_responses_api:
                     response_or_stream = litellm.responses(
                         # TODO Make sure all params are supported
@@ -284,8 +389,10 @@ class ClaudeCodeRouter(CustomLLM):
                         api_key=routed_request.outbound_api_key,
                         logger_fn=logger_fn,
                         headers={**(headers or {}), **routed_request.outbound_headers},
+                        # (`litellm.responses()` doesn't send `headers`)
+                        extra_headers=routed_request.outbound_headers,
                         timeout=timeout,
-                        client=client,
+                        client=routed_request.outbound_client(client, is_async=False),
                         **routed_request.params_respapi,
                     )
 
@@ -297,7 +404,11 @@ class ClaudeCodeRouter(CustomLLM):
                     else:
                         response_respapi = response_or_stream
 
-                    response_complapi: ModelResponse = convert_respapi_to_model_response(response_respapi)
+                    routed_request.metrics.upstream_responded()
+                    with routed_request.profile:
+                        response_complapi: ModelResponse = convert_respapi_to_model_response(
+                            response_respapi, parallel_tool_calls=routed_request.model_route.parallel_tool_calls
+                        )
 
                 else:
                     response_respapi = None
@@ -309,25 +420,37 @@ class ClaudeCodeRouter(CustomLLM):
                         logger_fn=logger_fn,
                         headers={**(headers or {}), **routed_request.outbound_headers},
                         timeout=timeout,
-                        client=client,
+                        client=routed_request.outbound_client(client, is_async=False),
                         # Drop any params that are not supported by the provider
                         drop_params=True,
                         **routed_request.params_complapi,
                     )
+                    routed_request.metrics.upstream_responded()
 
                 if WRITE_TRACES_TO_FILES:
                     write_response_trace(
-                        timestamp=routed_request.timestamp,
+                        trace_id=routed_request.trace_id,
                         calling_method=routed_request.calling_method,
                         response_respapi=response_respapi,
                         response_complapi=response_complapi,
                     )
 
+                routed_request.metrics.finished(ok=True)
+                routed_request.profile.finish()
                 return response_complapi
 
             except Exception as e:
+                if routed_request is not None:
+                    routed_request.metrics.finished(ok=False)
+                    routed_request.profile.finish()
+                if WRITE_TRACES_TO_FILES and routed_request is not None:
+                    write_error_trace(
+                        trace_id=routed_request.trace_id,
+                        calling_method=routed_request.calling_method,
+                        error=e,
+                    )
                 if _attempt == 0 and _is_auth_error(e):
-                    on_auth_error()
+                    on_auth_error(failed_token=api_key_sub)
                     continue
                 raise ProxyError(e) from e
 
@@ -352,6 +475,11 @@ class ClaudeCodeRouter(CustomLLM):
     ) -> ModelResponse:
         await ensure_token_fresh_async()
         for _attempt in range(2):
+            # To tell whether a 401 needs a refresh or the token was refreshed
+            # in the meantime (by a concurrent request)
+            api_key_sub = get_openai_api_key_subscription()
+            routed_request = None
+            span = start_span("claude_code_router.acompletion", attributes={"proxy.attempt": _attempt})
             try:
                 routed_request = RoutedRequest(
                     calling_method="acompletion",
@@ -362,63 +490,94 @@ class ClaudeCodeRouter(CustomLLM):
                     api_base=api_base,
                     headers=headers,
                     litellm_params=litellm_params,
+                    span=span,
                 )
+                if _attempt > 0:
+                    routed_request.metrics.auth_retry()
+                    if WRITE_TRACES_TO_FILES:
+                        # Retried after an auth error - keep the trace even if
+                        # it wasn't sampled
+                        mark_trace(routed_request.trace_id, "auth_retry")
 
+                routed_request.metrics.upstream_started()
                 if routed_request.model_route.use_responses_api:
-                    response_or_stream = await litellm.aresponses(
-                        # TODO Make sure all params are supported
-                        model=routed_request.model_route.target_model,
-                        input=routed_request.messages_respapi,
-                        api_base=routed_request.outbound_api_base,
-                        api_key=routed_request.outbound_api_key,
-                        logger_fn=logger_fn,
-                        headers={**(headers or {}), **routed_request.outbound_headers},
-                        timeout=timeout,
-                        client=client,
-                        **routed_request.params_respapi,
-                    )
+                    with child_span(span, "upstream_call"):
+                        response_or_stream = await litellm.aresponses(
+                            # TODO Make sure all params are supported
+                            model=routed_request.model_route.target_model,
+                            input=routed_request.messages_respapi,
+                            api_base=routed_request.outbound_api_base,
+                            api_key=routed_request.outbound_api_key,
+                            logger_fn=logger_fn,
+                            headers={**(headers or {}), **routed_request.outbound_headers},
+                            # (`litellm.responses()` doesn't send `headers`)
+                            extra_headers=routed_request.outbound_headers,
+                            timeout=timeout,
+                            client=routed_request.outbound_client(client, is_async=True),
+                            **routed_request.params_respapi,
+                        )
 
-                    # Subscription forces stream=True; consume stream for non-streaming callers
-                    if isinstance(response_or_stream, BaseResponsesAPIStreamingIterator):
-                        response_respapi = None
-                        async for chunk in response_or_stream:
-                            response_respapi = chunk
-                    else:
-                        response_respapi = response_or_stream
+                        # Subscription forces stream=True; consume stream for non-streaming callers
+                        if isinstance(response_or_stream, BaseResponsesAPIStreamingIterator):
+                            response_respapi = None
+                            async for chunk in response_or_stream:
+                                response_respapi = chunk
+                        else:
+                            response_respapi = response_or_stream
 
-                    response_complapi: ModelResponse = convert_respapi_to_model_response(response_respapi)
+                    routed_request.metrics.upstream_responded()
+                    with routed_request.profile, child_span(span, "convert_response"):
+                        response_complapi: ModelResponse = convert_respapi_to_model_response(
+                            response_respapi, parallel_tool_calls=routed_request.model_route.parallel_tool_calls
+                        )
 
                 else:
                     response_respapi = None
-                    response_complapi: ModelResponse = await litellm.acompletion(
-                        model=routed_request.model_route.target_model,
-                        messages=routed_request.messages_complapi,
-                        api_base=routed_request.outbound_api_base,
-                        api_key=routed_request.outbound_api_key,
-                        logger_fn=logger_fn,
-                        headers={**(headers or {}), **routed_request.outbound_headers},
-                        timeout=timeout,
-                        client=client,
-                        # Drop any params that are not supported by the provider
-                        drop_params=True,
-                        **routed_request.params_complapi,
-                    )
+                    with child_span(span, "upstream_call"):
+                        response_complapi: ModelResponse = await litellm.acompletion(
+                            model=routed_request.model_route.target_model,
+                            messages=routed_request.messages_complapi,
+                            api_base=routed_request.outbound_api_base,
+                            api_key=routed_request.outbound_api_key,
+                            logger_fn=logger_fn,
+                            headers={**(headers or {}), **routed_request.outbound_headers},
+                            timeout=timeout,
+                            client=routed_request.outbound_client(client, is_async=True),
+                            # Drop any params that are not supported by the provider
+                            drop_params=True,
+                            **routed_request.params_complapi,
+                        )
+                    routed_request.metrics.upstream_responded()
 
                 if WRITE_TRACES_TO_FILES:
                     write_response_trace(
-                        timestamp=routed_request.timestamp,
+                        trace_id=routed_request.trace_id,
                         calling_method=routed_request.calling_method,
                         response_respapi=response_respapi,
                         response_complapi=response_complapi,
                     )
 
+                routed_request.metrics.finished(ok=True)
+                routed_request.profile.finish()
                 return response_complapi
 
             except Exception as e:
+                if routed_request is not None:
+                    routed_request.metrics.finished(ok=False)
+                    routed_request.profile.finish()
+                fail_span(span, e)
+                if WRITE_TRACES_TO_FILES and routed_request is not None:
+                    write_error_trace(
+                        trace_id=routed_request.trace_id,
+                        calling_method=routed_request.calling_method,
+                        error=e,
+                    )
                 if _attempt == 0 and _is_auth_error(e):
-                    await on_auth_error_async()
+                    await on_auth_error_async(failed_token=api_key_sub)
                     continue
                 raise ProxyError(e) from e
+            finally:
+                span.end()
 
     def streaming(
         self,
@@ -441,6 +600,13 @@ class ClaudeCodeRouter(CustomLLM):
     ) -> Generator[GenericStreamingChunk, None, None]:
         ensure_token_fresh()
         for _attempt in range(2):
+            # To tell whether a 401 needs a refresh or the token was refreshed
+            # in the meantime (by a concurrent request)
+            api_key_sub = get_openai_api_key_subscription()
+            routed_request = None
+            # The `finally` block also runs when the client goes away in the
+            # middle of the stream (`GeneratorExit`)
+            ok = failed = False
             try:
                 routed_request = RoutedRequest(
                     calling_method="streaming",
@@ -452,7 +618,14 @@ class ClaudeCodeRouter(CustomLLM):
                     headers=headers,
                     litellm_params=litellm_params,
                 )
+                if _attempt > 0:
+                    routed_request.metrics.auth_retry()
+                    if WRITE_TRACES_TO_FILES:
+                        # Retried after an auth error - keep the trace even if
+                        # it wasn't sampled
+                        mark_trace(routed_request.trace_id, "auth_retry")
 
+                routed_request.metrics.upstream_started()
                 if routed_request.model_route.use_responses_api:
                     resp_stream: BaseResponsesAPIStreamingIterator = litellm.responses(
                         # TODO Make sure all params are supported
@@ -462,8 +635,10 @@ class ClaudeCodeRouter(CustomLLM):
                         api_key=routed_request.outbound_api_key,
                         logger_fn=logger_fn,
                         headers={**(headers or {}), **routed_request.outbound_headers},
+                        # (`litellm.responses()` doesn't send `headers`)
+                        extra_headers=routed_request.outbound_headers,
                         timeout=timeout,
-                        client=client,
+                        client=routed_request.outbound_client(client, is_async=False),
                         **routed_request.params_respapi,
                     )
 
@@ -476,14 +651,22 @@ class ClaudeCodeRouter(CustomLLM):
                         logger_fn=logger_fn,
                         headers={**(headers or {}), **routed_request.outbound_headers},
                         timeout=timeout,
-                        client=client,
+                        client=routed_request.outbound_client(client, is_async=False),
                         # Drop any params that are not supported by the provider
                         drop_params=True,
                         **routed_request.params_complapi,
                     )
 
+                # Tool call state is per stream (concurrent streams must not share it)
+                translator = StreamTranslator(
+                    stream_tool_arguments=STREAM_TOOL_ARGUMENTS,
+                    parallel_tool_calls=routed_request.model_route.parallel_tool_calls,
+                )
+                chunk = None
                 for chunk_idx, chunk in enumerate[ModelResponseStream | ResponsesAPIStreamingResponse](resp_stream):
-                    generic_chunk = to_generic_streaming_chunk(chunk)
+                    routed_request.metrics.chunk_received()
+                    with routed_request.profile:
+                        generic_chunk = translator.to_generic_streaming_chunk(chunk)
 
                     if WRITE_TRACES_TO_FILES:
                         if routed_request.model_route.use_responses_api:
@@ -492,7 +675,7 @@ class ClaudeCodeRouter(CustomLLM):
                             respapi_chunk, complapi_chunk = None, chunk
 
                         write_streaming_chunk_trace(
-                            timestamp=routed_request.timestamp,
+                            trace_id=routed_request.trace_id,
                             calling_method=routed_request.calling_method,
                             chunk_idx=chunk_idx,
                             respapi_chunk=respapi_chunk,
@@ -500,28 +683,53 @@ class ClaudeCodeRouter(CustomLLM):
                             generic_chunk=generic_chunk,
                         )
 
+                    routed_request.metrics.chunk_converted()
+                    if translator.should_skip(generic_chunk):
+                        continue
                     yield generic_chunk
 
+                routed_request.metrics.stream_finished(
+                    chunk, extra_tool_items_ignored=translator.extra_tool_items_ignored
+                )
+
                 # EOF fallback: if provider ended stream without a terminal event and
                 # we have a pending tool with buffered args, emit once.
                 # TODO Refactor or get rid of the try/except block below after the
                 #  code in `common/utils.py` is owned (after the vibe-code there is
                 #  replaced with proper code)
                 try:
-                    eof_chunk = responses_eof_finalize_chunk()
+                    eof_chunk = translator.eof_finalize_chunk()
                     if eof_chunk is not None:
+                        routed_request.metrics.eof_fallback()
+                        if WRITE_TRACES_TO_FILES:
+                            mark_trace(routed_request.trace_id, "eof_fallback")
                         yield eof_chunk
                 except Exception:  # pylint: disable=broad-exception-caught
                     # Ignore; best-effort fallback
                     pass
 
+                ok = True
                 return
 
             except Exception as e:
+                failed = True
+                if WRITE_TRACES_TO_FILES and routed_request is not None:
+                    write_error_trace(
+                        trace_id=routed_request.trace_id,
+                        calling_method=routed_request.calling_method,
+                        error=e,
+                    )
                 if _attempt == 0 and _is_auth_error(e):
-                    on_auth_error()
+                    on_auth_error(failed_token=api_key_sub)
                     continue
                 raise ProxyError(e) from e
+            finally:
+                if routed_request is not None:
+                    routed_request.metrics.finished(ok=ok)
+                    routed_request.profile.finish()
+                    if WRITE_TRACES_TO_FILES and not failed:
+                        # (`write_error_trace()` finishes the trace of a failed stream)
+                        finish_streaming_trace(trace_id=routed_request.trace_id)
 
     async def astreaming(
         self,
@@ -544,6 +752,15 @@ class ClaudeCodeRouter(CustomLLM):
     ) -> AsyncGenerator[GenericStreamingChunk, None]:
         await ensure_token_fresh_async()
         for _attempt in range(2):
+            # To tell whether a 401 needs a refresh or the token was refreshed
+            # in the meantime (by a concurrent request)
+            api_key_sub = get_openai_api_key_subscription()
+            routed_request = None
+            span = start_span("claude_code_router.astreaming", attributes={"proxy.attempt": _attempt})
+            phases = None
+            # The `finally` block also runs when the client goes away in the
+            # middle of the stream (`CancelledError` or `GeneratorExit`)
+            ok = failed = False
             try:
                 routed_request = RoutedRequest(
                     calling_method="astreaming",
@@ -554,40 +771,62 @@ class ClaudeCodeRouter(CustomLLM):
                     api_base=api_base,
                     headers=headers,
                     litellm_params=litellm_params,
+                    span=span,
                 )
+                if _attempt > 0:
+                    routed_request.metrics.auth_retry()
+                    if WRITE_TRACES_TO_FILES:
+                        # Retried after an auth error - keep the trace even if
+                        # it wasn't sampled
+                        mark_trace(routed_request.trace_id, "auth_retry")
 
+                routed_request.metrics.upstream_started()
                 if routed_request.model_route.use_responses_api:
-                    resp_stream: BaseResponsesAPIStreamingIterator = await litellm.aresponses(
-                        # TODO Make sure all params are supported
-                        model=routed_request.model_route.target_model,
-                        input=routed_request.messages_respapi,
-                        api_base=routed_request.outbound_api_base,
-                        api_key=routed_request.outbound_api_key,
-                        logger_fn=logger_fn,
-                        headers={**(headers or {}), **routed_request.outbound_headers},
-                        timeout=timeout,
-                        client=client,
-                        **routed_request.params_respapi,
-                    )
+                    with child_span(span, "upstream_call"):
+                        resp_stream: BaseResponsesAPIStreamingIterator = await litellm.aresponses(
+                            # TODO Make sure all params are supported
+                            model=routed_request.model_route.target_model,
+                            input=routed_request.messages_respapi,
+                            api_base=routed_request.outbound_api_base,
+                            api_key=routed_request.outbound_api_key,
+                            logger_fn=logger_fn,
+                            headers={**(headers or {}), **routed_request.outbound_headers},
+                            # (`litellm.responses()` doesn't send `headers`)
+                            extra_headers=routed_request.outbound_headers,
+                            timeout=timeout,
+                            client=routed_request.outbound_client(client, is_async=True),
+                            **routed_request.params_respapi,
+                        )
 
                 else:
-                    resp_stream: CustomStreamWrapper = await litellm.acompletion(
-                        model=routed_request.model_route.target_model,
-                        messages=routed_request.messages_complapi,
-                        api_base=routed_request.outbound_api_base,
-                        api_key=routed_request.outbound_api_key,
-                        logger_fn=logger_fn,
-                        headers={**(headers or {}), **routed_request.outbound_headers},
-                        timeout=timeout,
-                        client=client,
-                        # Drop any params that are not supported by the provider
-                        drop_params=True,
-                        **routed_request.params_complapi,
-                    )
+                    with child_span(span, "upstream_call"):
+                        resp_stream: CustomStreamWrapper = await litellm.acompletion(
+                            model=routed_request.model_route.target_model,
+                            messages=routed_request.messages_complapi,
+                            api_base=routed_request.outbound_api_base,
+                            api_key=routed_request.outbound_api_key,
+                            logger_fn=logger_fn,
+                            headers={**(headers or {}), **routed_request.outbound_headers},
+                            timeout=timeout,
+                            client=routed_request.outbound_client(client, is_async=True),
+                            # Drop any params that are not supported by the provider
+                            drop_params=True,
+                            **routed_request.params_complapi,
+                        )
 
+                # Tool call state is per stream (concurrent streams must not share it)
+                translator = StreamTranslator(
+                    stream_tool_arguments=STREAM_TOOL_ARGUMENTS,
+                    parallel_tool_calls=routed_request.model_route.parallel_tool_calls,
+                )
                 chunk_idx = 0
+                chunk = None
+                phases = start_stream_phases(span)
                 async for chunk in resp_stream:
-                    generic_chunk = to_generic_streaming_chunk(chunk)
+                    routed_request.metrics.chunk_received()
+                    phases.chunk_received()
+                    with routed_request.profile:
+                        generic_chunk = translator.to_generic_streaming_chunk(chunk)
 
                     if WRITE_TRACES_TO_FILES:
                         if routed_request.model_route.use_responses_api:
@@ -596,16 +835,26 @@ class ClaudeCodeRouter(CustomLLM):
                             respapi_chunk, complapi_chunk = None, chunk
 
                         write_streaming_chunk_trace(
-                            timestamp=routed_request.timestamp,
+                            trace_id=routed_request.trace_id,
                             calling_method=routed_request.calling_method,
                             chunk_idx=chunk_idx,
                             respapi_chunk=respapi_chunk,
                             complapi_chunk=complapi_chunk,
                             generic_chunk=generic_chunk,
                         )
+                    # (Counts the skipped chunks too, like `enumerate()` in `streaming()`)
+                    chunk_idx += 1
 
+                    routed_request.metrics.chunk_converted()
+                    phases.chunk_converted()
+                    if translator.should_skip(generic_chunk):
+                        continue
                     yield generic_chunk
-                    chunk_idx += 1
+                    phases.consumer_resumed()
+
+                routed_request.metrics.stream_finished(
+                    chunk, extra_tool_items_ignored=translator.extra_tool_items_ignored
+                )
 
                 # EOF fallback: if provider ended stream without a terminal event and
                 # we have a pending tool with buffered args, emit once.
@@ -613,20 +862,44 @@ class ClaudeCodeRouter(CustomLLM):
                 #  code in `common/utils.py` is owned (after the vibe-code there is
                 #  replaced with proper code)
                 try:
-                    eof_chunk = responses_eof_finalize_chunk()
+                    eof_chunk = translator.eof_finalize_chunk()
                     if eof_chunk is not None:
+                        routed_request.metrics.eof_fallback()
+                        if WRITE_TRACES_TO_FILES:
+                            mark_trace(routed_request.trace_id, "eof_fallback")
                         yield eof_chunk
                 except Exception:  # pylint: disable=broad-exception-caught
                     # Ignore; best-effort fallback
                     pass
 
+                ok = True
                 return
 
             except Exception as e:
+                failed = True
+                fail_span(span, e)
+                if WRITE_TRACES_TO_FILES and routed_request is not None:
+                    write_error_trace(
+                        trace_id=routed_request.trace_id,
+                        calling_method=routed_request.calling_method,
+                        error=e,
+                    )
                 if _attempt == 0 and _is_auth_error(e):
-                    await on_auth_error_async()
+                    await on_auth_error_async(failed_token=api_key_sub)
                     continue
                 raise ProxyError(e) from e
+            finally:
+                if routed_request is not None:
+                    routed_request.metrics.finished(ok=ok)
+                    routed_request.profile.finish()
+                    if WRITE_TRACES_TO_FILES and not failed:
+                        # (`write_error_trace()` finishes the trace of a failed stream)
+                        finish_streaming_trace(trace_id=routed_request.trace_id)
+                if phases is not None:
+                    phases.end()
+                span.end()
 
 
 claude_code_router = ClaudeCodeRouter()
+
+install_proxy_app_hooks()
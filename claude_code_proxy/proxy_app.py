@@ -0,0 +1,52 @@
+"""
+Hooks into the FastAPI app of the LiteLLM proxy.
+
+LiteLLM imports the router (see `custom_provider_map` in `config.yaml`) while
+its app is already starting up, so there is no config option for any of this -
+the app is patched when the router module is imported.
+"""
+
+import sys
+
+from common.config import METRICS_ENABLED, PROFILING_ENABLED, SERVER_TIMING_ENABLED
+from common.metrics import MetricsEndpointMiddleware
+from common.otel import OTEL_ENABLED, TraceContextMiddleware
+from common.profiling import ProfilingEndpointMiddleware
+from common.request_id import RequestIdMiddleware
+from common.server_timing import ServerTimingMiddleware
+
+_installed = False
+
+
+def install_proxy_app_hooks() -> None:
+    """Add our middleware to the LiteLLM proxy app (a no-op outside of the proxy, e.g. in scripts)."""
+    global _installed  # pylint: disable=global-statement
+    if _installed:
+        return
+
+    proxy_server = sys.modules.get("litellm.proxy.proxy_server")
+    app = getattr(proxy_server, "app", None)
+    if app is None:
+        return
+
+    # The first one ends up innermost. (The server spans are tagged with the
+    # request IDs, metrics scrapes don't need either.)
+    middlewares = [TraceContextMiddleware] if OTEL_ENABLED else []
+    middlewares.append(RequestIdMiddleware)
+    if SERVER_TIMING_ENABLED:
+        middlewares.append(ServerTimingMiddleware)
+    if METRICS_ENABLED:
+        middlewares.append(MetricsEndpointMiddleware)
+    if PROFILING_ENABLED:
+        middlewares.append(ProfilingEndpointMiddleware)
+
+    for middleware in middlewares:
+        if app.middleware_stack is None:
+            # Not started yet - Starlette builds the middleware stack on the first request
+            # (`add_middleware()` puts the middleware outside of the ones added before)
+            app.add_middleware(middleware)
+        else:
+            # Already started - `add_middleware()` would raise, so wrap the stack that was built
+            app.middleware_stack = middleware(app.middleware_stack)
+
+    _installed = True
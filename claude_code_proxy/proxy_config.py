@@ -3,6 +3,7 @@ from pathlib import Path
 
 import litellm
 from common import config as common_config  # Makes sure .env is loaded  # pylint: disable=unused-import
+from common.credentials import CREDENTIALS
 from common.refresh import ensure_token_fresh
 from common.utils import env_var_to_bool
 
@@ -16,6 +17,12 @@ REMAP_CLAUDE_SONNET_TO = os.getenv("REMAP_CLAUDE_SONNET_TO", "gpt-5-codex-reason
 REMAP_CLAUDE_OPUS_TO = os.getenv("REMAP_CLAUDE_OPUS_TO", "gpt-5.1-reason-high")
 
 ENFORCE_ONE_TOOL_CALL_PER_RESPONSE = env_var_to_bool(os.getenv("ENFORCE_ONE_TOOL_CALL_PER_RESPONSE"), "true")
+STREAM_TOOL_ARGUMENTS = env_var_to_bool(os.getenv("STREAM_TOOL_ARGUMENTS"), "false")
+# Comma-separated model name patterns (fnmatch-style, e.g. "gpt-5*,openai/gpt-5.1-codex") of the routes that are
+# allowed to make multiple tool calls per response
+PARALLEL_TOOL_CALLS_MODELS = [
+    pattern.strip() for pattern in os.getenv("PARALLEL_TOOL_CALLS_MODELS", "").split(",") if pattern.strip()
+]
 
 # TODO Move these two constants to common/config.py ?
 ALWAYS_USE_RESPONSES_API = env_var_to_bool(os.getenv("ALWAYS_USE_RESPONSES_API"), "false")
@@ -23,6 +30,10 @@ ALWAYS_USE_STREAMING = env_var_to_bool(os.getenv("ALWAYS_USE_STREAMING"), "false
 SYSTEM_REMINDER_REMOVE = env_var_to_bool(os.getenv("SYSTEM_REMINDER_REMOVE"), "false")
 
 OPENAI_REQUEST = os.getenv("OPENAI_REQUEST", "api")
+# Where the `api` requests go - can be pointed elsewhere, e.g. at a local mock
+# server (see `benchmarks/mock_upstream.py`). A variable of the proxy's own:
+# `OPENAI_BASE_URL` is read by the OpenAI SDK and other tools as well
+OPENAI_API_BASE = os.getenv("CLAUDE_CODE_PROXY_OPENAI_API_BASE") or "https://api.openai.com"
 
 ensure_token_fresh()
 
@@ -31,11 +42,11 @@ OPENAI_ACCOUNT_ID = os.getenv("OPENAI_ACCOUNT_ID")
 
 
 def get_openai_api_key_subscription():
-    return os.getenv("OPENAI_API_KEY_SUBSCRIPTION")
+    return CREDENTIALS.current.access_token
 
 
 def get_openai_account_id():
-    return os.getenv("OPENAI_ACCOUNT_ID")
+    return CREDENTIALS.current.account_id
 
 _CODEX_INSTRUCTIONS_PATH = Path(__file__).parent / "codex_instructions.txt"
 CODEX_SUBSCRIPTION_INSTRUCTIONS = _CODEX_INSTRUCTIONS_PATH.read_text(encoding="utf-8").strip()
@@ -1,15 +1,20 @@
+import logging
 import re
-from typing import Any
+from fnmatch import fnmatchcase
+from typing import Any, Optional
 
 from claude_code_proxy.proxy_config import (
     ALWAYS_USE_RESPONSES_API,
     ANTHROPIC,
     OPENAI,
+    PARALLEL_TOOL_CALLS_MODELS,
     REMAP_CLAUDE_HAIKU_TO,
     REMAP_CLAUDE_OPUS_TO,
     REMAP_CLAUDE_SONNET_TO,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class ModelRoute:
     requested_model: str  # May or may not have a provider prefix
@@ -18,9 +23,11 @@ class ModelRoute:
     extra_params: dict[str, Any]
     is_target_anthropic: bool
     use_responses_api: bool
+    parallel_tool_calls: bool
 
-    def __init__(self, requested_model: str) -> None:
+    def __init__(self, requested_model: str, request_id: Optional[str] = None) -> None:
         self.requested_model = requested_model.strip()
+        self.request_id = request_id
 
         self._remap_model()
         self._finalize_model_route_object()
@@ -89,13 +96,40 @@ class ModelRoute:
         else:
             self.use_responses_api = ALWAYS_USE_RESPONSES_API
 
+        # The patterns may or may not mention the provider (and may or may not
+        # include our reasoning effort suffix)
+        self.parallel_tool_calls = any(
+            fnmatchcase(name, pattern)
+            for pattern in PARALLEL_TOOL_CALLS_MODELS
+            for name in (self.target_model, model_name_only, self.remapped_to)
+        )
+
     def _log_model_route(self) -> None:
+        if not logger.isEnabledFor(logging.INFO):
+            return
         log_message = f"\033[1m\033[32m{self.requested_model}\033[0m -> " f"\033[1m\033[36m{self.target_model}\033[0m"
         if self.extra_params:
             log_message += f" [\033[1m\033[33m{self._repr_extra_params()}\033[0m]"
-        # TODO Make it possible to disable this print ? (Turn it into a log
-        #  record ?)
-        print(log_message)
+        if self.parallel_tool_calls:
+            log_message += " [\033[1m\033[33mparallel tool calls\033[0m]"
+        if self.request_id:
+            log_message += f" \033[2m{self.request_id}\033[0m"
+        logger.info(
+            "%s -> %s",
+            self.requested_model,
+            self.target_model,
+            extra={
+                "request_id": self.request_id,
+                "fields": {
+                    "requested_model": self.requested_model,
+                    "target_model": self.target_model,
+                    "extra_params": self.extra_params,
+                    "parallel_tool_calls": self.parallel_tool_calls,
+                },
+                # The text format (see `common/log.py`)
+                "ansi": log_message,
+            },
+        )
 
     def _repr_extra_params(self) -> str:
         return ", ".join([f"{k}: {v}" for k, v in self.extra_params.items()])
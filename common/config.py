@@ -13,7 +13,54 @@ from common.utils import env_var_to_bool
 
 
 WRITE_TRACES_TO_FILES = env_var_to_bool(os.getenv("WRITE_TRACES_TO_FILES"), "false")
-TRACES_DIR = Path(__file__).parent.parent / ".traces"
+TRACES_DIR = Path(os.getenv("TRACES_DIR") or Path(__file__).parent.parent / ".traces")
+# `markdown` - human-readable files, `jsonl` - one compact file per request (see
+# `common/tracing_in_jsonl.py`), to be rendered into markdown on demand with
+# `python -m common.render_trace`
+TRACE_FORMAT = os.environ.get("TRACE_FORMAT", "markdown").strip().lower()
+# For the `jsonl` format: `zstd` (needs `zstandard`, falls back to `gzip`),
+# `gzip` or `none`
+TRACE_COMPRESSION = os.environ.get("TRACE_COMPRESSION", "zstd").strip().lower()
+# For the `jsonl` format: store the messages, the tool schemas and the
+# instructions once, in a content-addressed blob store (`<TRACES_DIR>/blobs/`),
+# and only refer to them from the request traces
+TRACE_DEDUP_BLOBS = env_var_to_bool(os.getenv("TRACE_DEDUP_BLOBS"), "true")
+# Sampling (see `common/trace_sampling.py`): the share of the requests that are
+# traced (0.0-1.0), optionally per model route - comma-separated
+# `<fnmatch-style model pattern>=<rate>` rules, e.g. "claude-*haiku*=0,gpt-5*=0.5"
+# (the first rule matching the requested or the target model wins)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SAMPLE_RULES = os.environ.get("TRACE_SAMPLE_RULES", "")
+# Tail-based sampling: the traces of the requests that were not sampled are
+# buffered in memory and only written if the request turned out to be slow,
+# failed, needed an auth retry or the EOF fallback
+TRACE_TAIL_SAMPLING = env_var_to_bool(os.getenv("TRACE_TAIL_SAMPLING"), "false")
+TRACE_TAIL_SLOW_MS = float(os.environ.get("TRACE_TAIL_SLOW_MS", "60000"))
+# The traces are written by a background thread (see `common/trace_writer.py`)
+TRACE_QUEUE_MAX_ITEMS = int(os.environ.get("TRACE_QUEUE_MAX_ITEMS", "10000"))
+TRACE_QUEUE_FULL_POLICY = os.environ.get("TRACE_QUEUE_FULL_POLICY", "drop").strip().lower()
+TRACE_WRITE_BATCH_SIZE = int(os.environ.get("TRACE_WRITE_BATCH_SIZE", "256"))
+TRACE_MAX_OPEN_FILES = int(os.environ.get("TRACE_MAX_OPEN_FILES", "128"))
+# Prometheus metrics of the router (see `common/metrics.py`)
+METRICS_ENABLED = env_var_to_bool(os.getenv("METRICS_ENABLED"), "true")
+METRICS_PATH = os.getenv("METRICS_PATH") or "/metrics"
+
+SERVER_TIMING_ENABLED = env_var_to_bool(os.getenv("SERVER_TIMING_ENABLED"), "true")
+
+# The proxy's own log records (see `common/log.py`), LiteLLM's are configured
+# with LITELLM_LOG
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").strip().upper()
+# `text` or `json` (one object per line)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").strip().lower()
+LOG_QUEUE_MAX_ITEMS = int(os.environ.get("LOG_QUEUE_MAX_ITEMS", "10000"))
+
+# On-demand profiling (see `common/profiling.py`) - the endpoints only exist
+# if it's enabled
+PROFILING_ENABLED = env_var_to_bool(os.getenv("PROFILING_ENABLED"), "false")
+PROFILING_PATH = (os.getenv("PROFILING_PATH") or "/debug/profiling").rstrip("/")
+PROFILES_DIR = Path(os.getenv("PROFILES_DIR") or Path(__file__).parent.parent / ".profiles")
+
+OTEL_TRACING = env_var_to_bool(os.getenv("OTEL_TRACING"), "false")
 
 if os.getenv("LANGFUSE_SECRET_KEY") or os.getenv("LANGFUSE_PUBLIC_KEY") or os.getenv("LANGFUSE_HOST"):
     try:
@@ -0,0 +1,188 @@
+"""In-memory store of the OpenAI subscription credentials.
+
+The request path only reads the current (immutable) snapshot - no env lookups,
+no parsing, no locks. The snapshot is replaced as a whole when the token is
+refreshed (see `common/refresh.py`), and the new values are written back to the
+.env file atomically.
+"""
+
+import errno
+import logging
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping, Optional
+
+from common import config as common_config  # Makes sure .env is loaded  # pylint: disable=unused-import
+
+_PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_ENV_PATH = _PROJECT_ROOT / ".env"
+
+logger = logging.getLogger(__name__)
+
+_ENV_KEYS = {
+    "access_token": "OPENAI_API_KEY_SUBSCRIPTION",
+    "account_id": "OPENAI_ACCOUNT_ID",
+    "refresh_token": "OPENAI_REFRESH_KEY_SUBSCRIPTION",
+    "client_id": "OPENAI_CLIENT_ID_SUBSCRIPTION",
+    "expires_at": "OPENAI_SUBSCRIPTION_EXPIRES_AT",
+}
+
+
+@dataclass(frozen=True)
+class Credentials:
+    access_token: Optional[str] = None
+    account_id: Optional[str] = None
+    refresh_token: Optional[str] = None
+    client_id: Optional[str] = None
+    # Unix timestamp, None if unknown
+    expires_at: Optional[int] = None
+
+    @classmethod
+    def from_env_values(cls, values: Mapping[str, Optional[str]]) -> "Credentials":
+        expires_at = values.get(_ENV_KEYS["expires_at"]) or ""
+        try:
+            parsed_expires_at = int(expires_at) if expires_at else None
+        except ValueError:
+            parsed_expires_at = None
+        return cls(
+            access_token=values.get(_ENV_KEYS["access_token"]) or None,
+            account_id=values.get(_ENV_KEYS["account_id"]) or None,
+            refresh_token=values.get(_ENV_KEYS["refresh_token"]) or None,
+            client_id=values.get(_ENV_KEYS["client_id"]) or None,
+            expires_at=parsed_expires_at,
+        )
+
+    def to_env_values(self) -> dict[str, str]:
+        values = {}
+        for field_name, env_key in _ENV_KEYS.items():
+            value = getattr(self, field_name)
+            if value is not None:
+                values[env_key] = str(value)
+        return values
+
+
+class CredentialStore:
+    """
+    Holds the current `Credentials`. Reading `current` is a plain attribute
+    read, and the snapshot is never mutated, only replaced, so the request path
+    needs no locking (the writers are serialized by `common/refresh.py`).
+    """
+
+    def __init__(self, credentials: Credentials) -> None:
+        self.current = credentials
+        # The values this process last wrote to / read from the .env file (None until then)
+        self._env_file_values: Optional[dict[str, str]] = None
+
+    def update(self, credentials: Credentials, env_path: Optional[Path] = None) -> bool:
+        """
+        Replace the credentials. If `env_path` is given, the new values are
+        then written back to that .env file (atomically). The in-memory
+        credentials are replaced first: after a refresh, the old refresh token
+        is spent, so the new one must not be lost if the file can't be written
+        (e.g. no .env at all, when the environment comes from `docker run
+        --env-file`) - such a failure is only logged. Returns whether the file
+        was written.
+        """
+        values = credentials.to_env_values()
+        # Other code (LiteLLM included) may still look at the environment
+        os.environ.update(values)
+        self.current = credentials
+        if env_path is None:
+            return False
+        return self.save(credentials, env_path)
+
+    def save(self, credentials: Credentials, env_path: Path) -> bool:
+        """Write `credentials` to the .env file, logging (not raising) a failure. Returns whether it was written."""
+        try:
+            write_env_file(env_path, credentials.to_env_values())
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.error("Failed to write the new credentials to %s: %s", env_path, exc)
+            return False
+        self._env_file_values = credentials.to_env_values()
+        return True
+
+    def reload_from_env_file(self, env_path: Path) -> Credentials:
+        """
+        Pick up the credentials that another process might have written to the
+        .env file. The file may as well be older than the memory (if writing
+        the refreshed credentials to it failed, it still holds the spent
+        refresh token), so its values are only taken if they expire later than
+        the current ones, or if the file changed since this process last wrote
+        (or read) it.
+        """
+        try:
+            content = env_path.read_text(encoding="utf-8")
+        except OSError:
+            return self.current
+        file_values = {}
+        for env_key in _ENV_KEYS.values():
+            match = re.search(rf"^{re.escape(env_key)}=(.*)$", content, flags=re.MULTILINE)
+            if match:
+                file_values[env_key] = match.group(1).strip()
+        credentials = Credentials.from_env_values({**self.current.to_env_values(), **file_values})
+        changed_elsewhere = self._env_file_values is not None and file_values != self._env_file_values
+        self._env_file_values = file_values
+        if credentials != self.current and (changed_elsewhere or _expires_later(credentials, self.current)):
+            self.update(credentials)
+        return self.current
+
+
+def _expires_later(credentials: Credentials, than: Credentials) -> bool:
+    if credentials.expires_at is None:
+        return False
+    return than.expires_at is None or credentials.expires_at > than.expires_at
+
+
+def write_env_file(env_path: Path, updates: Mapping[str, str]) -> None:
+    """
+    Update key=value pairs in a .env file, preserving comments, blanks, and
+    order. The new content is written to a temporary file that then replaces
+    the .env file, so readers never see a half-written file.
+    """
+    content = env_path.read_text(encoding="utf-8")
+
+    for key, value in updates.items():
+        pattern = rf"^({re.escape(key)})=.*$"
+        if re.search(pattern, content, flags=re.MULTILINE):
+            # lambda with default arg to avoid late-binding issues in the loop
+            content = re.sub(
+                pattern,
+                lambda m, v=value: f"{m.group(1)}={v}",
+                content,
+                flags=re.MULTILINE,
+            )
+        else:
+            # Key not found — append to end of file
+            if not content.endswith("\n"):
+                content += "\n"
+            content += f"{key}={value}\n"
+
+    fd, tmp_path = tempfile.mkstemp(dir=env_path.parent, prefix=".env.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        shutil.copymode(env_path, tmp_path)
+        try:
+            os.replace(tmp_path, env_path)
+        except OSError as exc:
+            if exc.errno != errno.EBUSY:
+                raise
+            # The .env file itself is a (Docker) bind mount, it can't be
+            # replaced - fall back to rewriting it in place
+            env_path.write_text(content, encoding="utf-8")
+            os.unlink(tmp_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+CREDENTIALS = CredentialStore(Credentials.from_env_values(os.environ))
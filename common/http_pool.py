@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Optional
+
+import httpx
+import litellm
+from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler, HTTPHandler, get_ssl_configuration
+
+from common.utils import env_var_to_bool
+
+logger = logging.getLogger(__name__)
+
+# The same defaults LiteLLM uses for the clients it creates on its own (the
+# timeout passed to the individual calls takes precedence)
+_DEFAULT_TIMEOUT = httpx.Timeout(timeout=600.0, connect=5.0)
+
+
+class _PooledAsyncHTTPHandler(AsyncHTTPHandler):
+    """
+    LiteLLM's async handler around a client that is owned by `HttpClientPool`
+    (LiteLLM only uses the handlers that are passed to it via `client=` if
+    they are instances of `AsyncHTTPHandler`).
+    """
+
+    def __init__(self, client: httpx.AsyncClient) -> None:  # pylint: disable=super-init-not-called
+        self.timeout = _DEFAULT_TIMEOUT
+        self.event_hooks = None
+        self.client = client
+        self.client_alias = "claude-code-proxy-pool"
+
+    async def close(self) -> None:
+        # The client is shared with other requests - the pool closes it
+        pass
+
+
+class _PooledHTTPHandler(HTTPHandler):
+    def close(self) -> None:
+        # The client is shared with other requests - the pool closes it
+        pass
+
+
+@dataclass
+class _PoolEntry:
+    key: Hashable
+    client: Any
+    handler: Any
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_used_at: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    connects: int = 0
+    tls_handshakes: int = 0
+
+
+class HttpClientPool:
+    """
+    Long-lived httpx clients (one per provider/account, separately for sync and
+    async calls) that are handed over to LiteLLM, so the outbound requests
+    reuse TCP/TLS connections (and, with HTTP/2, multiplex over a single one)
+    instead of doing a full handshake every time.
+
+    The clients that have been idle for longer than `idle_timeout_s` are
+    closed. Per-client counters (requests, requests in flight, new TCP
+    connections and TLS handshakes) are collected with httpcore's `trace`
+    extension and exposed by `stats()`.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        http2: bool,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry_s: float,
+        idle_timeout_s: float,
+    ) -> None:
+        self.enabled = enabled
+        self.http2 = http2 and _is_h2_installed()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.idle_timeout_s = idle_timeout_s
+
+        self._entries: dict[Hashable, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._last_reaped_at = time.monotonic()
+
+        self.clients_created = 0
+        self.clients_reaped = 0
+
+    def get_async_handler(self, provider: Optional[str], account: Optional[str] = None) -> Optional[AsyncHTTPHandler]:
+        """
+        Return the shared async handler for the given provider and account (or
+        None if the pool is disabled, in which case LiteLLM creates its own).
+        """
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        key = ("async", provider or "", account or "")
+        with self._lock:
+            self._reap_idle_clients()
+            entry = self._entries.get(key)
+            if entry is not None and entry.loop is not loop:
+                # httpx async clients can't be shared between event loops
+                self._entries.pop(key)
+                self._close_entry(entry)
+                entry = None
+            if entry is None:
+                entry = self._create_async_entry(key, loop)
+            entry.last_used_at = time.monotonic()
+            return entry.handler
+
+    def get_sync_handler(self, provider: Optional[str], account: Optional[str] = None) -> Optional[HTTPHandler]:
+        """Same as `get_async_handler()`, but for the sync LiteLLM calls."""
+        if not self.enabled:
+            return None
+        key = ("sync", provider or "", account or "")
+        with self._lock:
+            self._reap_idle_clients()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._create_sync_entry(key)
+            entry.last_used_at = time.monotonic()
+            return entry.handler
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            clients = [
+                {
+                    "kind": entry.key[0],
+                    "provider": entry.key[1],
+                    "account": entry.key[2],
+                    "age_s": round(now - entry.created_at, 3),
+                    "idle_s": round(now - entry.last_used_at, 3),
+                    "requests": entry.requests,
+                    "in_flight": entry.in_flight,
+                    "peak_in_flight": entry.peak_in_flight,
+                    "connects": entry.connects,
+                    "tls_handshakes": entry.tls_handshakes,
+                    "reused_connection_rate": (
+                        1 - entry.connects / entry.requests
+                        if entry.requests and entry.connects <= entry.requests
+                        else 0.0
+                    ),
+                    "utilization": (
+                        entry.in_flight / self.limits.max_connections if self.limits.max_connections else 0.0
+                    ),
+                }
+                for entry in self._entries.values()
+            ]
+            return {
+                "enabled": self.enabled,
+                "http2": self.http2,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "clients_created": self.clients_created,
+                "clients_reaped": self.clients_reaped,
+                "clients": clients,
+            }
+
+    def close_all(self) -> None:
+        """Close all the clients (the async ones - if their event loop is still running)."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._close_entry(entry)
+
+    def _client_kwargs(self, entry: _PoolEntry) -> dict[str, Any]:
+        ssl_config = get_ssl_configuration(None)
+        return {
+            "timeout": _DEFAULT_TIMEOUT,
+            "verify": ssl_config,
+            "cert": os.getenv("SSL_CERTIFICATE", litellm.ssl_certificate),
+            "follow_redirects": True,
+            "limits": self.limits,
+            "http2": self.http2,
+            "event_hooks": {"request": [self._make_request_hook(entry)]},
+        }
+
+    def _create_async_entry(self, key: Hashable, loop: asyncio.AbstractEventLoop) -> _PoolEntry:
+        entry = _PoolEntry(key=key, client=None, handler=None, loop=loop)
+        entry.client = httpx.AsyncClient(**self._client_kwargs(entry))
+        entry.handler = _PooledAsyncHTTPHandler(entry.client)
+        self._entries[key] = entry
+        self.clients_created += 1
+        return entry
+
+    def _create_sync_entry(self, key: Hashable) -> _PoolEntry:
+        entry = _PoolEntry(key=key, client=None, handler=None)
+        entry.client = httpx.Client(**self._client_kwargs(entry))
+        entry.handler = _PooledHTTPHandler(client=entry.client)
+        self._entries[key] = entry
+        self.clients_created += 1
+        return entry
+
+    def _make_request_hook(self, entry: _PoolEntry):
+        lock = self._lock
+        if entry.loop is None:
+
+            def request_hook(request: httpx.Request) -> None:
+                request.extensions["trace"] = _RequestTracer(entry, lock).on_event
+
+        else:
+
+            async def request_hook(request: httpx.Request) -> None:
+                tracer = _RequestTracer(entry, lock)
+
+                async def trace(event_name: str, _info: dict) -> None:
+                    tracer.on_event(event_name, _info)
+
+                request.extensions["trace"] = trace
+
+        return request_hook
+
+    def _reap_idle_clients(self) -> None:
+        # Must be called with the lock held
+        now = time.monotonic()
+        if now - self._last_reaped_at < min(self.idle_timeout_s, 60):
+            return
+        self._last_reaped_at = now
+        for key, entry in list(self._entries.items()):
+            if entry.in_flight <= 0 and now - entry.last_used_at > self.idle_timeout_s:
+                self._entries.pop(key)
+                self._close_entry(entry)
+                self.clients_reaped += 1
+
+    @staticmethod
+    def _close_entry(entry: _PoolEntry) -> None:
+        if entry.loop is None:
+            entry.client.close()
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is entry.loop:
+            entry.loop.create_task(entry.client.aclose())
+        elif not entry.loop.is_closed() and entry.loop.is_running():
+            asyncio.run_coroutine_threadsafe(entry.client.aclose(), entry.loop)
+        elif running_loop is not None:
+            # Its loop is gone - close what can still be closed from this one
+            running_loop.create_task(_aclose_orphaned_client(entry.client))
+
+
+class _RequestTracer:
+    """
+    Counts one request of a pooled client from httpcore's trace events (under
+    the lock of the pool - the same client is used from several threads, and
+    `stats()` reads the counters).
+    """
+
+    __slots__ = ("entry", "lock", "in_flight")
+
+    # A request is over once its response is closed. If a step of it failed,
+    # `response_closed` normally follows, but the request is counted as done
+    # right away (only once), so that a failure that can't be traced any
+    # further doesn't keep the client from being reaped. (A failed
+    # `send_request_*` is not final - httpcore goes on reading the response.)
+    _DONE_SUFFIXES = (
+        ".response_closed.complete",
+        ".response_closed.failed",
+        ".receive_response_headers.failed",
+        ".receive_response_body.failed",
+    )
+
+    def __init__(self, entry: _PoolEntry, lock: threading.Lock) -> None:
+        self.entry = entry
+        self.lock = lock
+        self.in_flight = False
+
+    def on_event(self, event_name: str, _info: dict) -> None:
+        entry = self.entry
+        if event_name.endswith(".send_request_headers.started"):
+            with self.lock:
+                entry.requests += 1
+                entry.in_flight += 1
+                entry.peak_in_flight = max(entry.peak_in_flight, entry.in_flight)
+            self.in_flight = True
+        elif event_name.endswith(self._DONE_SUFFIXES):
+            if self.in_flight:
+                self.in_flight = False
+                with self.lock:
+                    entry.in_flight -= 1
+                    entry.last_used_at = time.monotonic()
+        elif event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                entry.connects += 1
+        elif event_name == "connection.start_tls.complete":
+            with self.lock:
+                entry.tls_handshakes += 1
+
+
+async def _aclose_orphaned_client(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logger.debug("Failed to close an HTTP client of a closed event loop: %s", exc)
+
+
+def _is_h2_installed() -> bool:
+    try:
+        import h2  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        logger.warning(
+            "HTTP/2 is enabled for the outbound requests (HTTP_POOL_HTTP2), but the `h2` package is not installed "
+            "(`uv pip install h2`). Falling back to HTTP/1.1."
+        )
+        return False
+    return True
+
+
+HTTP_CLIENT_POOL = HttpClientPool(
+    enabled=env_var_to_bool(os.getenv("HTTP_POOL_ENABLED"), "true"),
+    http2=env_var_to_bool(os.getenv("HTTP_POOL_HTTP2"), "false"),
+    max_connections=int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry_s=float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY_S", "60")),
+    idle_timeout_s=float(os.environ.get("HTTP_POOL_IDLE_TIMEOUT_S", "300")),
+)
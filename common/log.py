@@ -0,0 +1,130 @@
+"""
+Logging of the proxy (the `common` and `claude_code_proxy` loggers - the
+modules log with `logging.getLogger(__name__)`).
+
+The records are put on a bounded queue and written to stdout by a background
+thread (`QueueListener`), so a slow stdout (e.g. a pipe nobody reads fast
+enough) never blocks the event loop - when the queue is full, the records are
+dropped (and counted in the `log_records_dropped` metric) instead. Every
+record gets the ID of the request it was logged for (see
+`common/request_id.py`).
+
+`LOG_FORMAT=text` (the default) prints the messages the way the proxy always
+did (coloured, see the `ansi` extra below), `LOG_FORMAT=json` prints one JSON
+object per line, with the `fields` extra merged into it:
+
+    logger.info(
+        "%s -> %s",
+        requested_model,
+        target_model,
+        extra={"fields": {"requested_model": ..., "target_model": ...}, "ansi": "<coloured text version>"},
+    )
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from common.config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_MAX_ITEMS
+from common.request_id import current_request_id
+
+LOGGER_NAMES = ("claude_code_proxy", "common")
+
+_DIM = "\033[2m"
+_RED = "\033[1;31m"
+_RESET = "\033[0m"
+_LEVEL_COLORS = {logging.DEBUG: _DIM, logging.WARNING: _RED, logging.ERROR: _RED, logging.CRITICAL: _RED}
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # In the thread that logs: the request ID is only known here, and the
+        # arguments may be mutated right after the call
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, "request_id", None) is None:
+            record.request_id = current_request_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Imported here: `common.metrics` imports modules that log as they
+            # are imported (`common.http_pool`), so logging must be set up first
+            from common.metrics import LOG_RECORDS_DROPPED  # pylint: disable=import-outside-toplevel
+
+            LOG_RECORDS_DROPPED.inc(())
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = getattr(record, "ansi", None)
+        if text is None:
+            text = record.getMessage()
+            fields = getattr(record, "fields", None)
+            if fields:
+                text += " " + json.dumps(fields, ensure_ascii=False, default=str)
+            color = _LEVEL_COLORS.get(record.levelno)
+            if color:
+                text = f"{color}{text}{_RESET}"
+            request_id = getattr(record, "request_id", None)
+            if request_id:
+                text += f" {_DIM}{request_id}{_RESET}"
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Attach the queue handler to the proxy's loggers (once per process)."""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_MAX_ITEMS)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+
+    for name in LOGGER_NAMES:
+        logger = logging.getLogger(name)
+        logger.addHandler(queue_handler)
+        logger.setLevel(LOG_LEVEL)
+        # LiteLLM configures the root logger its own way
+        logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    # Writes out what is still queued
+    atexit.register(_listener.stop)
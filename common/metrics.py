@@ -0,0 +1,504 @@
+"""
+Prometheus metrics of the router, served at `METRICS_PATH` (`/metrics`).
+
+Every request gets a `RequestMetrics` recorder (see `RoutedRequest`) that
+times the stages of the request - building the `RoutedRequest`, the upstream
+time to first byte, the stream duration and the gaps between the upstream
+chunks, the output token rate - and counts the auth retries, the EOF
+fallbacks and the extra tool items the stream translator had to ignore. All
+of them are labelled with the target model and the API format of the upstream
+request (`responses` or `chat_completions`), so a slow request can be told
+apart from a slow upstream. (Not with the requested model - any model name
+the clients send is routed to the router, see `target_model_label()`.)
+
+The counters of the pooled HTTP clients (see `common/http_pool.py`) and of
+the conversion caches (see `common/conversion_cache.py`) are exported too -
+read from them when the metrics are rendered.
+
+The same timings are returned to the client in the `Server-Timing` data of the
+responses (see `common/server_timing.py`).
+
+The metrics are kept in this process (and rendered in the Prometheus text
+format without any client library). With several LiteLLM workers every worker
+has its own metrics - scrape them per worker.
+
+NOTE: LiteLLM's own Prometheus callback mounts `/metrics` too - set
+`METRICS_PATH` to something else to have both.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Iterable, MutableMapping, Optional
+
+import litellm
+
+from common.config import METRICS_PATH
+from common.http_pool import HTTP_CLIENT_POOL
+from common.server_timing import current_server_timing
+from common.utils import RESPAPI_MESSAGES_CACHE, RESPAPI_TOOLS_CACHE, is_master_key_authorized
+
+_PREFIX = "claude_code_proxy_"
+REQUEST_LABELS = ("target_model", "api")
+OTHER_MODEL = "other"
+
+RESPONSES_API = "responses"
+CHAT_COMPLETIONS_API = "chat_completions"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = REQUEST_LABELS) -> None:
+        self.name = _PREFIX + name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = REQUEST_LABELS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: tuple[str, ...]) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}_total{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...],
+        labelnames: tuple[str, ...] = REQUEST_LABELS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (not cumulative, the last one is +Inf), sum]
+        self._values: dict[tuple[str, ...], list[Any]] = {}
+
+    def _series(self, labels: tuple[str, ...]) -> list[Any]:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        return series
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series(labels)
+            # (The bucket bounds are inclusive - `le`)
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def observe_many(self, labels: tuple[str, ...], values: Iterable[float]) -> None:
+        """Same as `observe()` for every value, but takes the lock once."""
+        buckets = self.buckets
+        with self._lock:
+            series = self._series(labels)
+            counts = series[0]
+            total = 0.0
+            for value in values:
+                counts[bisect_left(buckets, value)] += 1
+                total += value
+            series[1] += total
+
+    def count(self, labels: tuple[str, ...]) -> int:
+        series = self._values.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            series_labels = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{series_labels} {_format_value(total)}"
+            yield f"{self.name}_count{series_labels} {cumulative}"
+
+
+class CollectedMetric(_Metric):
+    """
+    A counter or a gauge that is kept elsewhere: `collect()` returns its
+    current values (by their labels) when the metrics are rendered.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        suffix = "_total" if self.kind == "counter" else ""
+        for labels, value in self.collect():
+            yield f"{self.name}{suffix}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.register(
+    Counter(
+        "requests",
+        "Requests handled by the router, by calling method and outcome (ok or error)",
+        REQUEST_LABELS + ("calling_method", "outcome"),
+    )
+)
+ROUTED_REQUEST_BUILD_SECONDS = REGISTRY.register(
+    Histogram(
+        "routed_request_build_seconds",
+        "Time to build the RoutedRequest (the conversion of the request and its trace included)",
+        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+)
+UPSTREAM_TTFB_SECONDS = REGISTRY.register(
+    Histogram(
+        "upstream_ttfb_seconds",
+        "Time from the upstream call to its first chunk (to the whole response if not streamed)",
+        (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0),
+    )
+)
+STREAM_DURATION_SECONDS = REGISTRY.register(
+    Histogram(
+        "stream_duration_seconds",
+        "Time from the upstream call to the end of its stream",
+        (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+    )
+)
+INTER_CHUNK_GAP_SECONDS = REGISTRY.register(
+    Histogram(
+        "inter_chunk_gap_seconds",
+        "Time between two successive upstream chunks of a stream",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    )
+)
+OUTPUT_TOKENS_PER_SECOND = REGISTRY.register(
+    Histogram(
+        "output_tokens_per_second",
+        "Output tokens of a stream (as reported by the upstream) per second after its first chunk",
+        (5.0, 10.0, 20.0, 35.0, 50.0, 75.0, 100.0, 150.0, 200.0, 300.0, 500.0),
+    )
+)
+AUTH_RETRIES = REGISTRY.register(Counter("auth_retries", "Requests retried after an authentication error"))
+EOF_FALLBACKS = REGISTRY.register(
+    Counter("eof_fallbacks", "Streams that ended without a terminal event, with a pending tool call")
+)
+EXTRA_TOOL_ITEMS_IGNORED = REGISTRY.register(
+    Counter("extra_tool_items_ignored", "Tool calls dropped because only one tool call per response is allowed")
+)
+LOG_RECORDS_DROPPED = REGISTRY.register(
+    Counter("log_records_dropped", "Log records dropped because the log queue was full", labelnames=())
+)
+
+# The pooled HTTP clients of the outbound requests (see `common/http_pool.py`).
+# The per-client series disappear when the client is closed.
+_HTTP_POOL_CLIENT_LABELS = ("kind", "provider", "account")
+
+
+def _http_pool_totals(key: str) -> Callable[[], Iterable[tuple[tuple[str, ...], float]]]:
+    return lambda: [((), HTTP_CLIENT_POOL.stats()[key])]
+
+
+def _http_pool_clients(key: str) -> Callable[[], Iterable[tuple[tuple[str, ...], float]]]:
+    def collect() -> Iterable[tuple[tuple[str, ...], float]]:
+        for client in HTTP_CLIENT_POOL.stats()["clients"]:
+            yield (client["kind"], client["provider"], client["account"]), client[key]
+
+    return collect
+
+
+HTTP_POOL_CLIENTS_CREATED = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "http_pool_clients_created",
+        "HTTP clients created by the pool",
+        _http_pool_totals("clients_created"),
+    )
+)
+HTTP_POOL_CLIENTS_REAPED = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "http_pool_clients_reaped",
+        "HTTP clients of the pool closed after being idle",
+        _http_pool_totals("clients_reaped"),
+    )
+)
+HTTP_POOL_REQUESTS = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "http_pool_requests",
+        "Requests sent by a pooled HTTP client",
+        _http_pool_clients("requests"),
+        _HTTP_POOL_CLIENT_LABELS,
+    )
+)
+HTTP_POOL_CONNECTS = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "http_pool_connects",
+        "New TCP connections opened by a pooled HTTP client",
+        _http_pool_clients("connects"),
+        _HTTP_POOL_CLIENT_LABELS,
+    )
+)
+HTTP_POOL_TLS_HANDSHAKES = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "http_pool_tls_handshakes",
+        "TLS handshakes done by a pooled HTTP client",
+        _http_pool_clients("tls_handshakes"),
+        _HTTP_POOL_CLIENT_LABELS,
+    )
+)
+HTTP_POOL_IN_FLIGHT = REGISTRY.register(
+    CollectedMetric(
+        "gauge",
+        "http_pool_in_flight",
+        "Requests of a pooled HTTP client that are in flight",
+        _http_pool_clients("in_flight"),
+        _HTTP_POOL_CLIENT_LABELS,
+    )
+)
+HTTP_POOL_PEAK_IN_FLIGHT = REGISTRY.register(
+    CollectedMetric(
+        "gauge",
+        "http_pool_peak_in_flight",
+        "The most requests a pooled HTTP client had in flight at once",
+        _http_pool_clients("peak_in_flight"),
+        _HTTP_POOL_CLIENT_LABELS,
+    )
+)
+
+# The caches of the request conversion (see `common/conversion_cache.py`)
+_CONVERSION_CACHES = (RESPAPI_MESSAGES_CACHE, RESPAPI_TOOLS_CACHE)
+
+
+def _conversion_caches(key: str) -> Callable[[], Iterable[tuple[tuple[str, ...], float]]]:
+    return lambda: [((cache.name,), cache.stats()[key]) for cache in _CONVERSION_CACHES]
+
+
+CONVERSION_CACHE_HITS = REGISTRY.register(
+    CollectedMetric(
+        "counter", "conversion_cache_hits", "Conversion cache hits", _conversion_caches("hits"), ("cache",)
+    )
+)
+CONVERSION_CACHE_MISSES = REGISTRY.register(
+    CollectedMetric(
+        "counter", "conversion_cache_misses", "Conversion cache misses", _conversion_caches("misses"), ("cache",)
+    )
+)
+CONVERSION_CACHE_EVICTIONS = REGISTRY.register(
+    CollectedMetric(
+        "counter",
+        "conversion_cache_evictions",
+        "Entries evicted from a conversion cache to stay within its bounds",
+        _conversion_caches("evictions"),
+        ("cache",),
+    )
+)
+
+
+def _output_tokens(chunk: Any) -> Optional[int]:
+    """The output tokens reported by the last chunk of a stream (`response.completed` or a usage chunk)."""
+    response = getattr(chunk, "response", None)
+    usage = getattr(response, "usage", None) if response is not None else getattr(chunk, "usage", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        tokens = usage.get("output_tokens") or usage.get("completion_tokens")
+    else:
+        tokens = getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", None)
+    return tokens if isinstance(tokens, int) else None
+
+
+def target_model_label(target_model: str, *, remapped: bool) -> str:
+    """
+    The `target_model` label of a request. The model names come from the
+    clients, so only the targets of the configured remaps and the models that
+    LiteLLM knows (from its model cost map) get label values of their own -
+    the rest are counted as `other`, to keep the number of series bounded.
+    """
+    if remapped or target_model in litellm.model_cost or target_model.split("/", 1)[-1] in litellm.model_cost:
+        return target_model
+    return OTHER_MODEL
+
+
+class RequestMetrics:
+    """Records the metrics of one request (an attempt, to be exact - an auth retry gets a new one)."""
+
+    __slots__ = (
+        "labels",
+        "calling_method",
+        "server_timing",
+        "_upstream_started_at",
+        "_first_chunk_at",
+        "_last_chunk_at",
+        "_gaps",
+    )
+
+    def __init__(self, *, target_model: str, remapped: bool, api: str, calling_method: str) -> None:
+        self.labels = (target_model_label(target_model, remapped=remapped), api)
+        self.calling_method = calling_method
+        # Shared by the attempts of the inbound request (None outside of the proxy app)
+        self.server_timing = current_server_timing()
+        self._upstream_started_at: Optional[float] = None
+        self._first_chunk_at: Optional[float] = None
+        self._last_chunk_at: Optional[float] = None
+        # Observed all at once at the end of the stream (one lock acquisition per stream)
+        self._gaps: list[float] = []
+
+    def routed_request_built(self, seconds: float) -> None:
+        ROUTED_REQUEST_BUILD_SECONDS.observe(self.labels, seconds)
+        if self.server_timing is not None:
+            self.server_timing.add_pre(seconds)
+
+    def auth_retry(self) -> None:
+        AUTH_RETRIES.inc(self.labels)
+
+    def upstream_started(self) -> None:
+        self._upstream_started_at = time.perf_counter()
+
+    def upstream_responded(self) -> None:
+        """The (whole) response of a non-streaming upstream call arrived."""
+        if self._upstream_started_at is not None:
+            self._upstream_ttfb(time.perf_counter() - self._upstream_started_at)
+
+    def _upstream_ttfb(self, seconds: float) -> None:
+        UPSTREAM_TTFB_SECONDS.observe(self.labels, seconds)
+        if self.server_timing is not None:
+            self.server_timing.upstream_ttfb_s = seconds
+
+    def chunk_received(self) -> None:
+        now = time.perf_counter()
+        if self._last_chunk_at is None:
+            self._first_chunk_at = now
+            if self._upstream_started_at is not None:
+                self._upstream_ttfb(now - self._upstream_started_at)
+        else:
+            self._gaps.append(now - self._last_chunk_at)
+        self._last_chunk_at = now
+
+    def chunk_converted(self) -> None:
+        """The chunk received last was converted (and traced)."""
+        if self.server_timing is not None and self._last_chunk_at is not None:
+            self.server_timing.chunks_s += time.perf_counter() - self._last_chunk_at
+            self.server_timing.chunks += 1
+
+    def eof_fallback(self) -> None:
+        EOF_FALLBACKS.inc(self.labels)
+
+    def stream_finished(self, last_chunk: Any, *, extra_tool_items_ignored: int = 0) -> None:
+        now = time.perf_counter()
+        if self._upstream_started_at is not None:
+            STREAM_DURATION_SECONDS.observe(self.labels, now - self._upstream_started_at)
+        if self._gaps:
+            INTER_CHUNK_GAP_SECONDS.observe_many(self.labels, self._gaps)
+            self._gaps = []
+        tokens = _output_tokens(last_chunk) if last_chunk is not None else None
+        if tokens and self._first_chunk_at is not None and self._last_chunk_at > self._first_chunk_at:
+            OUTPUT_TOKENS_PER_SECOND.observe(self.labels, tokens / (self._last_chunk_at - self._first_chunk_at))
+        if extra_tool_items_ignored:
+            EXTRA_TOOL_ITEMS_IGNORED.inc(self.labels, extra_tool_items_ignored)
+
+    def finished(self, *, ok: bool) -> None:
+        REQUESTS.inc(self.labels + (self.calling_method, "ok" if ok else "error"))
+
+
+_Scope = MutableMapping[str, Any]
+_Message = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[_Message]]
+_Send = Callable[[_Message], Awaitable[None]]
+
+
+class MetricsEndpointMiddleware:
+    """
+    Serves `GET <METRICS_PATH>` (a pure ASGI middleware, like
+    `RequestIdMiddleware`) - with the LITELLM_MASTER_KEY, if it is set (as
+    `x-api-key` or as a `Bearer` token, e.g. `authorization.credentials` of
+    the Prometheus scrape config).
+    """
+
+    def __init__(self, app: Callable[[_Scope, _Receive, _Send], Awaitable[None]], path: str = METRICS_PATH) -> None:
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http" or scope["path"] != self.path or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if is_master_key_authorized(scope.get("headers") or ()):
+            status = 200
+            body = REGISTRY.render().encode("utf-8")
+        else:
+            status = 401
+            body = b"Invalid or missing LITELLM_MASTER_KEY\n"
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body if scope["method"] == "GET" else b""})
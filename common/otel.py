@@ -0,0 +1,276 @@
+"""
+Optional OpenTelemetry tracing (`OTEL_TRACING=true`), exported over OTLP/HTTP
+(batched) to a collector - `http://localhost:4318` unless the standard
+`OTEL_EXPORTER_OTLP_ENDPOINT` / `OTEL_EXPORTER_OTLP_TRACES_ENDPOINT` say
+otherwise (the batching is tuned with the standard `OTEL_BSP_*` variables).
+
+`TraceContextMiddleware` starts a server span for every inbound request,
+continuing the trace of the caller if it sent a `traceparent` header. The
+router adds its spans under it:
+
+    POST /v1/messages
+    └── claude_code_router.astreaming (one per attempt)
+        ├── route_model
+        ├── convert_messages
+        ├── convert_params
+        ├── upstream_call
+        └── stream
+
+(`acompletion` has a `convert_response` span instead of `stream`.) There is no
+span per stream chunk - the `stream` span gets a `first_chunk` event and the
+time the stream spent waiting for the upstream, converting the chunks and
+waiting for the consumer (LiteLLM and the client) as attributes (see
+`StreamPhases`).
+
+The spans are started with explicit parents instead of being made current, so
+that they can be kept open across the `yield`s of the streaming generators.
+
+Needs `opentelemetry-sdk` and `opentelemetry-exporter-otlp-proto-http` (`uv pip
+install ...`) - without them (or with `OTEL_TRACING=false`) every function
+here is a no-op.
+"""
+
+import atexit
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, MutableMapping, Optional
+
+from common.config import OTEL_TRACING
+from common.request_id import current_request_id
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_SERVICE_NAME = "claude-code-proxy"
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[dict[str, Any]] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def set_status(self, status: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _setup_tracer() -> Optional[Any]:
+    if not OTEL_TRACING:
+        return None
+    # pylint: disable=import-outside-toplevel
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning(
+            "OTEL_TRACING is on, but OpenTelemetry is not installed. Please install it with "
+            "`uv pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http`."
+        )
+        return None
+
+    attributes = {} if os.getenv("OTEL_SERVICE_NAME") else {"service.name": _DEFAULT_SERVICE_NAME}
+    # A provider of our own (not the global one) - LiteLLM's `otel` callback, if enabled, keeps its own
+    provider = TracerProvider(resource=Resource.create(attributes))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    # Flushes the spans that are still batched
+    atexit.register(provider.shutdown)
+    logger.info("Enabling OpenTelemetry tracing...")
+    return provider.get_tracer("claude_code_proxy")
+
+
+_TRACER = _setup_tracer()
+OTEL_ENABLED = _TRACER is not None
+
+if OTEL_ENABLED:
+    # pylint: disable=ungrouped-imports,wrong-import-position,wrong-import-order
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+
+
+def start_span(name: str, *, parent: Optional[Any] = None, attributes: Optional[dict[str, Any]] = None) -> Any:
+    """
+    Start a span (end it with `span.end()`) under `parent`, or under the
+    current span (the server span of the inbound request) if there is no parent.
+    """
+    if not OTEL_ENABLED:
+        return NOOP_SPAN
+    context = trace.set_span_in_context(parent) if parent is not None else None
+    return _TRACER.start_span(name, context=context, attributes=attributes)
+
+
+@contextmanager
+def child_span(parent: Any, name: str, attributes: Optional[dict[str, Any]] = None) -> Iterator[Any]:
+    """A span around a block (recording the exception, if it raises)."""
+    if parent is NOOP_SPAN or not OTEL_ENABLED:
+        yield NOOP_SPAN
+        return
+    span = start_span(name, parent=parent, attributes=attributes)
+    try:
+        yield span
+    except BaseException as e:
+        fail_span(span, e)
+        raise
+    finally:
+        span.end()
+
+
+def fail_span(span: Any, error: BaseException) -> None:
+    if span is NOOP_SPAN:
+        return
+    span.record_exception(error)
+    span.set_status(Status(StatusCode.ERROR, str(error)[:200]))
+
+
+def inject_trace_context(headers: dict[str, str], span: Any) -> None:
+    """Add the `traceparent` of `span` to the outbound headers."""
+    if span is NOOP_SPAN or not OTEL_ENABLED:
+        return
+    propagate.inject(headers, context=trace.set_span_in_context(span))
+
+
+class StreamPhases:
+    """
+    Where the time of a stream goes: waiting for the next upstream chunk,
+    converting (and tracing) it, and waiting until the consumer asks for the
+    next one. Recorded on the `stream` span when the stream ends.
+    """
+
+    __slots__ = ("span", "chunks", "upstream_s", "convert_s", "consumer_s", "_mark")
+
+    def __init__(self, span: Any) -> None:
+        self.span = span
+        self.chunks = 0
+        self.upstream_s = 0.0
+        self.convert_s = 0.0
+        self.consumer_s = 0.0
+        self._mark = time.perf_counter()
+
+    def chunk_received(self) -> None:
+        now = time.perf_counter()
+        self.upstream_s += now - self._mark
+        self._mark = now
+        if self.chunks == 0:
+            self.span.add_event("first_chunk")
+        self.chunks += 1
+
+    def chunk_converted(self) -> None:
+        now = time.perf_counter()
+        self.convert_s += now - self._mark
+        self._mark = now
+
+    def consumer_resumed(self) -> None:
+        now = time.perf_counter()
+        self.consumer_s += now - self._mark
+        self._mark = now
+
+    def end(self) -> None:
+        self.span.set_attributes(
+            {
+                "stream.chunks": self.chunks,
+                "stream.upstream_wait_ms": round(self.upstream_s * 1000, 3),
+                "stream.convert_ms": round(self.convert_s * 1000, 3),
+                "stream.consumer_wait_ms": round(self.consumer_s * 1000, 3),
+            }
+        )
+        self.span.end()
+
+
+class _NoopStreamPhases:
+    __slots__ = ()
+
+    def chunk_received(self) -> None:
+        pass
+
+    def chunk_converted(self) -> None:
+        pass
+
+    def consumer_resumed(self) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_STREAM_PHASES = _NoopStreamPhases()
+
+
+def start_stream_phases(parent: Any) -> Any:
+    """Start the `stream` span under `parent` (end it with `.end()`)."""
+    if parent is NOOP_SPAN or not OTEL_ENABLED:
+        return _NOOP_STREAM_PHASES
+    return StreamPhases(start_span("stream", parent=parent))
+
+
+_Scope = MutableMapping[str, Any]
+_Message = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[_Message]]
+_Send = Callable[[_Message], Awaitable[None]]
+
+
+class TraceContextMiddleware:
+    """
+    A pure ASGI middleware (see `RequestIdMiddleware`) that wraps every HTTP
+    request into a server span, continuing the trace of the inbound
+    `traceparent` header, if any. Has to run inside `RequestIdMiddleware` to
+    tag the span with the request ID.
+    """
+
+    def __init__(self, app: Callable[[_Scope, _Receive, _Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http" or not OTEL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers") or ()}
+        parent_context = propagate.extract(carrier)
+        span = _TRACER.start_span(
+            f"{scope['method']} {scope['path']}",
+            context=parent_context,
+            kind=SpanKind.SERVER,
+            attributes={
+                "http.request.method": scope["method"],
+                "url.path": scope["path"],
+                "proxy.request_id": current_request_id() or "",
+            },
+        )
+
+        async def send_with_status(message: _Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+            await send(message)
+
+        token = otel_context.attach(trace.set_span_in_context(span, parent_context))
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            fail_span(span, e)
+            raise
+        finally:
+            otel_context.detach(token)
+            span.end()
@@ -0,0 +1,366 @@
+"""
+On-demand profiling of a running proxy (`PROFILING_ENABLED=true`), switched
+on over HTTP - no restart, no rebuilt container:
+
+    GET    /debug/profiling                                   what is running, the profiles written so far
+    POST   /debug/profiling/cpu?seconds=30&interval_ms=5      sample the stacks of the event loop
+    POST   /debug/profiling/requests?model=gpt-5*&count=5     cProfile the next requests for matching models
+    DELETE /debug/profiling/requests                          stop profiling requests
+    POST   /debug/profiling/allocations?seconds=60&frames=25  trace the memory allocations (tracemalloc)
+
+The profiles are written to `PROFILES_DIR` (`.profiles/`):
+
+- `cpu-<timestamp>.folded` - the sampled stacks in the collapsed format (one
+  `frame;frame;...;frame <samples>` line per distinct stack) for
+  flamegraph.pl, speedscope, inferno, etc. An idle event loop shows up as its
+  `select()`.
+- `request-<timestamp>_<request ID>.pstats` - for `python -m pstats`,
+  snakeviz, etc. Only the synchronous work of the proxy is profiled - the
+  conversions (and the trace) in `RoutedRequest` and the conversion of every
+  chunk of the response - not the awaits in between, during which the event
+  loop runs the other requests. The model pattern (`fnmatch`-style) is
+  matched against the requested and the target model. NOTE: Since Python
+  3.12 cProfile sees all the threads, so the background threads (the trace
+  and the log writers) may show up too, and switching it on and off for
+  every chunk adds tens of microseconds per chunk to the profiled requests.
+- `allocations-<timestamp>.txt` - the memory allocated during the window and
+  still alive at its end, by the innermost line of the proxy's own code that
+  allocated it (the conversion helpers, the caches - the middlewares that
+  only pass the requests through don't count), and the whole snapshot,
+  `allocations-<timestamp>.tracemalloc` (`tracemalloc.Snapshot.load()`).
+  Tracing the allocations slows the proxy down noticeably while it lasts.
+
+If `LITELLM_MASTER_KEY` is set, the endpoints require it, like the rest of the
+proxy (`Authorization: Bearer <key>` or `x-api-key: <key>`).
+"""
+
+import cProfile
+import json
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Awaitable, Callable, MutableMapping, Optional
+from urllib.parse import parse_qs
+
+from common.config import PROFILES_DIR, PROFILING_PATH
+from common.utils import generate_timestamp_utc, is_master_key_authorized
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = str(Path(__file__).parent.parent)
+_MAX_WINDOW_S = 600.0
+_MIN_SAMPLING_INTERVAL_S = 0.001
+_ALLOCATION_REPORT_LINES = 50
+# Everything LiteLLM allocates would be attributed to their `await self.app(...)`
+_PASSTHROUGH_FILES = {
+    str(Path(__file__).parent / name)
+    for name in ("metrics.py", "otel.py", "profiling.py", "request_id.py", "server_timing.py")
+}
+
+# Only one deterministic profiler can be active at a time (per process, since
+# Python 3.12). The profiled sections are synchronous, so on the event loop
+# they never overlap - but the sync handlers run in threads.
+_CPROFILE_LOCK = threading.Lock()
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_PROJECT_ROOT):
+        return os.path.relpath(filename, _PROJECT_ROOT)
+    return "/".join(Path(filename).parts[-2:])
+
+
+class RequestProfile:
+    """cProfile of one request, enabled around its synchronous sections (`with profile: ...`)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.skipped_sections = 0
+        self._profiler = cProfile.Profile()
+        self._active = False
+
+    def __enter__(self) -> "RequestProfile":
+        if _CPROFILE_LOCK.acquire(blocking=False):
+            self._active = True
+            self._profiler.enable()
+        else:
+            # Another request is being profiled in another thread
+            self.skipped_sections += 1
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._active:
+            self._profiler.disable()
+            self._active = False
+            _CPROFILE_LOCK.release()
+
+    def finish(self) -> None:
+        # Never fails the request that was profiled (e.g. `PROFILES_DIR` is not writable)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._profiler.dump_stats(self.path)
+        except OSError as exc:
+            logger.error("Failed to write the request profile %s: %r", self.path, exc)
+            return
+        logger.info(
+            "Request profile written to %s",
+            self.path,
+            extra={"fields": {"profile": str(self.path), "skipped_sections": self.skipped_sections}},
+        )
+
+
+class _NoopRequestProfile:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopRequestProfile":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NOOP_REQUEST_PROFILE = _NoopRequestProfile()
+
+
+class RequestProfiler:
+    """Hands out `RequestProfile`s to the next `remaining` requests that match `model_pattern`."""
+
+    def __init__(self) -> None:
+        self.model_pattern = "*"
+        self.remaining = 0
+        self._lock = threading.Lock()
+
+    def arm(self, model_pattern: str, count: int) -> None:
+        with self._lock:
+            self.model_pattern = model_pattern
+            self.remaining = count
+
+    def disarm(self) -> None:
+        with self._lock:
+            self.remaining = 0
+
+    def claim(self, *, requested_model: str, target_model: str, request_id: str) -> Any:
+        if self.remaining <= 0:
+            # Not armed (the usual case - no lock)
+            return NOOP_REQUEST_PROFILE
+        models = (requested_model, target_model, target_model.split("/", 1)[-1])
+        with self._lock:
+            if self.remaining <= 0 or not any(fnmatchcase(model, self.model_pattern) for model in models):
+                return NOOP_REQUEST_PROFILE
+            self.remaining -= 1
+        return RequestProfile(PROFILES_DIR / f"request-{generate_timestamp_utc()}_{request_id}.pstats")
+
+
+REQUEST_PROFILER = RequestProfiler()
+
+
+def _sample_stacks(thread_id: int, seconds: float, interval_s: float, path: Path) -> None:
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+        if frame is None:
+            # The thread is gone
+            break
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{_short_path(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stacks[";".join(reversed(stack))] += 1
+        time.sleep(interval_s)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for stack, samples in stacks.most_common():
+            f.write(f"{stack} {samples}\n")
+    logger.info(
+        "CPU profile (%d samples) written to %s",
+        sum(stacks.values()),
+        path,
+        extra={"fields": {"profile": str(path)}},
+    )
+
+
+def _trace_allocations(seconds: float, frames: int, path: Path) -> None:
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(frames)
+    try:
+        time.sleep(seconds)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    # Attributed to the innermost frame in the proxy's own code (e.g. a
+    # `deepcopy()` to the conversion helper that called it)
+    by_line: dict[tuple[str, int], list[int]] = defaultdict(lambda: [0, 0])
+    total_size = 0
+    for trace in snapshot.traces:
+        total_size += trace.size
+        for frame in reversed(trace.traceback):
+            if frame.filename.startswith(_PROJECT_ROOT) and frame.filename not in _PASSTHROUGH_FILES:
+                entry = by_line[(frame.filename, frame.lineno)]
+                entry[0] += trace.size
+                entry[1] += 1
+                break
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snapshot.dump(str(path.with_suffix(".tracemalloc")))
+    own_size = sum(size for size, _ in by_line.values())
+    lines = [
+        f"Allocated during {seconds:g}s and still alive: {total_size / 1024:.1f} KiB, "
+        f"{own_size / 1024:.1f} KiB of it from the proxy's code (innermost {frames} frames)",
+        "",
+        f"{'KiB':>10} {'blocks':>8}  line",
+    ]
+    ranked = sorted(by_line.items(), key=lambda item: item[1][0], reverse=True)
+    for (filename, lineno), (size, count) in ranked[:_ALLOCATION_REPORT_LINES]:
+        source = linecache.getline(filename, lineno).strip()
+        lines.append(f"{size / 1024:>10.1f} {count:>8}  {_short_path(filename)}:{lineno}  {source}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    logger.info("Allocation profile written to %s", path, extra={"fields": {"profile": str(path)}})
+
+
+class _Jobs:
+    """The CPU sampling and the allocation tracing (one of each at a time), in background threads."""
+
+    def __init__(self) -> None:
+        self.cpu: Optional[threading.Thread] = None
+        self.allocations: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _is_running(job: Optional[threading.Thread]) -> bool:
+        return job is not None and job.is_alive()
+
+    def start_cpu(self, thread_id: int, seconds: float, interval_s: float, path: Path) -> bool:
+        if self._is_running(self.cpu):
+            return False
+        self.cpu = threading.Thread(
+            target=_sample_stacks, args=(thread_id, seconds, interval_s, path), name="cpu-profile", daemon=True
+        )
+        self.cpu.start()
+        return True
+
+    def start_allocations(self, seconds: float, frames: int, path: Path) -> bool:
+        if self._is_running(self.allocations):
+            return False
+        self.allocations = threading.Thread(
+            target=_trace_allocations, args=(seconds, frames, path), name="allocation-profile", daemon=True
+        )
+        self.allocations.start()
+        return True
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "cpu": self._is_running(self.cpu),
+            "allocations": self._is_running(self.allocations),
+            "requests": {"model": REQUEST_PROFILER.model_pattern, "remaining": REQUEST_PROFILER.remaining},
+            "profiles": sorted(p.name for p in PROFILES_DIR.glob("*")) if PROFILES_DIR.is_dir() else [],
+        }
+
+
+_JOBS = _Jobs()
+
+_Scope = MutableMapping[str, Any]
+_Message = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[_Message]]
+_Send = Callable[[_Message], Awaitable[None]]
+
+
+async def _respond(send: _Send, status: int, payload: dict[str, Any]) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _float_param(params: dict[str, list[str]], name: str, default: float, maximum: float) -> float:
+    value = float(params[name][0]) if name in params else default
+    if not 0 < value <= maximum:
+        raise ValueError(f"`{name}` must be in (0, {maximum:g}]")
+    return value
+
+
+class ProfilingEndpointMiddleware:
+    """Serves the profiling endpoints under `PROFILING_PATH` (a pure ASGI middleware, like `RequestIdMiddleware`)."""
+
+    def __init__(self, app: Callable[[_Scope, _Receive, _Send], Awaitable[None]], path: str = PROFILING_PATH) -> None:
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http" or not (scope["path"] == self.path or scope["path"].startswith(self.path + "/")):
+            await self.app(scope, receive, send)
+            return
+        if not is_master_key_authorized(scope.get("headers") or ()):
+            await _respond(send, 401, {"error": "Invalid or missing LITELLM_MASTER_KEY"})
+            return
+
+        action = scope["path"][len(self.path) :].strip("/")
+        method = scope["method"]
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        timestamp = generate_timestamp_utc()
+        try:
+            if action == "" and method == "GET":
+                await _respond(send, 200, _JOBS.status())
+
+            elif action == "cpu" and method == "POST":
+                seconds = _float_param(params, "seconds", 30.0, _MAX_WINDOW_S)
+                interval_s = _float_param(params, "interval_ms", 5.0, 1000.0) / 1000
+                path = PROFILES_DIR / f"cpu-{timestamp}.folded"
+                # This middleware runs on the event loop thread - that's the one to sample
+                started = _JOBS.start_cpu(
+                    threading.get_ident(), seconds, max(interval_s, _MIN_SAMPLING_INTERVAL_S), path
+                )
+                if started:
+                    await _respond(send, 202, {"profile": str(path), "seconds": seconds})
+                else:
+                    await _respond(send, 409, {"error": "A CPU profile is already being sampled"})
+
+            elif action == "requests" and method == "POST":
+                count = int(params.get("count", ["1"])[0])
+                if count <= 0:
+                    raise ValueError("`count` must be positive")
+                REQUEST_PROFILER.arm(params.get("model", ["*"])[0], count)
+                await _respond(send, 202, {"model": REQUEST_PROFILER.model_pattern, "remaining": count})
+
+            elif action == "requests" and method == "DELETE":
+                REQUEST_PROFILER.disarm()
+                await _respond(send, 200, {"remaining": 0})
+
+            elif action == "allocations" and method == "POST":
+                seconds = _float_param(params, "seconds", 60.0, _MAX_WINDOW_S)
+                frames = int(params.get("frames", ["25"])[0])
+                if frames <= 0:
+                    raise ValueError("`frames` must be positive")
+                path = PROFILES_DIR / f"allocations-{timestamp}.txt"
+                if _JOBS.start_allocations(seconds, frames, path):
+                    await _respond(send, 202, {"profile": str(path), "seconds": seconds})
+                else:
+                    await _respond(send, 409, {"error": "Allocations are already being traced"})
+
+            else:
+                await _respond(send, 404, {"error": f"No such profiling endpoint: {method} {scope['path']}"})
+
+        except ValueError as e:
+            await _respond(send, 400, {"error": str(e)})
@@ -1,30 +1,50 @@
 """OpenAI OAuth token refresh module.
 
-Refreshes the OpenAI subscription access token and updates the .env file.
+Refreshes the OpenAI subscription access token, updates the in-memory
+credentials (see `common/credentials.py`) and writes them back to the .env file.
 """
 
 import asyncio
 import base64
 import json
+import logging
 import os
-import re
-import shutil
+import random
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
 
 import httpx
 
+from common.credentials import CREDENTIALS, DEFAULT_ENV_PATH, Credentials
+from common.http_pool import HTTP_CLIENT_POOL
 from common.utils import ProxyError
 
-_PROJECT_ROOT = Path(__file__).parent.parent
-_DEFAULT_ENV_PATH = _PROJECT_ROOT / ".env"
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
 _OPENAI_TOKEN_URL = "https://auth.openai.com/oauth/token"
+# Bounded timeouts and retries for the token endpoint (only network errors,
+# 429 and 5xx are retried - a rejected refresh token won't get any better)
+_TOKEN_REQUEST_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+_TOKEN_REQUEST_ATTEMPTS = 3
+_TOKEN_REQUEST_BACKOFF_SECONDS = 0.5
 _REFRESH_BUFFER_SECONDS = 7 * 24 * 60 * 60  # 7 days
+# The background task refreshes the token a bit earlier than the request path
+# would, so the requests normally never have to wait for a refresh
+_PROACTIVE_REFRESH_MARGIN_SECONDS = 60 * 60
+_PROACTIVE_REFRESH_RETRY_SECONDS = 5 * 60
 
 # ANSI color codes (matching project conventions from config.py / utils.py)
 _RED = "\033[1;31m"
-_BLUE = "\033[1;34m"
 _GREEN = "\033[1;32m"
 _RESET = "\033[0m"
 
@@ -48,174 +68,361 @@ def _decode_jwt_payload(token: str) -> dict[str, Any]:
         raise ProxyError(f"Failed to decode JWT payload: {exc}") from exc
 
 
-def _update_env_file(env_path: Path, updates: dict[str, str]) -> None:
-    """Update key=value pairs in a .env file, preserving comments, blanks, and order."""
-    content = env_path.read_text(encoding="utf-8")
-
-    for key, value in updates.items():
-        pattern = rf"^({re.escape(key)})=.*$"
-        if re.search(pattern, content, flags=re.MULTILINE):
-            # lambda with default arg to avoid late-binding issues in the loop
-            content = re.sub(
-                pattern,
-                lambda m, v=value: f"{m.group(1)}={v}",
-                content,
-                flags=re.MULTILINE,
-            )
-        else:
-            # Key not found — append to end of file
-            if not content.endswith("\n"):
-                content += "\n"
-            content += f"{key}={value}\n"
-
-    env_path.write_text(content, encoding="utf-8")
-
-
-def _rollback(env_path: Path, backup_path: Path) -> None:
-    """Restore .env from backup if available."""
-    try:
-        if backup_path.exists():
-            shutil.copy2(backup_path, env_path)
-            backup_path.unlink()
-            print(f"{_BLUE}Rolled back .env from backup.{_RESET}")
-        else:
-            print(f"{_RED}Warning: backup file not found, cannot rollback.{_RESET}")
-    except Exception as exc:
-        print(f"{_RED}Rollback failed: {exc}{_RESET}")
-
-
-def refresh_openai_token(env_path: Path | None = None) -> dict[str, str]:
-    """Refresh OpenAI subscription token and update .env file.
-
-    Returns a dict of the 5 updated key-value pairs.
-    """
-    if env_path is None:
-        env_path = _DEFAULT_ENV_PATH
-    backup_path = env_path.parent / ".env.backup"
-
-    # 1. Read required env vars
-    client_id = os.getenv("OPENAI_CLIENT_ID_SUBSCRIPTION")
-    refresh_token = os.getenv("OPENAI_REFRESH_KEY_SUBSCRIPTION")
+def _token_request_json() -> dict[str, str]:
+    client_id = CREDENTIALS.current.client_id
+    refresh_token = CREDENTIALS.current.refresh_token
     if not client_id or not refresh_token:
         raise ProxyError(
             "Missing required env vars: "
             "OPENAI_CLIENT_ID_SUBSCRIPTION and/or OPENAI_REFRESH_KEY_SUBSCRIPTION"
         )
+    return {
+        "client_id": client_id,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "scope": "openid profile email",
+    }
 
-    # 2. Backup .env
-    try:
-        shutil.copy2(env_path, backup_path)
-    except Exception as exc:
-        raise ProxyError(f"Failed to backup .env: {exc}") from exc
 
-    # 3. Request new token
-    try:
-        response = httpx.post(
-            _OPENAI_TOKEN_URL,
-            json={
-                "client_id": client_id,
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token,
-                "scope": "openid profile email",
-            },
-            timeout=30.0,
-        )
-    except Exception as exc:
-        _rollback(env_path, backup_path)
-        raise ProxyError(f"Token request failed: {exc}") from exc
+def _token_url() -> str:
+    # Can be overridden to point at a stand-in endpoint (benchmarks)
+    return os.getenv("OPENAI_TOKEN_URL") or _OPENAI_TOKEN_URL
 
-    # 4. Check response status
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float | None:
+    """Seconds to wait before retrying the token request, or None if it shouldn't be retried."""
+    if attempt + 1 >= _TOKEN_REQUEST_ATTEMPTS:
+        return None
+    if response is not None and response.status_code != 429 and response.status_code < 500:
+        return None
+    return _TOKEN_REQUEST_BACKOFF_SECONDS * 2**attempt * random.uniform(0.5, 1.5)
+
+
+def _credentials_from_token_response(response: httpx.Response) -> Credentials:
+    # Check response status
     if response.status_code != 200:
-        _rollback(env_path, backup_path)
         raise ProxyError(
             f"Token request returned HTTP {response.status_code}: {response.text}"
         )
 
-    # 5. Parse response JSON
+    # Parse response JSON
     try:
         data = response.json()
         access_token = data["access_token"]
         new_refresh_token = data["refresh_token"]
     except Exception as exc:
-        _rollback(env_path, backup_path)
         raise ProxyError(f"Failed to parse token response: {exc}") from exc
 
-    # 6. Decode JWT payload to extract identity fields
+    # Decode JWT payload to extract identity fields
     try:
         payload = _decode_jwt_payload(access_token)
-        jwt_client_id = payload["client_id"]
-        auth_info = payload.get("https://api.openai.com/auth", {})
-        chatgpt_account_id = auth_info["chatgpt_account_id"]
-        expires_at = str(payload["exp"])
+        return Credentials(
+            access_token=access_token,
+            account_id=payload.get("https://api.openai.com/auth", {})["chatgpt_account_id"],
+            refresh_token=new_refresh_token,
+            client_id=payload["client_id"],
+            expires_at=int(payload["exp"]),
+        )
     except ProxyError:
-        _rollback(env_path, backup_path)
         raise
     except Exception as exc:
-        _rollback(env_path, backup_path)
         raise ProxyError(f"Failed to extract fields from JWT: {exc}") from exc
 
-    # 7. Update .env file
-    updates = {
-        "OPENAI_API_KEY_SUBSCRIPTION": access_token,
-        "OPENAI_ACCOUNT_ID": chatgpt_account_id,
-        "OPENAI_REFRESH_KEY_SUBSCRIPTION": new_refresh_token,
-        "OPENAI_CLIENT_ID_SUBSCRIPTION": jwt_client_id,
-        "OPENAI_SUBSCRIPTION_EXPIRES_AT": expires_at,
-    }
-    try:
-        _update_env_file(env_path, updates)
-    except Exception as exc:
-        _rollback(env_path, backup_path)
-        raise ProxyError(f"Failed to update .env: {exc}") from exc
 
-    # 8. Update in-memory environment
-    for key, value in updates.items():
-        os.environ[key] = value
+def refresh_openai_token(env_path: Path | None = None) -> dict[str, str]:
+    """Refresh OpenAI subscription token and update .env file.
 
-    # 9. Clean up backup (non-critical)
-    try:
-        backup_path.unlink()
-    except Exception as exc:
-        print(f"{_RED}Warning: failed to remove backup: {exc}{_RESET}")
+    Returns a dict of the 5 updated key-value pairs.
+    """
+    if env_path is None:
+        env_path = DEFAULT_ENV_PATH
+
+    # 1. Read the current credentials
+    request_json = _token_request_json()
+
+    # 2. Request new token
+    handler = HTTP_CLIENT_POOL.get_sync_handler("openai-oauth")
+    client = handler.client if handler is not None else None
+    for attempt in range(_TOKEN_REQUEST_ATTEMPTS):
+        response = None
+        try:
+            if client is not None:
+                response = client.post(_token_url(), json=request_json, timeout=_TOKEN_REQUEST_TIMEOUT)
+            else:
+                response = httpx.post(_token_url(), json=request_json, timeout=_TOKEN_REQUEST_TIMEOUT)
+        except httpx.HTTPError as exc:
+            delay = _retry_delay(attempt, None)
+            if delay is None:
+                raise ProxyError(f"Token request failed: {exc}") from exc
+        else:
+            delay = _retry_delay(attempt, response)
+            if delay is None:
+                break
+        time.sleep(delay)
+
+    # 3. Check and parse the response
+    credentials = _credentials_from_token_response(response)
+
+    # 4. Update the in-memory credentials, then the .env file (atomically -
+    #    a failed write is only logged, the old refresh token is spent anyway)
+    CREDENTIALS.update(credentials, env_path)
 
-    return updates
+    return credentials.to_env_values()
 
 
-def needs_refresh() -> bool:
-    """Check if the token is near expiry (within 7 days)."""
-    expires_at = os.getenv("OPENAI_SUBSCRIPTION_EXPIRES_AT", "")
-    if not expires_at:
+async def refresh_openai_token_async(env_path: Path | None = None) -> dict[str, str]:
+    """
+    Same as `refresh_openai_token()`, but the token request is made with the
+    proxy's pooled async client, and the .env file is accessed from a
+    dedicated thread (not LiteLLM's / the loop's default thread pool).
+    """
+    if env_path is None:
+        env_path = DEFAULT_ENV_PATH
+
+    # 1. Read the current credentials
+    request_json = _token_request_json()
+
+    # 2. Request new token
+    handler = HTTP_CLIENT_POOL.get_async_handler("openai-oauth")
+    async with _async_client(handler) as client:
+        for attempt in range(_TOKEN_REQUEST_ATTEMPTS):
+            response = None
+            try:
+                response = await client.post(_token_url(), json=request_json, timeout=_TOKEN_REQUEST_TIMEOUT)
+            except httpx.HTTPError as exc:
+                delay = _retry_delay(attempt, None)
+                if delay is None:
+                    raise ProxyError(f"Token request failed: {exc}") from exc
+            else:
+                delay = _retry_delay(attempt, response)
+                if delay is None:
+                    break
+            await asyncio.sleep(delay)
+
+    # 3. Check and parse the response
+    credentials = _credentials_from_token_response(response)
+
+    # 4. Update the in-memory credentials right away (the waiters of the
+    #    single flight pick them up), then the .env file - best-effort, as in
+    #    `refresh_openai_token()`
+    CREDENTIALS.update(credentials)
+    await _run_env_file_io(CREDENTIALS.save, credentials, env_path)
+
+    return credentials.to_env_values()
+
+
+@asynccontextmanager
+async def _async_client(handler) -> AsyncIterator[httpx.AsyncClient]:
+    if handler is not None:
+        # Owned by the pool
+        yield handler.client
+        return
+    async with httpx.AsyncClient() as client:
+        yield client
+
+
+# The .env file is tiny, but regular file I/O can't be done asynchronously -
+# it is done from a dedicated thread so that the event loop is not blocked
+# and the refresh doesn't wait for a slot in the (busy) default thread pool
+_env_file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="env-file")
+
+_T = TypeVar("_T")
+
+
+async def _run_env_file_io(fn: Callable[..., _T], *args: Any) -> _T:
+    return await asyncio.get_running_loop().run_in_executor(_env_file_executor, fn, *args)
+
+
+def needs_refresh(margin_seconds: float = 0) -> bool:
+    """Check if the token is near expiry (within 7 days, plus `margin_seconds`)."""
+    expires_at = CREDENTIALS.current.expires_at
+    if expires_at is None:
         return False
+    return time.time() > expires_at - _REFRESH_BUFFER_SECONDS - margin_seconds
+
+
+# Single-flight refresh: when the token expires under load, every in-flight
+# request gets a 401 at about the same time. Only the first of them refreshes
+# the token (refresh tokens are single-use, so concurrent refreshes would also
+# invalidate each other), the rest wait for it and reuse the new token. The
+# thread lock covers the sync callers, the asyncio locks queue up the
+# coroutines of an event loop, and the file lock covers the other proxy worker
+# processes (which share the .env).
+_refresh_thread_lock = threading.Lock()
+_refresh_async_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+    weakref.WeakKeyDictionary()
+)
+_proactive_refresh_tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@contextmanager
+def _interprocess_lock(env_path: Path) -> Iterator[None]:
+    """Exclusive lock on `.env.lock` next to the .env file (a no-op where `fcntl` is not available)."""
+    if fcntl is None:
+        yield
+        return
+    with open(env_path.parent / ".env.lock", "a", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _refresh_single_flight(env_path: Path | None, is_still_needed: Callable[[], bool]) -> dict[str, str] | None:
+    """
+    Refresh the token under the thread and the file lock, unless, once the
+    locks are acquired, `is_still_needed()` says that somebody else already
+    did it (in which case the current values are returned).
+    """
+    if env_path is None:
+        env_path = DEFAULT_ENV_PATH
+    with _refresh_thread_lock:
+        if not is_still_needed():
+            return CREDENTIALS.current.to_env_values()
+        with _interprocess_lock(env_path):
+            CREDENTIALS.reload_from_env_file(env_path)
+            if not is_still_needed():
+                return CREDENTIALS.current.to_env_values()
+            return refresh_openai_token(env_path)
+
+
+async def _poll_until_acquired(try_acquire: Callable[[], bool]) -> None:
+    delay = 0.005
+    while not try_acquire():
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.1)
+
+
+def _try_flock(lock_file) -> bool:
     try:
-        return time.time() > int(expires_at) - _REFRESH_BUFFER_SECONDS
-    except ValueError:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
         return False
+    return True
+
+
+@asynccontextmanager
+async def _async_refresh_locks(env_path: Path) -> AsyncIterator[None]:
+    """
+    The async counterpart of taking `_refresh_thread_lock` and
+    `_interprocess_lock()`: both are polled for without blocking the loop
+    (the holder may well be waiting for the token endpoint).
+    """
+    await _poll_until_acquired(lambda: _refresh_thread_lock.acquire(blocking=False))
+    try:
+        if fcntl is None:
+            yield
+            return
+        with open(env_path.parent / ".env.lock", "a", encoding="utf-8") as lock_file:
+            await _poll_until_acquired(lambda: _try_flock(lock_file))
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        _refresh_thread_lock.release()
+
+
+async def _refresh_single_flight_async(
+    env_path: Path | None, is_still_needed: Callable[[], bool]
+) -> dict[str, str] | None:
+    """The async version of `_refresh_single_flight()` (doesn't occupy any worker thread while waiting)."""
+    if env_path is None:
+        env_path = DEFAULT_ENV_PATH
+    async with _async_refresh_locks(env_path):
+        if not is_still_needed():
+            return CREDENTIALS.current.to_env_values()
+        await _run_env_file_io(CREDENTIALS.reload_from_env_file, env_path)
+        if not is_still_needed():
+            return CREDENTIALS.current.to_env_values()
+        return await refresh_openai_token_async(env_path)
+
+
+def _get_async_refresh_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _refresh_async_locks.get(loop)
+    if lock is None:
+        lock = _refresh_async_locks[loop] = asyncio.Lock()
+    return lock
+
+
+def _auth_error_check(failed_token: str | None) -> Callable[[], bool]:
+    if failed_token is None:
+        # The caller doesn't know which token failed - always refresh
+        return lambda: True
+    return lambda: CREDENTIALS.current.access_token == failed_token
 
 
 def ensure_token_fresh(env_path: Path | None = None) -> dict[str, str] | None:
     """Refresh the token if it is near expiry. Returns updates dict or None."""
     if not needs_refresh():
         return None
-    print(f"{_BLUE}Token nearing expiry, refreshing...{_RESET}")
-    return refresh_openai_token(env_path)
+    logger.info("Token nearing expiry, refreshing...")
+    return _refresh_single_flight(env_path, needs_refresh)
 
 
-def on_auth_error(env_path: Path | None = None) -> dict[str, str]:
-    """Force-refresh the token in response to a 401 error."""
-    print(f"{_RED}401 received, forcing token refresh...{_RESET}")
-    return refresh_openai_token(env_path)
+def on_auth_error(env_path: Path | None = None, failed_token: str | None = None) -> dict[str, str]:
+    """
+    Force-refresh the token in response to a 401 error. `failed_token` is the
+    access token the failed request was made with - if the token has changed
+    since then, it is not refreshed again.
+    """
+    logger.warning("401 received, forcing token refresh...")
+    return _refresh_single_flight(env_path, _auth_error_check(failed_token))
+
+
+async def _proactive_refresh_loop(env_path: Path | None) -> None:
+    """Refresh the token in the background, ahead of the request path (see `needs_refresh()`)."""
+    while True:
+        expires_at = CREDENTIALS.current.expires_at
+        if expires_at is None or not CREDENTIALS.current.refresh_token:
+            # Nothing to refresh (not a subscription setup)
+            return
+        delay = expires_at - _REFRESH_BUFFER_SECONDS - _PROACTIVE_REFRESH_MARGIN_SECONDS - time.time()
+        if delay > 0:
+            # Wake up at least hourly - another process may have refreshed the
+            # token in the meantime, or the clock may have jumped
+            await asyncio.sleep(min(delay, 60 * 60))
+            continue
+        try:
+            async with _get_async_refresh_lock():
+                logger.info("Token nearing expiry, refreshing in the background...")
+                await _refresh_single_flight_async(env_path, lambda: needs_refresh(_PROACTIVE_REFRESH_MARGIN_SECONDS))
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.error("Background token refresh failed: %s", exc)
+        # Don't retry right away (neither after a failure, nor if the new token
+        # is short-lived enough to be "near expiry" already)
+        await asyncio.sleep(_PROACTIVE_REFRESH_RETRY_SECONDS)
+
+
+def start_proactive_refresh(env_path: Path | None = None) -> None:
+    """Start the background refresh task in the running event loop (once per loop)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _proactive_refresh_tasks:
+        _proactive_refresh_tasks[loop] = loop.create_task(_proactive_refresh_loop(env_path))
 
 
 async def ensure_token_fresh_async(env_path=None):
+    start_proactive_refresh(env_path)
     if not needs_refresh():
         return None
-    print(f"{_BLUE}Token nearing expiry, refreshing...{_RESET}")
-    return await asyncio.to_thread(refresh_openai_token, env_path)
-
-
-async def on_auth_error_async(env_path=None):
-    print(f"{_RED}401 received, forcing token refresh...{_RESET}")
-    return await asyncio.to_thread(refresh_openai_token, env_path)
+    async with _get_async_refresh_lock():
+        if not needs_refresh():
+            return CREDENTIALS.current.to_env_values()
+        logger.info("Token nearing expiry, refreshing...")
+        return await _refresh_single_flight_async(env_path, needs_refresh)
+
+
+async def on_auth_error_async(env_path=None, failed_token=None):
+    is_still_needed = _auth_error_check(failed_token)
+    async with _get_async_refresh_lock():
+        if not is_still_needed():
+            return CREDENTIALS.current.to_env_values()
+        logger.warning("401 received, forcing token refresh...")
+        return await _refresh_single_flight_async(env_path, is_still_needed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+Render JSONL traces (`TRACE_FORMAT=jsonl`) into the same markdown files that
+`TRACE_FORMAT=markdown` writes (`<trace ID>_REQUEST.md`, `_RESPONSE.md`,
+`_RESPONSE_STREAM.md`, `_RESPONSE_TEXT.md` and `_ERROR.md`), next to the traces
+by default.
+The deduplicated messages and tools are read from the `blobs/` folder next to
+the traces (or `--blobs-dir`).
+
+Usage:
+    uv run python -m common.render_trace .traces/20250101_120000_000000.jsonl.zst
+    uv run python -m common.render_trace .traces/  # every JSONL trace in the folder
+    uv run python -m common.render_trace --stdout .traces/20250101_120000_000000.jsonl.zst | less
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Iterable
+
+from common.tracing_in_jsonl import read_trace_records
+from common.tracing_in_markdown import (
+    render_error_trace,
+    render_request_trace,
+    render_response_trace,
+    render_streaming_chunk_trace,
+    render_streaming_header,
+)
+
+_TRACE_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+_BOOKKEEPING_FIELDS = ("event", "time")
+
+
+def _trace_fields(record: dict[str, Any], *exclude: str) -> dict[str, Any]:
+    return {key: value for key, value in record.items() if key not in _BOOKKEEPING_FIELDS + exclude}
+
+
+def render_trace(records: Iterable[dict[str, Any]]) -> dict[str, str]:
+    """Render the records of one JSONL trace. Returns the markdown by file suffix (e.g. `_REQUEST.md`)."""
+    request_parts = []
+    response_parts = []
+    stream_parts = []
+    text_parts = []
+    error_parts = []
+    truncated = False
+
+    for record in records:
+        event = record.get("event")
+        if event == "request":
+            request_parts.append(render_request_trace(**_trace_fields(record)))
+        elif event == "response":
+            response_parts.append(render_response_trace(**_trace_fields(record)))
+        elif event == "chunk":
+            if not stream_parts:
+                stream_parts.append(render_streaming_header(calling_method=record["calling_method"]))
+            stream_parts.append(render_streaming_chunk_trace(**_trace_fields(record, "calling_method")))
+            generic_chunk = record.get("generic_chunk")
+            if generic_chunk and generic_chunk.get("text"):
+                text_parts.append(generic_chunk["text"])
+        elif event == "error":
+            error_parts.append(render_error_trace(**_trace_fields(record)))
+        elif event == "truncated":
+            # Still being written, or the proxy was killed
+            truncated = True
+
+    if truncated:
+        (stream_parts or request_parts).append("\n**(The trace ends here - it is incomplete)**\n")
+
+    rendered = {}
+    if request_parts:
+        rendered["_REQUEST.md"] = "".join(request_parts)
+    if response_parts:
+        rendered["_RESPONSE.md"] = "".join(response_parts)
+    if stream_parts:
+        rendered["_RESPONSE_STREAM.md"] = "".join(stream_parts)
+    if text_parts:
+        rendered["_RESPONSE_TEXT.md"] = "".join(text_parts)
+    if error_parts:
+        rendered["_ERROR.md"] = "".join(error_parts)
+    return rendered
+
+
+def _trace_stem(path: Path) -> str:
+    for suffix in _TRACE_SUFFIXES:
+        if path.name.endswith(suffix):
+            return path.name[: -len(suffix)]
+    return path.stem
+
+
+def _collect_trace_paths(paths: Iterable[Path]) -> list[Path]:
+    trace_paths = []
+    for path in paths:
+        if path.is_dir():
+            trace_paths.extend(
+                sorted(child for child in path.iterdir() if child.name.endswith(_TRACE_SUFFIXES) and child.is_file())
+            )
+        else:
+            trace_paths.append(path)
+    return trace_paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", type=Path, help="JSONL trace files or folders with them")
+    parser.add_argument("--out-dir", type=Path, help="Where to write the markdown files (default: next to the trace)")
+    parser.add_argument("--stdout", action="store_true", help="Print the markdown instead of writing files")
+    parser.add_argument("--blobs-dir", type=Path, help="The blob store (default: `blobs/` next to the trace)")
+    args = parser.parse_args()
+
+    trace_paths = _collect_trace_paths(args.paths)
+    if not trace_paths:
+        parser.error("no JSONL traces found")
+
+    for trace_path in trace_paths:
+        rendered = render_trace(read_trace_records(trace_path, blobs_dir=args.blobs_dir))
+        stem = _trace_stem(trace_path)
+        for suffix, markdown in rendered.items():
+            if args.stdout:
+                sys.stdout.write(f"<!-- {stem}{suffix} -->\n\n{markdown}\n")
+                continue
+            out_dir = args.out_dir or trace_path.parent
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out_path = out_dir / f"{stem}{suffix}"
+            out_path.write_text(markdown, encoding="utf-8")
+            print(out_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-request IDs (ULIDs, see `generate_request_id()` in `common/utils.py`).
+
+`RequestIdMiddleware` gives every inbound HTTP request an ID before LiteLLM
+sees it and returns it to Claude Code in the `x-request-id` response header
+(streaming responses included). The router picks it up via
+`current_request_id()` and uses it for the trace files, the log lines, the
+Langfuse trace name and the outbound `x-client-request-id` header, so a
+request can be followed through all of them.
+
+An `x-request-id` sent by the client is NOT reused - the ID ends up in file
+names, and it must be unique.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, MutableMapping, Optional
+
+from common.utils import generate_request_id
+
+REQUEST_ID_HEADER = "x-request-id"
+OUTBOUND_REQUEST_ID_HEADER = "x-client-request-id"
+
+_current_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_Scope = MutableMapping[str, Any]
+_Message = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[_Message]]
+_Send = Callable[[_Message], Awaitable[None]]
+
+
+def current_request_id() -> Optional[str]:
+    """The ID of the inbound request being handled, if it went through `RequestIdMiddleware`."""
+    return _current_request_id.get()
+
+
+class RequestIdMiddleware:
+    """
+    A pure ASGI middleware (unlike `BaseHTTPMiddleware`, it doesn't buffer
+    or otherwise get in the way of streaming responses).
+    """
+
+    def __init__(self, app: Callable[[_Scope, _Receive, _Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = generate_request_id()
+        header = (REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1"))
+
+        async def send_with_request_id(message: _Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        token = _current_request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _current_request_id.reset(token)
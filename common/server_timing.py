@@ -0,0 +1,117 @@
+"""
+`Server-Timing` data of the responses (`SERVER_TIMING_ENABLED`), to tell the
+time the proxy spends on a request apart from the time of the upstream:
+
+    proxy-pre;dur=3.1       building the `RoutedRequest` (routing, converting
+                            the messages and the params, tracing), all
+                            attempts together
+    upstream-ttfb;dur=812   from the upstream call to its first chunk (to the
+                            whole response if it isn't streamed), connecting
+                            included
+    proxy-chunks;dur=4.2    converting (and tracing) the upstream chunks, summed
+                            over the stream
+
+(In milliseconds.) `ServerTimingMiddleware` adds a `Server-Timing` header to
+the responses that went through the router. A stream, however, is started
+(with its headers and a `message_start` event made up by LiteLLM) before the
+router is even called, so streams get the data in SSE comments (which SSE
+clients ignore) instead: one with the first frame that is sent after the first
+upstream chunk arrived, and one with the totals at the end of the stream:
+
+    : server-timing proxy-pre;dur=3.1, upstream-ttfb;dur=812, proxy-chunks;dur=0.1;desc="1 chunks"
+
+The router records the timings through `RequestMetrics` (see
+`common/metrics.py`).
+"""
+
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, MutableMapping, Optional
+
+SERVER_TIMING_HEADER = "server-timing"
+_SSE_CONTENT_TYPE = b"text/event-stream"
+
+_Scope = MutableMapping[str, Any]
+_Message = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[_Message]]
+_Send = Callable[[_Message], Awaitable[None]]
+
+
+class ServerTiming:
+    """The timings of one inbound request (shared by its attempts)."""
+
+    __slots__ = ("pre_s", "upstream_ttfb_s", "chunks_s", "chunks")
+
+    def __init__(self) -> None:
+        self.pre_s: Optional[float] = None
+        self.upstream_ttfb_s: Optional[float] = None
+        self.chunks_s = 0.0
+        self.chunks = 0
+
+    def add_pre(self, seconds: float) -> None:
+        self.pre_s = (self.pre_s or 0.0) + seconds
+
+    def render(self) -> str:
+        entries = []
+        if self.pre_s is not None:
+            entries.append(f"proxy-pre;dur={self.pre_s * 1000:.3f}")
+        if self.upstream_ttfb_s is not None:
+            entries.append(f"upstream-ttfb;dur={self.upstream_ttfb_s * 1000:.3f}")
+        if self.chunks:
+            entries.append(f'proxy-chunks;dur={self.chunks_s * 1000:.3f};desc="{self.chunks} chunks"')
+        return ", ".join(entries)
+
+
+_current_server_timing: ContextVar[Optional[ServerTiming]] = ContextVar("server_timing", default=None)
+
+
+def current_server_timing() -> Optional[ServerTiming]:
+    """The timings of the inbound request being handled, if it went through `ServerTimingMiddleware`."""
+    return _current_server_timing.get()
+
+
+def _sse_comment(timing: ServerTiming) -> bytes:
+    rendered = timing.render()
+    return f": {SERVER_TIMING_HEADER} {rendered}\n\n".encode("latin-1") if rendered else b""
+
+
+class ServerTimingMiddleware:
+    """A pure ASGI middleware (see `RequestIdMiddleware`)."""
+
+    def __init__(self, app: Callable[[_Scope, _Receive, _Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = ServerTiming()
+        is_sse = False
+        sent_ttfb = False
+
+        async def send_with_server_timing(message: _Message) -> None:
+            nonlocal is_sse, sent_ttfb
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                is_sse = any(
+                    key.lower() == b"content-type" and value.startswith(_SSE_CONTENT_TYPE) for key, value in headers
+                )
+                rendered = timing.render()
+                if rendered:
+                    headers.append((SERVER_TIMING_HEADER.encode("latin-1"), rendered.encode("latin-1")))
+                    message["headers"] = headers
+            elif message["type"] == "http.response.body" and is_sse:
+                body = message.get("body", b"")
+                if not sent_ttfb and timing.upstream_ttfb_s is not None:
+                    sent_ttfb = True
+                    body = _sse_comment(timing) + body
+                if not message.get("more_body", False):
+                    body += _sse_comment(timing)
+                message["body"] = body
+            await send(message)
+
+        token = _current_server_timing.set(timing)
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _current_server_timing.reset(token)
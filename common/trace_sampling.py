@@ -0,0 +1,194 @@
+"""
+Which requests get traced.
+
+Head sampling decides when a request starts: a fixed share of the requests
+(`TRACE_SAMPLE_RATE`), optionally per model route (`TRACE_SAMPLE_RULES`), is
+traced as usual. With tail-based sampling (`TRACE_TAIL_SAMPLING`), the traces
+of the other requests are buffered in memory instead of being dropped, and are
+only written if the request turns out to be worth it: it was slow, it failed,
+or `mark_trace()` was called for it (an auth retry, the EOF fallback, etc.) -
+otherwise the buffer is discarded when the request finishes.
+
+The router keeps calling the same trace functions, `TraceSampler` wraps the
+functions of the configured trace format (see `common/tracing.py`).
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+KEEP = "keep"
+DROP = "drop"
+TAIL = "tail"
+
+
+def parse_sample_rules(rules: str) -> list[tuple[str, float]]:
+    """Parse comma-separated `<model pattern>=<rate>` rules."""
+    parsed = []
+    for rule in rules.split(","):
+        if not rule.strip():
+            continue
+        pattern, sep, rate = rule.rpartition("=")
+        if not sep or not pattern.strip():
+            raise ValueError(f"Invalid trace sampling rule: {rule!r} (expected `<model pattern>=<rate>`)")
+        parsed.append((pattern.strip(), float(rate)))
+    return parsed
+
+
+@dataclass
+class _SampledTrace:
+    decision: str
+    started_at: float
+    # The deferred trace calls of a TAIL trace
+    buffer: list[tuple[Callable, dict[str, Any]]] = field(default_factory=list)
+    reason: Optional[str] = None
+
+
+class TraceSampler:
+    """
+    Wraps the trace functions of a trace format module, deciding per request
+    (identified by its trace ID) whether its trace is written, dropped, or
+    buffered until the request is finished (tail-based sampling).
+
+    The state of at most `max_active_traces` requests is kept - the traces of
+    requests that never finish (e.g. abandoned streams) are forgotten, oldest
+    first.
+    """
+
+    def __init__(
+        self,
+        backend: ModuleType,
+        *,
+        sample_rate: float = 1.0,
+        rules: Optional[list[tuple[str, float]]] = None,
+        tail: bool = False,
+        slow_ms: float = 60000.0,
+        max_active_traces: int = 10000,
+    ) -> None:
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.rules = rules or []
+        self.tail = tail
+        self.slow_s = slow_ms / 1000
+        self.max_active_traces = max_active_traces
+
+        self._traces: OrderedDict[str, _SampledTrace] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.sampled = 0
+        self.dropped = 0
+        self.tail_kept: dict[str, int] = {}
+        self.tail_discarded = 0
+
+    @property
+    def is_sampling(self) -> bool:
+        """False if every request is traced anyway (then there is no point in wrapping anything)."""
+        return self.sample_rate < 1.0 or any(rate < 1.0 for _, rate in self.rules)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": len(self._traces),
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "tail_kept": dict(self.tail_kept),
+            "tail_discarded": self.tail_discarded,
+        }
+
+    def _sample_rate(self, models: tuple[Optional[str], ...]) -> float:
+        for pattern, rate in self.rules:
+            if any(model and fnmatchcase(model, pattern) for model in models):
+                return rate
+        return self.sample_rate
+
+    def _start(self, trace_id: str, models: tuple[Optional[str], ...]) -> _SampledTrace:
+        rate = self._sample_rate(models)
+        if rate >= 1.0 or random.random() < rate:
+            decision = KEEP
+            self.sampled += 1
+        elif self.tail:
+            decision = TAIL
+        else:
+            decision = DROP
+            self.dropped += 1
+
+        trace = _SampledTrace(decision=decision, started_at=time.monotonic())
+        with self._lock:
+            self._traces[trace_id] = trace
+            while len(self._traces) > self.max_active_traces:
+                self._traces.popitem(last=False)
+        return trace
+
+    def _promote(self, trace: _SampledTrace, reason: str) -> list[tuple[Callable, dict[str, Any]]]:
+        """Switch a TAIL trace to KEEP and take its buffer (under `self._lock`)."""
+        if trace.decision != TAIL:
+            return []
+        trace.decision = KEEP
+        trace.reason = reason
+        self.tail_kept[reason] = self.tail_kept.get(reason, 0) + 1
+        buffer, trace.buffer = trace.buffer, []
+        return buffer
+
+    def _keep(self, trace: _SampledTrace, reason: str) -> None:
+        """Write what a TAIL trace has buffered so far, and everything that follows."""
+        with self._lock:
+            buffer = self._promote(trace, reason)
+        for func, kwargs in buffer:
+            func(**kwargs)
+
+    def _handle(self, trace: Optional[_SampledTrace], func: Callable, kwargs: dict[str, Any]) -> None:
+        if trace is None or trace.decision == DROP:
+            return
+        if trace.decision == TAIL:
+            with self._lock:
+                if trace.decision == TAIL and time.monotonic() - trace.started_at < self.slow_s:
+                    trace.buffer.append((func, kwargs))
+                    return
+            self._keep(trace, "slow")
+        func(**kwargs)
+
+    def _finish(self, trace_id: str, func: Callable, kwargs: dict[str, Any], reason: Optional[str] = None) -> None:
+        with self._lock:
+            trace = self._traces.pop(trace_id, None)
+        if trace is not None and trace.decision == TAIL:
+            if reason is None and time.monotonic() - trace.started_at >= self.slow_s:
+                reason = "slow"
+            if reason is None:
+                trace.buffer.clear()
+                self.tail_discarded += 1
+                return
+            self._keep(trace, reason)
+        self._handle(trace, func, kwargs)
+
+    def mark_trace(self, trace_id: str, reason: str) -> None:
+        """Make sure the trace of the request gets written (if it was buffered for tail-based sampling)."""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            buffer = self._promote(trace, reason) if trace is not None else []
+        for func, kwargs in buffer:
+            func(**kwargs)
+
+    def write_request_trace(self, *, trace_id: str, **kwargs) -> None:
+        trace = self._start(trace_id, (kwargs.get("requested_model"), kwargs.get("target_model")))
+        self._handle(trace, self.backend.write_request_trace, {"trace_id": trace_id, **kwargs})
+
+    def write_streaming_chunk_trace(self, *, trace_id: str, **kwargs) -> None:
+        trace = self._traces.get(trace_id)
+        if trace is not None and trace.decision == TAIL and kwargs.get("generic_chunk") is not None:
+            # The router yields this dict further down the stream (see
+            # `write_streaming_chunk_trace()` of the trace formats)
+            kwargs["generic_chunk"] = dict(kwargs["generic_chunk"])
+        self._handle(trace, self.backend.write_streaming_chunk_trace, {"trace_id": trace_id, **kwargs})
+
+    def write_response_trace(self, *, trace_id: str, **kwargs) -> None:
+        self._finish(trace_id, self.backend.write_response_trace, {"trace_id": trace_id, **kwargs})
+
+    def write_error_trace(self, *, trace_id: str, **kwargs) -> None:
+        self._finish(trace_id, self.backend.write_error_trace, {"trace_id": trace_id, **kwargs}, reason="error")
+
+    def finish_streaming_trace(self, *, trace_id: str) -> None:
+        self._finish(trace_id, self.backend.finish_streaming_trace, {"trace_id": trace_id})
@@ -0,0 +1,304 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Optional, Union
+
+from common.config import (
+    TRACE_MAX_OPEN_FILES,
+    TRACE_QUEUE_FULL_POLICY,
+    TRACE_QUEUE_MAX_ITEMS,
+    TRACE_WRITE_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+# What to do when the queue is full: drop the record (the request is never
+# slowed down by tracing), or block the caller (in the async handlers - the
+# event loop) for up to `block_timeout_s` (backpressure, and then drop)
+DROP = "drop"
+BLOCK = "block"
+
+
+@dataclass
+class _TraceRecord:
+    path: Path
+    # Rendered by the writer thread, so the caller doesn't pay for the
+    # serialization either
+    render: Optional[Callable[[], Union[str, bytes]]] = None
+    # "x" - a new file that must not exist yet, "a" - append (keep the file open)
+    mode: str = "a"
+    # Written once, when an appended file is created
+    header: Optional[Callable[[], Union[str, bytes]]] = None
+    close: bool = False
+    binary: bool = False
+    # Opens an appended file instead of `path.open()` (e.g. a compressed stream)
+    opener: Optional[Callable[[Path], IO]] = None
+
+
+_FLUSH = object()
+_CLOSE_ALL = object()
+
+
+class TraceWriter:
+    """
+    Writes traces from a dedicated thread, so the request handlers (and the
+    event loop) never touch the disk.
+
+    The records are put into a bounded queue and written in batches. Files that
+    are appended to (streams) are kept open until they are closed explicitly,
+    haven't been written to for `idle_close_s` seconds, or more than
+    `max_open_files` of them are open.
+
+    NOTE: The objects the records refer to are serialized by the writer thread
+    some time later, so they must not be mutated after being submitted.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue_items: int,
+        batch_size: int,
+        max_open_files: int,
+        full_policy: str = DROP,
+        block_timeout_s: float = 1.0,
+        idle_close_s: float = 10.0,
+    ) -> None:
+        if full_policy not in (DROP, BLOCK):
+            raise ValueError(f"Unknown trace queue policy: {full_policy!r} (expected {DROP!r} or {BLOCK!r})")
+        self.batch_size = batch_size
+        self.max_open_files = max_open_files
+        self.full_policy = full_policy
+        self.block_timeout_s = block_timeout_s
+        self.idle_close_s = idle_close_s
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_items)
+        self._open_files: OrderedDict[Path, tuple[IO, float]] = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+        # Time the writer thread spent rendering and writing
+        self.busy_s = 0.0
+
+    def write(self, path: Path, render: Callable[[], Union[str, bytes]], *, binary: bool = False) -> None:
+        """Write a new file (it is an error if it already exists)."""
+        self._submit(_TraceRecord(path=path, render=render, mode="x", binary=binary))
+
+    def append(
+        self,
+        path: Path,
+        render: Callable[[], Union[str, bytes]],
+        *,
+        header: Optional[Callable[[], Union[str, bytes]]] = None,
+        binary: bool = False,
+        opener: Optional[Callable[[Path], IO]] = None,
+    ) -> None:
+        """
+        Append to a file that is kept open (see `close()`), writing `header`
+        first if the file is new. If `opener` is given, it is used to open the
+        file (in append mode) instead of `path.open()`.
+        """
+        self._submit(_TraceRecord(path=path, render=render, mode="a", header=header, binary=binary, opener=opener))
+
+    def close(self, path: Path) -> None:
+        """Close a file that was appended to (e.g. at the end of a stream)."""
+        # If this one gets dropped, the file is closed once it's idle
+        self._submit(_TraceRecord(path=path, close=True))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write everything submitted so far and close all the open files (e.g.
+        compressed streams are only complete once closed). Returns False on
+        timeout.
+        """
+        if self._thread is None:
+            return True
+        try:
+            self._queue.put(_CLOSE_ALL, timeout=timeout)
+        except queue.Full:
+            return False
+        return self.flush(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue_items": self._queue.maxsize,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "batches": self.batches,
+            "busy_s": round(self.busy_s, 3),
+            "open_files": len(self._open_files),
+            "full_policy": self.full_policy,
+        }
+
+    def _submit(self, record: _TraceRecord) -> None:
+        self._ensure_started()
+        self.submitted += 1
+        try:
+            if self.full_policy == BLOCK:
+                self._queue.put(record, timeout=self.block_timeout_s)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Trace queue is full, %d trace record(s) dropped so far", self.dropped)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                thread.start()
+                atexit.register(self.shutdown, 5.0)
+                self._thread = thread
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                self._close_idle_files()
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch_start = time.perf_counter()
+            flush_events = []
+            touched: set[Path] = set()
+            try:
+                for record in batch:
+                    if isinstance(record, tuple) and record[0] is _FLUSH:
+                        flush_events.append(record[1])
+                        continue
+                    if record is _CLOSE_ALL:
+                        self._close_all_files()
+                        continue
+                    try:
+                        self._write_record(record, touched)
+                    except Exception as exc:  # pylint: disable=broad-exception-caught
+                        self.errors += 1
+                        logger.error("Failed to write trace %s: %r", record.path, exc)
+
+                for path in touched:
+                    entry = self._open_files.get(path)
+                    if entry is None:
+                        continue
+                    try:
+                        entry[0].flush()
+                    except Exception as exc:  # pylint: disable=broad-exception-caught
+                        # (e.g. the disk is full) - the file is given up on
+                        self.errors += 1
+                        logger.error("Failed to write trace %s: %r", path, exc)
+                        del self._open_files[path]
+                        self._close_file(path, entry[0])
+                self._close_idle_files()
+            finally:
+                # Whatever happened, the thread keeps going and nobody waits for it in vain
+                self.batches += 1
+                self.busy_s += time.perf_counter() - batch_start
+                for _ in batch:
+                    self._queue.task_done()
+                for event in flush_events:
+                    event.set()
+
+    def _write_record(self, record: _TraceRecord, touched: set) -> None:
+        if record.close:
+            entry = self._open_files.pop(record.path, None)
+            if entry is not None:
+                self._close_file(record.path, entry[0])
+            return
+
+        if record.mode == "x":
+            record.path.parent.mkdir(parents=True, exist_ok=True)
+            content = record.render()
+            if record.binary:
+                with record.path.open("xb") as f:
+                    f.write(content)
+            else:
+                with record.path.open("x", encoding="utf-8") as f:
+                    f.write(content)
+            self.written += 1
+            return
+
+        f = self._get_open_file(record)
+        f.write(record.render())
+        touched.add(record.path)
+        self.written += 1
+
+    def _get_open_file(self, record: _TraceRecord) -> IO:
+        entry = self._open_files.pop(record.path, None)
+        if entry is None:
+            record.path.parent.mkdir(parents=True, exist_ok=True)
+            if record.opener is not None:
+                f = record.opener(record.path)
+            elif record.binary:
+                f = record.path.open("ab")
+            else:
+                f = record.path.open("a", encoding="utf-8")
+            if record.header is not None and f.tell() == 0:
+                f.write(record.header())
+            while len(self._open_files) >= self.max_open_files:
+                oldest_path, (oldest, _) = self._open_files.popitem(last=False)
+                self._close_file(oldest_path, oldest)
+        else:
+            f = entry[0]
+        # Most recently used last
+        self._open_files[record.path] = (f, time.monotonic())
+        return f
+
+    def _close_file(self, path: Path, f: IO) -> None:
+        """Close a file (already removed from `_open_files`), counting and logging a failure instead of raising."""
+        try:
+            f.close()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.errors += 1
+            logger.error("Failed to close trace %s: %r", path, exc)
+
+    def _close_all_files(self) -> None:
+        while self._open_files:
+            path, (f, _) = self._open_files.popitem(last=False)
+            self._close_file(path, f)
+
+    def _close_idle_files(self) -> None:
+        now = time.monotonic()
+        while self._open_files:
+            path, (f, last_write) = next(iter(self._open_files.items()))
+            if now - last_write < self.idle_close_s:
+                break
+            del self._open_files[path]
+            self._close_file(path, f)
+
+
+TRACE_WRITER = TraceWriter(
+    max_queue_items=TRACE_QUEUE_MAX_ITEMS,
+    batch_size=TRACE_WRITE_BATCH_SIZE,
+    max_open_files=TRACE_MAX_OPEN_FILES,
+    full_policy=TRACE_QUEUE_FULL_POLICY,
+)
@@ -0,0 +1,50 @@
+"""
+The trace functions of the configured `TRACE_FORMAT` (see `common/config.py`),
+wrapped by the trace sampler if sampling is configured (see
+`common/trace_sampling.py`).
+"""
+
+from common.config import (
+    TRACE_FORMAT,
+    TRACE_SAMPLE_RATE,
+    TRACE_SAMPLE_RULES,
+    TRACE_TAIL_SAMPLING,
+    TRACE_TAIL_SLOW_MS,
+    WRITE_TRACES_TO_FILES,
+)
+from common.trace_sampling import TraceSampler, parse_sample_rules
+
+if TRACE_FORMAT == "jsonl":
+    from common import tracing_in_jsonl as _trace_format
+elif TRACE_FORMAT == "markdown" or not WRITE_TRACES_TO_FILES:
+    # Nothing is written with tracing off, so a wrong `TRACE_FORMAT` shouldn't
+    # keep the proxy from starting
+    from common import tracing_in_markdown as _trace_format
+else:
+    raise ValueError(f"Unknown trace format: {TRACE_FORMAT!r} (expected 'markdown' or 'jsonl')")
+
+TRACE_SAMPLER = TraceSampler(
+    _trace_format,
+    sample_rate=TRACE_SAMPLE_RATE,
+    rules=parse_sample_rules(TRACE_SAMPLE_RULES),
+    tail=TRACE_TAIL_SAMPLING,
+    slow_ms=TRACE_TAIL_SLOW_MS,
+)
+
+if TRACE_SAMPLER.is_sampling:
+    write_request_trace = TRACE_SAMPLER.write_request_trace
+    write_response_trace = TRACE_SAMPLER.write_response_trace
+    write_streaming_chunk_trace = TRACE_SAMPLER.write_streaming_chunk_trace
+    write_error_trace = TRACE_SAMPLER.write_error_trace
+    finish_streaming_trace = TRACE_SAMPLER.finish_streaming_trace
+    mark_trace = TRACE_SAMPLER.mark_trace
+else:
+    # Every request is traced - no need for any bookkeeping
+    write_request_trace = _trace_format.write_request_trace
+    write_response_trace = _trace_format.write_response_trace
+    write_streaming_chunk_trace = _trace_format.write_streaming_chunk_trace
+    write_error_trace = _trace_format.write_error_trace
+    finish_streaming_trace = _trace_format.finish_streaming_trace
+
+    def mark_trace(trace_id: str, reason: str) -> None:  # pylint: disable=unused-argument
+        """Every trace is written anyway."""
@@ -0,0 +1,413 @@
+"""
+Compact, machine-oriented traces (`TRACE_FORMAT=jsonl`).
+
+Everything about one request (the request itself, the response or every chunk
+of the streamed response) goes into a single `<trace ID>.jsonl[.zst|.gz]`
+file, one JSON object per line:
+
+    {"event": "request", "time": ..., "calling_method": ..., "messages_original": [...], ...}
+    {"event": "chunk", "time": ..., "calling_method": ..., "chunk_idx": 0, "respapi_chunk": {...}, ...}
+    {"event": "response", "time": ..., "calling_method": ..., "response_respapi": {...}, ...}
+    {"event": "error", "time": ..., "calling_method": ..., "error": "Traceback ..."}
+
+The fields are the keyword arguments of the `render_*` functions in
+`common/tracing_in_markdown.py` (`None` values are left out), so the same
+markdown files can be rendered from a JSONL trace on demand - see
+`common/render_trace.py`.
+
+Claude Code resends the whole conversation on every turn, so (unless
+`TRACE_DEDUP_BLOBS` is off) every message, tool schema and the instructions
+are stored only once, in a content-addressed blob store next to the traces
+(`blobs/<hash[:2]>/<hash[2:]>.json[.zst|.gz]`, like git objects), and the
+request records only refer to them:
+
+    {"event": "request", ..., "messages_original": {"$blobs": ["<hash>", ...]}, ...}
+
+`read_trace_records()` puts the blobs back in place.
+
+Like the markdown traces, the records are serialized, compressed and written
+by the trace writer thread (see `common/trace_writer.py`).
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Any, Callable, Iterator, Optional
+
+from litellm import ModelResponse, ResponsesAPIResponse
+
+from common.config import TRACE_COMPRESSION, TRACE_DEDUP_BLOBS, TRACE_FORMAT, TRACES_DIR
+from common.trace_writer import TRACE_WRITER
+
+try:
+    import orjson
+except ImportError:  # It comes with litellm[proxy], but just in case
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZSTD = "zstd"
+GZIP = "gzip"
+NONE = "none"
+
+_SUFFIXES = {ZSTD: ".jsonl.zst", GZIP: ".jsonl.gz", NONE: ".jsonl"}
+_BLOB_SUFFIXES = {ZSTD: ".json.zst", GZIP: ".json.gz", NONE: ".json"}
+_ZSTD_LEVEL = 3
+_GZIP_LEVEL = 6
+
+
+def _resolve_compression(compression: str) -> str:
+    if compression not in _SUFFIXES:
+        raise ValueError(
+            f"Unknown trace compression: {compression!r} (expected one of {', '.join(map(repr, _SUFFIXES))})"
+        )
+    if compression == ZSTD and zstandard is None:
+        if TRACE_FORMAT == "jsonl":
+            logger.warning(
+                "`zstandard` is not installed, JSONL traces will be gzip-compressed instead. Install it with "
+                "`uv pip install zstandard` to get smaller traces for less CPU."
+            )
+        return GZIP
+    return compression
+
+
+_COMPRESSION = _resolve_compression(TRACE_COMPRESSION)
+
+
+def _orjson_default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump_json"):
+        # Embed pydantic's own (Rust) serialization as is, without a round trip
+        # through Python objects
+        return orjson.Fragment(obj.model_dump_json())
+    return str(obj)
+
+
+def _json_default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    return str(obj)
+
+
+def _dumps(obj: Any, *, newline: bool = True) -> bytes:
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+        return orjson.dumps(obj, default=_orjson_default, option=options)
+    line = json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return f"{line}\n".encode("utf-8") if newline else line.encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _compress(data: bytes) -> bytes:
+    if _COMPRESSION == ZSTD:
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    if _COMPRESSION == GZIP:
+        return gzip.compress(data, compresslevel=_GZIP_LEVEL, mtime=0)
+    return data
+
+
+def _open_trace_file(path: Path) -> IO:
+    # Reopening a file (e.g. after it was closed for being idle) starts a new
+    # gzip member / zstd frame - both formats allow concatenating those
+    if _COMPRESSION == ZSTD:
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).stream_writer(path.open("ab"))
+    if _COMPRESSION == GZIP:
+        return gzip.open(path, "ab", compresslevel=_GZIP_LEVEL)
+    return path.open("ab")
+
+
+def trace_path(trace_id: str) -> Path:
+    return TRACES_DIR / f"{trace_id}{_SUFFIXES[_COMPRESSION]}"
+
+
+class BlobStore:
+    """
+    Content-addressed storage of JSON values: `put()` stores a value (unless a
+    value with the same serialization is already there) and returns its hash.
+
+    Only used by the trace writer thread. The hashes that were already stored
+    are remembered (up to `max_known_hashes`) so most of the `put()` calls
+    don't touch the disk at all. Several proxy processes can share the store.
+    """
+
+    def __init__(self, blobs_dir: Path, *, max_known_hashes: int = 100_000) -> None:
+        self.blobs_dir = blobs_dir
+        self.max_known_hashes = max_known_hashes
+        self._known_hashes: OrderedDict[str, None] = OrderedDict()
+
+        self.stored = 0
+        self.deduplicated = 0
+
+    def put(self, value: Any) -> str:
+        data = _dumps(value, newline=False)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest in self._known_hashes:
+            self._known_hashes.move_to_end(digest)
+            self.deduplicated += 1
+            return digest
+
+        path = self.blobs_dir / digest[:2] / f"{digest[2:]}{_BLOB_SUFFIXES[_COMPRESSION]}"
+        if path.exists():
+            self.deduplicated += 1
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written under a temporary name first, so a crash never leaves a
+            # truncated blob behind (which would then never be rewritten)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(_compress(data))
+            os.replace(tmp_path, path)
+            self.stored += 1
+
+        self._known_hashes[digest] = None
+        if len(self._known_hashes) > self.max_known_hashes:
+            self._known_hashes.popitem(last=False)
+        return digest
+
+
+BLOB_STORE = BlobStore(TRACES_DIR / "blobs")
+
+_MESSAGES_FIELDS = ("messages_original", "messages_complapi", "messages_respapi")
+_PARAMS_FIELDS = ("params_original", "params_complapi", "params_respapi")
+# Shorter instructions aren't worth a blob
+_MIN_INSTRUCTIONS_BLOB_LEN = 1024
+
+
+def _map_blob_fields(record: dict[str, Any], map_list: Callable, map_value: Callable) -> dict[str, Any]:
+    """
+    Apply `map_list` to the lists that are stored as blobs (the messages and
+    the tools) and `map_value` to the instructions of a request record. The
+    record itself is not modified, the modified parts are copied.
+    """
+    record = dict(record)
+    for field in _MESSAGES_FIELDS:
+        if record.get(field) is not None:
+            record[field] = map_list(record[field])
+    for field in _PARAMS_FIELDS:
+        params = record.get(field)
+        if not isinstance(params, dict):
+            continue
+        params = dict(params)
+        if params.get("tools") is not None:
+            params["tools"] = map_list(params["tools"])
+        if params.get("instructions") is not None:
+            params["instructions"] = map_value(params["instructions"])
+        record[field] = params
+    return record
+
+
+def _store_blobs(record: dict[str, Any], blob_store: BlobStore) -> dict[str, Any]:
+    def _store_list(values: Any) -> Any:
+        if not isinstance(values, list):
+            return values
+        return {"$blobs": [blob_store.put(value) for value in values]}
+
+    def _store_value(value: Any) -> Any:
+        if not isinstance(value, str) or len(value) < _MIN_INSTRUCTIONS_BLOB_LEN:
+            return value
+        return {"$blob": blob_store.put(value)}
+
+    return _map_blob_fields(record, _store_list, _store_value)
+
+
+def _append_record(trace_id: str, event: str, **fields) -> None:
+    record = {"event": event, "time": time.time()}
+    record.update((key, value) for key, value in fields.items() if value is not None)
+
+    def render() -> bytes:
+        if TRACE_DEDUP_BLOBS and event == "request":
+            return _dumps(_store_blobs(record, BLOB_STORE))
+        return _dumps(record)
+
+    TRACE_WRITER.append(trace_path(trace_id), render, binary=True, opener=_open_trace_file)
+
+
+def write_request_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    request_id: Optional[str] = None,
+    inbound_api_base: Optional[str] = None,
+    inbound_headers: Optional[dict] = None,
+    outbound_api_base: Optional[str] = None,
+    target_model: Optional[str] = None,
+    requested_model: Optional[str] = None,
+    use_responses_api: Optional[bool] = None,
+    messages_original: Optional[list] = None,
+    params_original: Optional[dict] = None,
+    messages_complapi: Optional[list] = None,
+    params_complapi: Optional[dict] = None,
+    messages_respapi: Optional[list] = None,
+    params_respapi: Optional[dict] = None,
+) -> None:
+    _append_record(
+        trace_id,
+        "request",
+        calling_method=calling_method,
+        request_id=request_id,
+        inbound_api_base=inbound_api_base,
+        inbound_headers=inbound_headers,
+        outbound_api_base=outbound_api_base,
+        target_model=target_model,
+        requested_model=requested_model,
+        use_responses_api=use_responses_api,
+        messages_original=messages_original,
+        params_original=params_original,
+        messages_complapi=messages_complapi,
+        params_complapi=params_complapi,
+        messages_respapi=messages_respapi,
+        params_respapi=params_respapi,
+    )
+
+
+def write_response_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    response_respapi: Optional[ResponsesAPIResponse] = None,
+    response_complapi: Optional[ModelResponse] = None,
+) -> None:
+    _append_record(
+        trace_id,
+        "response",
+        calling_method=calling_method,
+        response_respapi=response_respapi,
+        response_complapi=response_complapi,
+    )
+    # The (non-streaming) request is done
+    TRACE_WRITER.close(trace_path(trace_id))
+
+
+def write_streaming_chunk_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    chunk_idx: int,
+    respapi_chunk: Optional[ResponsesAPIResponse] = None,
+    complapi_chunk: Optional[ModelResponse] = None,
+    generic_chunk: Optional[dict] = None,
+) -> None:
+    if generic_chunk is not None:
+        # The router yields this dict further down the stream - don't let the
+        # (deferred) serialization see later modifications, if any
+        generic_chunk = dict(generic_chunk)
+
+    _append_record(
+        trace_id,
+        "chunk",
+        calling_method=calling_method,
+        chunk_idx=chunk_idx,
+        respapi_chunk=respapi_chunk,
+        complapi_chunk=complapi_chunk,
+        generic_chunk=generic_chunk,
+    )
+
+
+def write_error_trace(*, trace_id: str, calling_method: str, error: BaseException) -> None:
+    """Trace the exception a request failed with (this finishes the trace, streaming or not)."""
+    _append_record(
+        trace_id,
+        "error",
+        calling_method=calling_method,
+        error="".join(traceback.format_exception(error)).rstrip(),
+    )
+    TRACE_WRITER.close(trace_path(trace_id))
+
+
+def finish_streaming_trace(*, trace_id: str) -> None:
+    """Let the trace writer close the file of a finished stream."""
+    TRACE_WRITER.close(trace_path(trace_id))
+
+
+def _decompress_members(data: bytes, new_decompressor) -> tuple[bytes, bool]:
+    """
+    Decompress concatenated gzip members / zstd frames. Returns the data and
+    whether it was complete (the last member/frame of a trace that is still
+    being written, or of a process that was killed, is not).
+    """
+    parts = []
+    while data:
+        decompressor = new_decompressor()
+        parts.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            return b"".join(parts), False
+        data = decompressor.unused_data
+    return b"".join(parts), True
+
+
+def _read_compressed(path: Path) -> tuple[bytes, bool]:
+    """Read a (compressed, judging by the file extension) file. Returns the data and whether it was complete."""
+    data = path.read_bytes()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"`zstandard` is needed to read {path} (`uv pip install zstandard`)")
+        return _decompress_members(data, lambda: zstandard.ZstdDecompressor().decompressobj())
+    if path.suffix == ".gz":
+        return _decompress_members(data, lambda: zlib.decompressobj(wbits=16 + zlib.MAX_WBITS))
+    return data, True
+
+
+@functools.lru_cache(maxsize=10_000)
+def _load_blob(blobs_dir: Path, digest: str) -> Any:
+    for suffix in _BLOB_SUFFIXES.values():
+        path = blobs_dir / digest[:2] / f"{digest[2:]}{suffix}"
+        if path.exists():
+            return _loads(_read_compressed(path)[0])
+    return {"missing_blob": digest}
+
+
+def _load_blobs(record: dict[str, Any], blobs_dir: Path) -> dict[str, Any]:
+    def _load_list(value: Any) -> Any:
+        if isinstance(value, dict) and "$blobs" in value:
+            return [_load_blob(blobs_dir, digest) for digest in value["$blobs"]]
+        return value
+
+    def _load_value(value: Any) -> Any:
+        if isinstance(value, dict) and "$blob" in value:
+            return _load_blob(blobs_dir, value["$blob"])
+        return value
+
+    return _map_blob_fields(record, _load_list, _load_value)
+
+
+def read_trace_records(path: Path, blobs_dir: Optional[Path] = None) -> Iterator[dict[str, Any]]:
+    """
+    Read the records of a JSONL trace (compressed or not, judging by the file
+    extension), with the blobs (looked up in `blobs_dir`, by default the
+    `blobs/` folder next to the trace) put back in place. A truncated trace
+    yields the records that are complete, and then a final
+    `{"event": "truncated"}` record.
+    """
+    if blobs_dir is None:
+        blobs_dir = path.parent / "blobs"
+    data, complete = _read_compressed(path)
+
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = _loads(line)
+        except ValueError:
+            # A partially written last line
+            complete = False
+            continue
+        if record.get("event") == "request":
+            record = _load_blobs(record, blobs_dir)
+        yield record
+    if not complete:
+        yield {"event": "truncated"}
@@ -1,15 +1,31 @@
+import io
 import json
-from typing import Optional
+import traceback
+from typing import Any, Optional, Union
 
 from litellm import ModelResponse, ResponsesAPIResponse
 
 from common.config import TRACES_DIR
+from common.trace_writer import TRACE_WRITER
 
+# NOTE: The `write_*` functions below only enqueue the traces - the rendering
+# and the writing are done by the trace writer thread (see
+# `common/trace_writer.py`). The `render_*` functions are also used to render
+# the JSONL traces into markdown on demand (see `common/render_trace.py`), which
+# is why they accept both the LiteLLM objects and their already dumped dicts.
 
-def write_request_trace(  # pylint: disable=unused-argument
+
+def _model_to_json(model: Union[ResponsesAPIResponse, ModelResponse, dict[str, Any]]) -> str:
+    if isinstance(model, dict):
+        # Same as `model_dump_json(indent=2)` (which doesn't escape non-ASCII)
+        return json.dumps(model, indent=2, ensure_ascii=False)
+    return model.model_dump_json(indent=2)
+
+
+def render_request_trace(
     *,
-    timestamp: str,
     calling_method: str,
+    request_id: Optional[str] = None,
     inbound_api_base: Optional[str] = None,
     inbound_headers: Optional[dict] = None,
     outbound_api_base: Optional[str] = None,
@@ -22,122 +38,212 @@ def write_request_trace(  # pylint: disable=unused-argument
     params_complapi: Optional[dict] = None,
     messages_respapi: Optional[list] = None,
     params_respapi: Optional[dict] = None,
-) -> None:
-    TRACES_DIR.mkdir(parents=True, exist_ok=True)
-    file = TRACES_DIR / f"{timestamp}_REQUEST.md"
-    if file.exists():
-        # TODO Replace with a warning instead ?
-        raise FileExistsError(f"File {file} already exists")
+) -> str:
+    f = io.StringIO()
+    f.write(f"# {calling_method.upper()}\n\n")
 
-    with file.open("w", encoding="utf-8") as f:
-        f.write(f"# {calling_method.upper()}\n\n")
+    f.write("## Routing Info\n\n")
+    if request_id is not None:
+        f.write(f"- **Request ID:** `{request_id}`\n")
+    if requested_model is not None:
+        f.write(f"- **Requested Model (Claude Code):** `{requested_model}`\n")
+    if target_model is not None:
+        f.write(f"- **Target Model (Proxy -> Provider):** `{target_model}`\n")
+    if outbound_api_base is not None:
+        f.write(f"- **Outbound URL (Proxy -> Provider):** `{outbound_api_base}`\n")
+    if use_responses_api is not None:
+        f.write(f"- **API Format:** `{'Responses API' if use_responses_api else 'ChatCompletions API'}`\n")
+    if inbound_api_base is not None:
+        f.write(f"- **Inbound URL (Claude Code -> Proxy):** `{inbound_api_base}`\n")
+    f.write("\n")
 
-        f.write("## Routing Info\n\n")
-        if requested_model is not None:
-            f.write(f"- **Requested Model (Claude Code):** `{requested_model}`\n")
-        if target_model is not None:
-            f.write(f"- **Target Model (Proxy -> Provider):** `{target_model}`\n")
-        if outbound_api_base is not None:
-            f.write(f"- **Outbound URL (Proxy -> Provider):** `{outbound_api_base}`\n")
-        if use_responses_api is not None:
-            f.write(f"- **API Format:** `{'Responses API' if use_responses_api else 'ChatCompletions API'}`\n")
-        if inbound_api_base is not None:
-            f.write(f"- **Inbound URL (Claude Code -> Proxy):** `{inbound_api_base}`\n")
-        f.write("\n")
+    if inbound_headers:
+        f.write("## Inbound Headers (Claude Code -> Proxy)\n\n")
+        f.write(f"```json\n{json.dumps(inbound_headers, indent=2)}\n```\n\n")
 
-        if inbound_headers:
-            f.write("## Inbound Headers (Claude Code -> Proxy)\n\n")
-            f.write(f"```json\n{json.dumps(inbound_headers, indent=2)}\n```\n\n")
+    f.write("## Request Messages\n\n")
 
-        f.write("## Request Messages\n\n")
+    if messages_original is not None:
+        f.write("### Original (Claude Code -> Proxy):\n")
+        f.write(f"```json\n{json.dumps(messages_original, indent=2)}\n```\n\n")
 
-        if messages_original is not None:
-            f.write("### Original (Claude Code -> Proxy):\n")
-            f.write(f"```json\n{json.dumps(messages_original, indent=2)}\n```\n\n")
+    if messages_complapi is not None:
+        f.write("### ChatCompletions API:\n")
+        f.write(f"```json\n{json.dumps(messages_complapi, indent=2)}\n```\n\n")
 
-        if messages_complapi is not None:
-            f.write("### ChatCompletions API:\n")
-            f.write(f"```json\n{json.dumps(messages_complapi, indent=2)}\n```\n\n")
+    if messages_respapi is not None:
+        f.write("### Responses API:\n")
+        f.write(f"```json\n{json.dumps(messages_respapi, indent=2)}\n```\n")
 
-        if messages_respapi is not None:
-            f.write("### Responses API:\n")
-            f.write(f"```json\n{json.dumps(messages_respapi, indent=2)}\n```\n")
+    f.write("## Request Params\n\n")
 
-        f.write("## Request Params\n\n")
+    if params_original is not None:
+        f.write("### Original (Claude Code -> Proxy):\n")
+        f.write(f"```json\n{json.dumps(params_original, indent=2)}\n```\n\n")
 
-        if params_original is not None:
-            f.write("### Original (Claude Code -> Proxy):\n")
-            f.write(f"```json\n{json.dumps(params_original, indent=2)}\n```\n\n")
+    if params_complapi is not None:
+        f.write("### ChatCompletions API:\n")
+        f.write(f"```json\n{json.dumps(params_complapi, indent=2)}\n```\n\n")
 
-        if params_complapi is not None:
-            f.write("### ChatCompletions API:\n")
-            f.write(f"```json\n{json.dumps(params_complapi, indent=2)}\n```\n\n")
+    if params_respapi is not None:
+        f.write("### Responses API:\n")
+        f.write(f"```json\n{json.dumps(params_respapi, indent=2)}\n```\n")
 
-        if params_respapi is not None:
-            f.write("### Responses API:\n")
-            f.write(f"```json\n{json.dumps(params_respapi, indent=2)}\n```\n")
+    return f.getvalue()
 
 
-def write_response_trace(
+def render_response_trace(
     *,
-    timestamp: str,
     calling_method: str,
-    response_respapi: Optional[ResponsesAPIResponse] = None,
-    response_complapi: Optional[ModelResponse] = None,
-) -> None:
-    TRACES_DIR.mkdir(parents=True, exist_ok=True)
-    file = TRACES_DIR / f"{timestamp}_RESPONSE.md"
-    if file.exists():
-        # TODO Replace with a warning instead ?
-        raise FileExistsError(f"File {file} already exists")
+    response_respapi: Optional[Union[ResponsesAPIResponse, dict]] = None,
+    response_complapi: Optional[Union[ModelResponse, dict]] = None,
+) -> str:
+    f = io.StringIO()
+    f.write(f"# {calling_method.upper()}\n\n")
 
-    with file.open("w", encoding="utf-8") as f:
-        f.write(f"# {calling_method.upper()}\n\n")
+    f.write("## Response\n\n")
 
-        f.write("## Response\n\n")
+    if response_respapi is not None:
+        f.write("### Responses API:\n")
+        f.write(f"```json\n{_model_to_json(response_respapi)}\n```\n\n")
 
-        if response_respapi is not None:
-            f.write("### Responses API:\n")
-            f.write(f"```json\n{response_respapi.model_dump_json(indent=2)}\n```\n\n")
+    if response_complapi is not None:
+        f.write("### ChatCompletions API:\n")
+        f.write(f"```json\n{_model_to_json(response_complapi)}\n```\n")
 
-        if response_complapi is not None:
-            f.write("### ChatCompletions API:\n")
-            f.write(f"```json\n{response_complapi.model_dump_json(indent=2)}\n```\n")
+    return f.getvalue()
 
 
-def write_streaming_chunk_trace(
+def render_streaming_chunk_trace(
     *,
-    timestamp: str,
-    calling_method: str,
     chunk_idx: int,
-    respapi_chunk: Optional[ResponsesAPIResponse] = None,
-    complapi_chunk: Optional[ModelResponse] = None,
+    respapi_chunk: Optional[Union[ResponsesAPIResponse, dict]] = None,
+    complapi_chunk: Optional[Union[ModelResponse, dict]] = None,
     generic_chunk: Optional[dict] = None,
-) -> None:
-    TRACES_DIR.mkdir(parents=True, exist_ok=True)
-    file = TRACES_DIR / f"{timestamp}_RESPONSE_STREAM.md"
-    text_file = TRACES_DIR / f"{timestamp}_RESPONSE_TEXT.md"
+) -> str:
+    f = io.StringIO()
+    f.write(f"## Response Chunk #{chunk_idx}\n\n")
 
-    # If file doesn't exist, create it with the main header
-    if not file.exists():
-        with file.open("a", encoding="utf-8") as f:
-            f.write(f"# {calling_method.upper()}\n\n")
+    if respapi_chunk is not None:
+        f.write(f"### Responses API:\n```json\n{_model_to_json(respapi_chunk)}\n```\n\n")
 
-    # Append the chunk to the file
-    with file.open("a", encoding="utf-8") as f:
-        f.write(f"## Response Chunk #{chunk_idx}\n\n")
+    if complapi_chunk is not None:
+        f.write(f"### ChatCompletions API:\n```json\n{_model_to_json(complapi_chunk)}\n```\n\n")
+
+    if generic_chunk is not None:
+        # TODO Do `gen_chunk.model_dump_json(indent=2)` once it's not
+        #  just a dict
+        f.write(f"### GenericStreamingChunk:\n```json\n{json.dumps(generic_chunk, indent=2)}\n```\n\n")
+
+    return f.getvalue()
+
+
+def render_streaming_header(*, calling_method: str) -> str:
+    return f"# {calling_method.upper()}\n\n"
+
+
+def render_error_trace(*, calling_method: str, error: str) -> str:
+    return f"# {calling_method.upper()}\n\n## Error\n\n```\n{error}\n```\n"
+
+
+def write_request_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    request_id: Optional[str] = None,
+    inbound_api_base: Optional[str] = None,
+    inbound_headers: Optional[dict] = None,
+    outbound_api_base: Optional[str] = None,
+    target_model: Optional[str] = None,
+    requested_model: Optional[str] = None,
+    use_responses_api: Optional[bool] = None,
+    messages_original: Optional[list] = None,
+    params_original: Optional[dict] = None,
+    messages_complapi: Optional[list] = None,
+    params_complapi: Optional[dict] = None,
+    messages_respapi: Optional[list] = None,
+    params_respapi: Optional[dict] = None,
+) -> None:
+    def render() -> str:
+        return render_request_trace(
+            calling_method=calling_method,
+            request_id=request_id,
+            inbound_api_base=inbound_api_base,
+            inbound_headers=inbound_headers,
+            outbound_api_base=outbound_api_base,
+            target_model=target_model,
+            requested_model=requested_model,
+            use_responses_api=use_responses_api,
+            messages_original=messages_original,
+            params_original=params_original,
+            messages_complapi=messages_complapi,
+            params_complapi=params_complapi,
+            messages_respapi=messages_respapi,
+            params_respapi=params_respapi,
+        )
+
+    TRACE_WRITER.write(TRACES_DIR / f"{trace_id}_REQUEST.md", render)
 
-        if respapi_chunk is not None:
-            f.write(f"### Responses API:\n```json\n{respapi_chunk.model_dump_json(indent=2)}\n```\n\n")
 
-        if complapi_chunk is not None:
-            f.write(f"### ChatCompletions API:\n```json\n{complapi_chunk.model_dump_json(indent=2)}\n```\n\n")
+def write_response_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    response_respapi: Optional[ResponsesAPIResponse] = None,
+    response_complapi: Optional[ModelResponse] = None,
+) -> None:
+    TRACE_WRITER.write(
+        TRACES_DIR / f"{trace_id}_RESPONSE.md",
+        lambda: render_response_trace(
+            calling_method=calling_method,
+            response_respapi=response_respapi,
+            response_complapi=response_complapi,
+        ),
+    )
 
-        if generic_chunk is not None:
-            # TODO Do `gen_chunk.model_dump_json(indent=2)` once it's not
-            #  just a dict
-            f.write(f"### GenericStreamingChunk:\n```json\n{json.dumps(generic_chunk, indent=2)}\n```\n\n")
 
-            # Append text only to the text file
-            with text_file.open("a", encoding="utf-8") as text_f:
-                text_f.write(generic_chunk["text"])
+def write_streaming_chunk_trace(
+    *,
+    trace_id: str,
+    calling_method: str,
+    chunk_idx: int,
+    respapi_chunk: Optional[ResponsesAPIResponse] = None,
+    complapi_chunk: Optional[ModelResponse] = None,
+    generic_chunk: Optional[dict] = None,
+) -> None:
+    if generic_chunk is not None:
+        # The router yields this dict further down the stream - don't let the
+        # (deferred) rendering see later modifications, if any
+        generic_chunk = dict(generic_chunk)
+
+    TRACE_WRITER.append(
+        TRACES_DIR / f"{trace_id}_RESPONSE_STREAM.md",
+        lambda: render_streaming_chunk_trace(
+            chunk_idx=chunk_idx,
+            respapi_chunk=respapi_chunk,
+            complapi_chunk=complapi_chunk,
+            generic_chunk=generic_chunk,
+        ),
+        header=lambda: render_streaming_header(calling_method=calling_method),
+    )
+
+    if generic_chunk is not None and generic_chunk["text"]:
+        # Append text only to the text file
+        text = generic_chunk["text"]
+        TRACE_WRITER.append(TRACES_DIR / f"{trace_id}_RESPONSE_TEXT.md", lambda: text)
+
+
+def write_error_trace(*, trace_id: str, calling_method: str, error: BaseException) -> None:
+    """Trace the exception a request failed with (this finishes the trace, streaming or not)."""
+    error_text = "".join(traceback.format_exception(error)).rstrip()
+    TRACE_WRITER.write(
+        TRACES_DIR / f"{trace_id}_ERROR.md",
+        lambda: render_error_trace(calling_method=calling_method, error=error_text),
+    )
+    finish_streaming_trace(trace_id=trace_id)
+
+
+def finish_streaming_trace(*, trace_id: str) -> None:
+    """Let the trace writer close the files of a finished stream."""
+    TRACE_WRITER.close(TRACES_DIR / f"{trace_id}_RESPONSE_STREAM.md")
+    TRACE_WRITER.close(TRACES_DIR / f"{trace_id}_RESPONSE_TEXT.md")
@@ -3,14 +3,19 @@
 """
 NOTE: The utilities in this module were mostly vibe-coded without review.
 """
+import hashlib
+import hmac
 import json
+import logging
 import os
+import time
 from copy import deepcopy
 from datetime import UTC, datetime
-from typing import Any, Optional, Union
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
 
 from litellm import GenericStreamingChunk, ModelResponse, ResponsesAPIResponse
-import json as _json_for_telemetry
+
+from common.conversion_cache import LruCache
 
 
 class ProxyError(RuntimeError):
@@ -47,132 +52,25 @@ def env_var_to_bool(value: Optional[str], default: str = "false") -> bool:
     return (value or default).lower() in ("true", "1", "on", "yes", "y")
 
 
-# TODO Refactor to avoid using global state if possible
-# Minimal state to accumulate Responses function_call arguments across chunks
-_RESPONSES_TOOL_STATE: dict[str, dict[str, Any]] = {}
-# Track which Responses tool item (by item_id) we have adopted for this turn.
-# We only ever emit a single tool_use for the adopted item.
-_RESPONSES_TOOL_ADOPTED: Optional[str] = None
 _RESPONSES_TOOL_DEBUG = os.environ.get("RESPONSES_TOOL_DEBUG", "0") not in ("0", "", "false", "False")
 _RESPONSES_TELEMETRY_ENABLED = os.environ.get("RESPONSES_TOOL_TELEMETRY", "0") not in ("0", "", "false", "False")
 
-_RESPONSES_TELEMETRY: dict[str, Any] = {
-    "saw_tool_items": 0,
-    "extra_tool_items_ignored": 0,
-    "adopted_item_id": None,
-    "adopted_output_index": None,
-}
+# Written out by a background thread (see `common/log.py`)
+logger = logging.getLogger(__name__)
+if _RESPONSES_TOOL_DEBUG:
+    logger.setLevel(logging.DEBUG)
 
 
 def _log_responses_tool(msg: str) -> None:
     if not _RESPONSES_TOOL_DEBUG:
         return
-    timestamp = datetime.now(UTC).isoformat()
-    print(f"[responses_tool_debug {timestamp}] {msg}")
+    logger.debug("[responses_tool_debug %s] %s", datetime.now(UTC).isoformat(), msg)
 
 
 def _telemetry(event: str, **fields: Any) -> None:
     if not _RESPONSES_TELEMETRY_ENABLED:
         return
-    payload = {"event": event, **fields}
-    try:
-        print(f"[responses_tool_telemetry] {_json_for_telemetry.dumps(payload, ensure_ascii=False)}")
-    except Exception:
-        print(f"[responses_tool_telemetry] {event} {fields}")
-
-
-def _maybe_emit_tool(item_id: str, default_index: int = 0) -> Optional[dict[str, Any]]:
-    state = _RESPONSES_TOOL_STATE.get(item_id)
-    if not state or state.get("emitted"):
-        return None
-    if not state.get("args_done"):
-        return None
-    if not state.get("name"):
-        return None
-
-    args_str = state.get("args", "")
-    if not isinstance(args_str, str):
-        args_str = str(args_str)
-    final_args = args_str if args_str else "{}"
-
-    tool_use = {
-        "index": state.get("index", default_index),
-        "id": state.get("id"),
-        "type": "function",
-        "function": {
-            "name": state.get("name"),
-            "arguments": final_args,
-        },
-    }
-    _log_responses_tool(f"emitting tool_use item_id={item_id} name={state.get('name')} index={tool_use['index']}")
-    state["emitted"] = True
-    return tool_use
-
-
-def responses_eof_finalize_chunk() -> Optional[GenericStreamingChunk]:
-    """
-    Finalize a pending tool call if the stream ended without a terminal
-    event. If we have buffered args for the adopted tool and they parse as
-    JSON, emit a single tool_use. Otherwise emit an assistant-visible error.
-    Always clears internal tool state.
-    """
-    try:
-        adopted = _RESPONSES_TOOL_ADOPTED
-        if not adopted or adopted not in _RESPONSES_TOOL_STATE:
-            # Nothing pending
-            return None
-        state = _RESPONSES_TOOL_STATE.get(adopted, {})
-        if state.get("emitted"):
-            return None
-        args_str = state.get("args", "")
-        # Strict JSON parse if non-empty; empty means {} is fine
-        if isinstance(args_str, str) and args_str:
-            try:
-                json.loads(args_str)
-                args_ok = True
-            except Exception:
-                args_ok = False
-        else:
-            args_ok = True
-
-        if args_ok:
-            tool_use = {
-                "index": state.get("index", 0),
-                "id": state.get("id"),
-                "type": "function",
-                "function": {
-                    "name": state.get("name"),
-                    "arguments": args_str or "{}",
-                },
-            }
-            chunk: GenericStreamingChunk = {
-                "text": "",
-                "is_finished": False,
-                "finish_reason": "",
-                "usage": None,
-                "index": state.get("index", 0),
-                "tool_use": tool_use,
-                "provider_specific_fields": {"responses_type": "eof_fallback"},
-            }
-            return chunk
-        # Emit an assistant-visible error if args could not be finalized
-        err = "Provider ended stream before tool arguments were finalized."
-        return {
-            "text": err,
-            "is_finished": False,
-            "finish_reason": "error",
-            "usage": None,
-            "index": 0,
-            "tool_use": None,
-            "provider_specific_fields": {"responses_type": "eof_fallback_error"},
-        }
-    finally:
-        # Clear state regardless
-        try:
-            _RESPONSES_TOOL_STATE.clear()
-        except Exception:
-            pass
-        _RESPONSES_TOOL_ADOPTED = None
+    logger.info("[responses_tool_telemetry] %s", event, extra={"fields": {"event": event, **fields}})
 
 
 def generate_timestamp_utc() -> str:
@@ -191,207 +89,823 @@ def generate_timestamp_utc() -> str:
     return f"{str_repr[:-3]}_{str_repr[-3:]}"
 
 
-def to_generic_streaming_chunk(chunk: Any) -> GenericStreamingChunk:
+_CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def generate_request_id() -> str:
     """
-    Best-effort convert a LiteLLM ModelResponseStream chunk into
-    GenericStreamingChunk.
-
-    GenericStreamingChunk TypedDict keys:
-      - text: str (required)
-      - is_finished: bool (required)
-      - finish_reason: str (required)
-      - usage: Optional[ChatCompletionUsageBlock] (we pass None for incremental
-        chunks)
-      - index: int (default 0)
-      - tool_use: Optional[ChatCompletionToolCallChunk] (default None)
-      - provider_specific_fields: Optional[dict]
+    Generate a ULID: 48 bits of milliseconds since the epoch followed by 80
+    random bits, as 26 Crockford base32 characters (e.g.
+    `01JA8Z6S0T3K9V2M4XQ7B5N8RC`).
+
+    Unlike the timestamps, two requests that arrive within the same
+    microsecond (or two attempts of the same request) can't get the same ID,
+    and the IDs still sort by time.
     """
-    # Defaults
-    text: str = ""
-    finish_reason: str = ""
-    is_finished: bool = False
-    index: int = 0
-    provider_specific_fields: Optional[dict[str, Any]] = None
-    tool_use: Optional[dict[str, Any]] = None
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD_BASE32[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
 
+def is_master_key_authorized(headers: Iterable[tuple[bytes, bytes]]) -> bool:
+    """
+    Whether the (ASGI) request headers present the LITELLM_MASTER_KEY, as
+    `x-api-key` or as a `Bearer` token - for the proxy's own endpoints. Always
+    true if no master key is set.
+    """
+    master_key = os.getenv("LITELLM_MASTER_KEY")
+    if not master_key:
+        return True
+    headers_by_name = {key.lower(): value.decode("latin-1") for key, value in headers}
+    presented = (
+        headers_by_name.get(b"x-api-key") or headers_by_name.get(b"authorization", "").removeprefix("Bearer ").strip()
+    )
+    return hmac.compare_digest(presented.encode("utf-8"), master_key.encode("utf-8"))
+
+
+# Responses API event types that get special treatment
+_OUTPUT_TEXT_DELTA = "response.output_text.delta"
+_TOOL_ITEM_TYPES = frozenset({"function_call", "tool_call"})
+_RESPONSES_TERMINAL_SUFFIXES = (".completed", ".failed", ".cancelled", ".canceled")
+_RESPONSES_TERMINAL_EVENTS = frozenset(
+    {"response.completed", "response.failed", "response.canceled", "response.cancelled", "response.error"}
+)
+# Keys of a Responses API event that are passed on in provider_specific_fields
+_RESPONSES_PROVIDER_FIELD_KEYS = ("response_id", "output_index", "item_id", "id", "status")
+# A text delta that (unexpectedly) carries any of these keys goes through the general conversion path
+_TEXT_DELTA_SLOW_PATH_KEYS = frozenset({"choices", "provider_specific_fields", "finish_reason"})
+
+
+def _get(obj: Any, key: str, default: Any = None) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _new_tool_state(item_id: Any, index: int) -> dict[str, Any]:
+    return {
+        "item_id": item_id,
+        "name": None,
+        "id": None,
+        # The arguments arrive in (possibly thousands of) small deltas - they are only joined once, see
+        # `_joined_tool_args()`
+        "arg_chunks": [],
+        "args_done": False,
+        "emitted": False,
+        "pending_emit": False,
+        "index": index,
+        "raw_item": None,
+    }
+
+
+def _joined_tool_args(state: dict[str, Any]) -> str:
+    arg_chunks = state.get("arg_chunks")
+    if not arg_chunks:
+        return ""
+    if len(arg_chunks) > 1:
+        arg_chunks[:] = ["".join(arg_chunks)]
+    return arg_chunks[0]
+
+
+def _tool_use_delta(arguments: str, tool_index: int) -> dict[str, Any]:
+    # A continuation of a tool call that is being streamed (the name and the id were sent with the first delta)
+    return {"index": tool_index, "id": None, "type": "function", "function": {"name": None, "arguments": arguments}}
+
+
+def _extract_tool_identity(source: Any) -> tuple[Optional[str], Optional[str]]:
+    if not source:
+        return None, None
+    tool_name = None
+    call_id = None
     try:
-        # chunk may be a pydantic object with attributes
-        choices = getattr(chunk, "choices", None)
-        provider_specific_fields = getattr(chunk, "provider_specific_fields", None)
-
-        if isinstance(choices, list) and choices:
-            choice = choices[0]
-            # Try common OpenAI-like shapes
-            delta = getattr(choice, "delta", None)
-            if delta is not None:
-                # delta might be an object or dict
-                content = getattr(delta, "content", None)
-                if content is None and isinstance(delta, dict):
-                    content = delta.get("content")
-                if isinstance(content, str):
-                    text = content
-
-                # TOOL CALLS (OpenAI-style incremental tool_calls on delta)
-                # Attempt to normalize to a ChatCompletionToolCallChunk-like dict
-                # Expected shape (best-effort):
-                # { index: int, id: Optional[str], type: "function", function: {name: str|None, arguments: str|None} }
-                tool_calls = getattr(delta, "tool_calls", None)
-                if tool_calls is None and isinstance(delta, dict):
-                    tool_calls = delta.get("tool_calls")
-                if isinstance(tool_calls, list) and tool_calls:
-                    tc = tool_calls[0]
-
-                    # tc can be a dict or object with attributes
-                    def _get(obj, key, default=None):
-                        if isinstance(obj, dict):
-                            return obj.get(key, default)
-                        return getattr(obj, key, default)
-
-                    tc_index = _get(tc, "index", 0)
-                    tc_id = _get(tc, "id", None)
-                    tc_type = _get(tc, "type", "function")
-                    fn = _get(tc, "function", {})
-                    fn_name = _get(fn, "name", None)
-                    fn_args = _get(fn, "arguments", None)
-                    # Ensure arguments is a string for streaming deltas
-                    if fn_args is not None and not isinstance(fn_args, str):
-                        try:
-                            # Last resort stringification for partial structured args
-                            fn_args = str(fn_args)
-                        except Exception as e:
-                            raise RuntimeError(
-                                f"Failed to convert OpenAI tool_use to GenericStreamingChunk: {e}"
-                            ) from e
-
-                    tool_use = {
-                        "index": tc_index if isinstance(tc_index, int) else 0,
-                        "id": tc_id if isinstance(tc_id, str) else None,
-                        "type": tc_type if isinstance(tc_type, str) else "function",
-                        "function": {
-                            "name": fn_name if isinstance(fn_name, str) else None,
-                            "arguments": fn_args if isinstance(fn_args, str) else None,
-                        },
-                    }
-
-                # Anthropic-style tool_use block on delta
-                if tool_use is None:
-                    a_tool_use = getattr(delta, "tool_use", None)
-                    if a_tool_use is None and isinstance(delta, dict):
-                        a_tool_use = delta.get("tool_use")
-                    if a_tool_use is not None:
-
-                        def _get(obj, key, default=None):
-                            if isinstance(obj, dict):
-                                return obj.get(key, default)
-                            return getattr(obj, key, default)
-
-                        tu_id = _get(a_tool_use, "id", None)
-                        tu_name = _get(a_tool_use, "name", None)
-                        tu_input = _get(a_tool_use, "input", None)
-                        # Represent input as a string for arguments to keep consistency
-                        if tu_input is not None and not isinstance(tu_input, str):
-                            try:
-                                tu_input = str(tu_input)
-                            except Exception as e:
-                                raise RuntimeError(
-                                    f"Failed to convert Anthropic tool_use to GenericStreamingChunk: {e}"
-                                ) from e
+        tool_name = _get(source, "name") or _get(source, "function_name") or _get(source, "tool_name")
+        call_id = _get(source, "call_id") or _get(source, "tool_call_id") or _get(source, "id")
+    except Exception:
+        tool_name = None
+        call_id = None
+    return (
+        tool_name if isinstance(tool_name, str) and tool_name else None,
+        call_id if isinstance(call_id, str) and call_id else None,
+    )
+
+
+def _apply_tool_identity(state: dict[str, Any], fallback: Any = None) -> None:
+    raw_item = state.get("raw_item")
+    tool_name = state.get("name")
+    call_id = state.get("id")
+    for candidate in (raw_item, fallback):
+        if candidate is None:
+            continue
+        cand_name, cand_id = _extract_tool_identity(candidate)
+        if not tool_name and cand_name:
+            tool_name = cand_name
+        if not call_id and cand_id:
+            call_id = cand_id
+        if tool_name and call_id:
+            break
+    state["name"] = tool_name
+    state["id"] = call_id or state.get("item_id")
+
+
+def _stringify_tool_arguments(arguments: Any) -> Any:
+    if isinstance(arguments, (dict, list)):
+        try:
+            return json.dumps(arguments)
+        except Exception:
+            return str(arguments)
+    return arguments
 
-                        tool_use = {
-                            "index": 0,
-                            "id": tu_id if isinstance(tu_id, str) else None,
-                            "type": "function",
-                            "function": {
-                                "name": tu_name if isinstance(tu_name, str) else None,
-                                "arguments": tu_input if isinstance(tu_input, str) else None,
-                            },
-                        }
 
-                # Older OpenAI-style function_call on delta
-                if tool_use is None:
-                    function_call = getattr(delta, "function_call", None)
-                    if function_call is None and isinstance(delta, dict):
-                        function_call = delta.get("function_call")
-                    if function_call is not None:
-                        # function_call can be dict-like or object-like
-                        fn_name = None
-                        fn_args = None
-                        if isinstance(function_call, dict):
-                            fn_name = function_call.get("name")
-                            fn_args = function_call.get("arguments")
-                        else:
-                            fn_name = getattr(function_call, "name", None)
-                            fn_args = getattr(function_call, "arguments", None)
+def _text_delta_chunk(chunk: Any) -> Optional[GenericStreamingChunk]:
+    """
+    Fast path of `StreamTranslator.to_generic_streaming_chunk()` for plain
+    `response.output_text.delta` events (the vast majority of the events of a
+    Responses API stream). Produces exactly the same chunk as the general path,
+    but reads the fields of the event directly: probing a pydantic event for an
+    attribute it doesn't have raises (and swallows) an AttributeError, which
+    made up most of the per-token cost. Returns None if the chunk is not a
+    plain text delta.
+    """
+    if isinstance(chunk, dict):
+        fields = extra = chunk
+    else:
+        fields = getattr(chunk, "__dict__", None)
+        if not fields:
+            return None
+        extra = getattr(chunk, "__pydantic_extra__", None) or {}
+
+    chunk_type = fields.get("type")
+    if chunk_type != _OUTPUT_TEXT_DELTA:
+        return None
+    delta = fields.get("delta")
+    if not isinstance(delta, str) or not _TEXT_DELTA_SLOW_PATH_KEYS.isdisjoint(extra):
+        return None
+
+    provider_specific_fields: dict[str, Any] = {"responses_type": chunk_type}
+    for key in _RESPONSES_PROVIDER_FIELD_KEYS:
+        value = fields.get(key)
+        if value is None:
+            value = extra.get(key)
+        if value is not None:
+            provider_specific_fields[key] = value
+
+    index = provider_specific_fields.get("output_index")
+    if not isinstance(index, int):
+        index = fields.get("index", extra.get("index"))
+        if not isinstance(index, int):
+            index = 0
+
+    return {
+        "text": delta,
+        "is_finished": False,
+        "finish_reason": "",
+        "usage": None,
+        "index": index,
+        "tool_use": None,
+        "provider_specific_fields": provider_specific_fields,
+    }
+
+
+class StreamTranslator:
+    """
+    Converts the chunks of ONE stream (either ChatCompletions or Responses API
+    one) into GenericStreamingChunk objects.
+
+    A new translator has to be created for every stream: it keeps the state
+    that is needed to reassemble Responses API tool calls from the events they
+    are spread across (see `eof_finalize_chunk()` for the end of the stream).
+
+    Only a single tool call is emitted per stream, unless
+    `parallel_tool_calls=True` - then every tool call of the response is
+    emitted (with its own tool_use index: 0, 1, 2, ...). By default a tool call
+    is emitted at once, when its arguments are complete. With
+    `stream_tool_arguments=True` its name and id are emitted as soon as the
+    provider announces the call (`response.output_item.added`) and the
+    arguments are forwarded as incremental tool_use deltas while they stream.
+    """
+
+    def __init__(self, *, stream_tool_arguments: bool = False, parallel_tool_calls: bool = False) -> None:
+        self.stream_tool_arguments = stream_tool_arguments
+        self.parallel_tool_calls = parallel_tool_calls
+
+        # Minimal state to accumulate Responses function_call arguments across chunks
+        self._tool_state: dict[str, dict[str, Any]] = {}
+        # Track which Responses tool item (by item_id) we have adopted for this turn.
+        # We only ever emit a single tool_use for the adopted item.
+        self._adopted_item_id: Optional[str] = None
+        # The items whose tool_use was emitted (or started being emitted) -> their tool_use indices. Without
+        # parallel tool calls there is at most one such item and any other tool item gets ignored.
+        self._tool_indices: dict[Any, int] = {}
+
+        self.telemetry: dict[str, Any] = {
+            "saw_tool_items": 0,
+            "adopted_item_id": None,
+            "adopted_output_index": None,
+        }
+
+    @property
+    def extra_tool_items_ignored(self) -> int:
+        """How many of the tool calls announced so far were (or will be) dropped - see `parallel_tool_calls`."""
+        return max(0, self.telemetry["saw_tool_items"] - len(self._tool_indices))
+
+    def to_generic_streaming_chunk(self, chunk: Any) -> GenericStreamingChunk:
+        """
+        Best-effort convert a LiteLLM ModelResponseStream chunk into
+        GenericStreamingChunk.
+
+        GenericStreamingChunk TypedDict keys:
+          - text: str (required)
+          - is_finished: bool (required)
+          - finish_reason: str (required)
+          - usage: Optional[ChatCompletionUsageBlock] (we pass None for incremental
+            chunks)
+          - index: int (default 0)
+          - tool_use: Optional[ChatCompletionToolCallChunk] (default None)
+          - provider_specific_fields: Optional[dict]
+        """
+        text_delta_chunk = _text_delta_chunk(chunk)
+        if text_delta_chunk is not None:
+            return text_delta_chunk
+
+        # Defaults
+        text: str = ""
+        finish_reason: str = ""
+        is_finished: bool = False
+        index: int = 0
+        provider_specific_fields: Optional[dict[str, Any]] = None
+        tool_use: Optional[dict[str, Any]] = None
+
+        try:
+            # chunk may be a pydantic object with attributes
+            choices = getattr(chunk, "choices", None)
+            provider_specific_fields = getattr(chunk, "provider_specific_fields", None)
+
+            if isinstance(choices, list) and choices:
+                choice = choices[0]
+                # Try common OpenAI-like shapes
+                delta = getattr(choice, "delta", None)
+                if delta is not None:
+                    # delta might be an object or dict
+                    content = getattr(delta, "content", None)
+                    if content is None and isinstance(delta, dict):
+                        content = delta.get("content")
+                    if isinstance(content, str):
+                        text = content
+
+                    # TOOL CALLS (OpenAI-style incremental tool_calls on delta)
+                    # Attempt to normalize to a ChatCompletionToolCallChunk-like dict
+                    # Expected shape (best-effort):
+                    # { index: int, id: Optional[str], type: "function", function: {name: str|None, arguments: str|None} }
+                    tool_calls = getattr(delta, "tool_calls", None)
+                    if tool_calls is None and isinstance(delta, dict):
+                        tool_calls = delta.get("tool_calls")
+                    if isinstance(tool_calls, list) and tool_calls:
+                        tc = tool_calls[0]
+
+                        # tc can be a dict or object with attributes
+                        tc_index = _get(tc, "index", 0)
+                        tc_id = _get(tc, "id", None)
+                        tc_type = _get(tc, "type", "function")
+                        fn = _get(tc, "function", {})
+                        fn_name = _get(fn, "name", None)
+                        fn_args = _get(fn, "arguments", None)
+                        # Ensure arguments is a string for streaming deltas
                         if fn_args is not None and not isinstance(fn_args, str):
                             try:
+                                # Last resort stringification for partial structured args
                                 fn_args = str(fn_args)
                             except Exception as e:
                                 raise RuntimeError(
-                                    f"Failed to convert OpenAI function_call to GenericStreamingChunk: {e}"
+                                    f"Failed to convert OpenAI tool_use to GenericStreamingChunk: {e}"
                                 ) from e
 
                         tool_use = {
-                            "index": 0,
-                            "id": None,
-                            "type": "function",
+                            "index": tc_index if isinstance(tc_index, int) else 0,
+                            "id": tc_id if isinstance(tc_id, str) else None,
+                            "type": tc_type if isinstance(tc_type, str) else "function",
                             "function": {
                                 "name": fn_name if isinstance(fn_name, str) else None,
                                 "arguments": fn_args if isinstance(fn_args, str) else None,
                             },
                         }
 
-            # Some providers use `text`
-            if not text:
-                content_text = getattr(choice, "text", None)
-                if isinstance(content_text, str):
-                    text = content_text
+                    # Anthropic-style tool_use block on delta
+                    if tool_use is None:
+                        a_tool_use = getattr(delta, "tool_use", None)
+                        if a_tool_use is None and isinstance(delta, dict):
+                            a_tool_use = delta.get("tool_use")
+                        if a_tool_use is not None:
+                            tu_id = _get(a_tool_use, "id", None)
+                            tu_name = _get(a_tool_use, "name", None)
+                            tu_input = _get(a_tool_use, "input", None)
+                            # Represent input as a string for arguments to keep consistency
+                            if tu_input is not None and not isinstance(tu_input, str):
+                                try:
+                                    tu_input = str(tu_input)
+                                except Exception as e:
+                                    raise RuntimeError(
+                                        f"Failed to convert Anthropic tool_use to GenericStreamingChunk: {e}"
+                                    ) from e
+
+                            tool_use = {
+                                "index": 0,
+                                "id": tu_id if isinstance(tu_id, str) else None,
+                                "type": "function",
+                                "function": {
+                                    "name": tu_name if isinstance(tu_name, str) else None,
+                                    "arguments": tu_input if isinstance(tu_input, str) else None,
+                                },
+                            }
+
+                    # Older OpenAI-style function_call on delta
+                    if tool_use is None:
+                        function_call = getattr(delta, "function_call", None)
+                        if function_call is None and isinstance(delta, dict):
+                            function_call = delta.get("function_call")
+                        if function_call is not None:
+                            # function_call can be dict-like or object-like
+                            fn_name = None
+                            fn_args = None
+                            if isinstance(function_call, dict):
+                                fn_name = function_call.get("name")
+                                fn_args = function_call.get("arguments")
+                            else:
+                                fn_name = getattr(function_call, "name", None)
+                                fn_args = getattr(function_call, "arguments", None)
+                            if fn_args is not None and not isinstance(fn_args, str):
+                                try:
+                                    fn_args = str(fn_args)
+                                except Exception as e:
+                                    raise RuntimeError(
+                                        f"Failed to convert OpenAI function_call to GenericStreamingChunk: {e}"
+                                    ) from e
+
+                            tool_use = {
+                                "index": 0,
+                                "id": None,
+                                "type": "function",
+                                "function": {
+                                    "name": fn_name if isinstance(fn_name, str) else None,
+                                    "arguments": fn_args if isinstance(fn_args, str) else None,
+                                },
+                            }
 
-            # Finish reason & index if available
-            fr = getattr(choice, "finish_reason", None)
-            if isinstance(fr, str):
-                finish_reason = fr
-                is_finished = bool(fr)
+                # Some providers use `text`
+                if not text:
+                    content_text = getattr(choice, "text", None)
+                    if isinstance(content_text, str):
+                        text = content_text
 
-            idx = getattr(choice, "index", None)
-            if isinstance(idx, int):
-                index = idx
+                # Finish reason & index if available
+                fr = getattr(choice, "finish_reason", None)
+                if isinstance(fr, str):
+                    finish_reason = fr
+                    is_finished = bool(fr)
 
-        else:
-            responses_data = _try_parse_responses_chunk(chunk)
-            if responses_data is not None:
-                text = responses_data["text"]
-                finish_reason = responses_data["finish_reason"]
-                is_finished = responses_data["is_finished"]
-                index = responses_data["index"]
-                if responses_data["tool_use"] is not None:
-                    tool_use = responses_data["tool_use"]
-                new_provider_fields = responses_data["provider_specific_fields"]
-                if new_provider_fields is not None:
-                    provider_specific_fields = new_provider_fields
-
-        # Fallbacks
-        # TODO Are these fallbacks ok ? Should we raise errors instead ?
-        if not isinstance(text, str):
-            text = ""
+                idx = getattr(choice, "index", None)
+                if isinstance(idx, int):
+                    index = idx
+
+            else:
+                responses_data = self._try_parse_responses_chunk(chunk)
+                if responses_data is not None:
+                    text = responses_data["text"]
+                    finish_reason = responses_data["finish_reason"]
+                    is_finished = responses_data["is_finished"]
+                    index = responses_data["index"]
+                    if responses_data["tool_use"] is not None:
+                        tool_use = responses_data["tool_use"]
+                    new_provider_fields = responses_data["provider_specific_fields"]
+                    if new_provider_fields is not None:
+                        provider_specific_fields = new_provider_fields
+
+            # Fallbacks
+            # TODO Are these fallbacks ok ? Should we raise errors instead ?
+            if not isinstance(text, str):
+                text = ""
+            if not isinstance(finish_reason, str):
+                finish_reason = ""
+            if not isinstance(index, int):
+                index = 0
+
+        except Exception as e:
+            raise ProxyError(f"Failed to convert to GenericStreamingChunk: {e}") from e
+
+        return {
+            "text": text,
+            "is_finished": is_finished,
+            "finish_reason": finish_reason,
+            "usage": None,  # TODO Do we have to put anything in here ?
+            "index": index,
+            "tool_use": tool_use,
+            "provider_specific_fields": provider_specific_fields,
+        }
+
+    def should_skip(self, generic_chunk: GenericStreamingChunk) -> bool:
+        """
+        Whether the chunk carries nothing and can be left out of the stream.
+        This is the case for the empty chunks that follow a tool call - LiteLLM
+        (when it converts the stream to the Anthropic format) would open a new,
+        empty text content block after the tool_use block for each of them.
+        """
+        return (
+            bool(self._tool_indices)
+            and not generic_chunk["text"]
+            and generic_chunk["tool_use"] is None
+            and not generic_chunk["is_finished"]
+            and not generic_chunk["finish_reason"]
+        )
+
+    def eof_finalize_chunk(self) -> Optional[GenericStreamingChunk]:
+        """
+        Finalize a pending tool call if the stream ended without a terminal
+        event. If we have buffered args for the adopted tool and they parse as
+        JSON, emit a single tool_use. Otherwise emit an assistant-visible error.
+        Always clears internal tool state.
+        """
+        try:
+            adopted = self._adopted_item_id
+            if not adopted or adopted not in self._tool_state:
+                # Nothing pending
+                return None
+            state = self._tool_state.get(adopted, {})
+            if state.get("emitted"):
+                return None
+            args_str = _joined_tool_args(state)
+            # Strict JSON parse if non-empty; empty means {} is fine
+            if isinstance(args_str, str) and args_str:
+                try:
+                    json.loads(args_str)
+                    args_ok = True
+                except Exception:
+                    args_ok = False
+            else:
+                args_ok = True
+
+            if args_ok and state.get("header_sent"):
+                # The name, the id and (a part of) the arguments were already streamed to the client
+                state["args_done"] = True
+                tool_use = self._maybe_emit_tool(adopted)
+                if tool_use is None:
+                    return None
+                return {
+                    "text": "",
+                    "is_finished": False,
+                    "finish_reason": "",
+                    "usage": None,
+                    "index": state.get("index", 0),
+                    "tool_use": tool_use,
+                    "provider_specific_fields": {"responses_type": "eof_fallback"},
+                }
+            if args_ok:
+                tool_index = self._claim_tool_index(adopted)
+                if tool_index is None:
+                    # A tool call was already emitted (and parallel tool calls are off)
+                    return None
+                tool_use = {
+                    "index": tool_index,
+                    "id": state.get("id"),
+                    "type": "function",
+                    "function": {
+                        "name": state.get("name"),
+                        "arguments": args_str or "{}",
+                    },
+                }
+                chunk: GenericStreamingChunk = {
+                    "text": "",
+                    "is_finished": False,
+                    "finish_reason": "",
+                    "usage": None,
+                    "index": state.get("index", 0),
+                    "tool_use": tool_use,
+                    "provider_specific_fields": {"responses_type": "eof_fallback"},
+                }
+                return chunk
+            # Emit an assistant-visible error if args could not be finalized
+            err = "Provider ended stream before tool arguments were finalized."
+            return {
+                "text": err,
+                "is_finished": False,
+                "finish_reason": "error",
+                "usage": None,
+                "index": 0,
+                "tool_use": None,
+                "provider_specific_fields": {"responses_type": "eof_fallback_error"},
+            }
+        finally:
+            # Clear state regardless
+            try:
+                self._tool_state.clear()
+            except Exception:
+                pass
+            self._adopted_item_id = None
+            self._tool_indices.clear()
+
+    def _maybe_emit_tool(self, item_id: str, default_index: int = 0) -> Optional[dict[str, Any]]:
+        state = self._tool_state.get(item_id)
+        if not state or state.get("emitted"):
+            return None
+        if not state.get("args_done"):
+            return None
+        if not state.get("name"):
+            return None
+
+        final_args = _joined_tool_args(state)
+        if state.get("header_sent"):
+            # Streamed tool call: only the part of the arguments the client hasn't seen yet is left
+            streamed_len = state.get("streamed_len", 0)
+            remaining_args = final_args[streamed_len:] if streamed_len else (final_args or "{}")
+            state["emitted"] = True
+            _log_responses_tool(f"finished streaming tool_use item_id={item_id} name={state.get('name')}")
+            return _tool_use_delta(remaining_args, state["tool_index"]) if remaining_args else None
+
+        tool_index = self._claim_tool_index(item_id)
+        if tool_index is None:
+            return None
+        tool_use = {
+            "index": tool_index,
+            "id": state.get("id"),
+            "type": "function",
+            "function": {
+                "name": state.get("name"),
+                "arguments": final_args or "{}",
+            },
+        }
+        _log_responses_tool(f"emitting tool_use item_id={item_id} name={state.get('name')} index={tool_use['index']}")
+        state["emitted"] = True
+        return tool_use
+
+    def _claim_tool_index(self, item_id: Any) -> Optional[int]:
+        """
+        Return the tool_use index for the item (assigning the next one if the
+        item is new) or None if the item has to be ignored because another
+        tool call was already emitted and parallel tool calls are off.
+        """
+        tool_index = self._tool_indices.get(item_id)
+        if tool_index is None:
+            if self._tool_indices and not self.parallel_tool_calls:
+                return None
+            tool_index = len(self._tool_indices)
+            self._tool_indices[item_id] = tool_index
+        return tool_index
+
+    def _maybe_start_streaming_tool(self, item_id: str) -> Optional[dict[str, Any]]:
+        """
+        `stream_tool_arguments` mode: emit the name and the id of the tool call
+        right away (the arguments follow as tool_use deltas).
+        """
+        state = self._tool_state.get(item_id)
+        if not self.stream_tool_arguments or not state or state.get("header_sent") or state.get("emitted"):
+            return None
+        if not self.parallel_tool_calls and self._adopted_item_id not in (None, item_id):
+            return None
+        if not state.get("name") or not state.get("id"):
+            return None
+        tool_index = self._claim_tool_index(item_id)
+        if tool_index is None:
+            return None
+
+        self._adopted_item_id = item_id
+        state["header_sent"] = True
+        state["streamed_len"] = 0
+        state["tool_index"] = tool_index
+        _log_responses_tool(f"streaming tool_use item_id={item_id} name={state.get('name')} index={tool_index}")
+        return {
+            "index": tool_index,
+            "id": state["id"],
+            "type": "function",
+            "function": {"name": state["name"], "arguments": ""},
+        }
+
+    def _try_parse_responses_chunk(self, chunk: Any) -> Optional[dict[str, Any]]:
+        chunk_type = _get(chunk, "type")
+        if not isinstance(chunk_type, str) or not chunk_type:
+            chunk_type = _get(chunk, "event")
+        if not isinstance(chunk_type, str) or not chunk_type:
+            return None
+        if not chunk_type.startswith("response."):
+            return None
+
+        finish_reason = _get(chunk, "finish_reason")
         if not isinstance(finish_reason, str):
             finish_reason = ""
+
+        index = _get(chunk, "output_index")
         if not isinstance(index, int):
-            index = 0
+            candidate_index = _get(chunk, "index")
+            index = candidate_index if isinstance(candidate_index, int) else 0
+
+        # Only stream assistant text for explicit output_text.delta events (never flatten aggregated output_text
+        # of the structural events to avoid duplication)
+        text = ""
+        chunk_delta = _get(chunk, "delta")
+        if chunk_type == _OUTPUT_TEXT_DELTA:
+            if isinstance(chunk_delta, str):
+                text = chunk_delta
+            elif isinstance(chunk_delta, dict):
+                delta_text = chunk_delta.get("text")
+                if isinstance(delta_text, str):
+                    text = delta_text
+
+        # Tool calls are only emitted once - on *.arguments.done / output_item.done / the completed fallback
+        tool_use = None
+        handler = self._EVENT_HANDLERS.get(chunk_type)
+        if handler is not None:
+            tool_use = handler(self, chunk, index)
+
+        is_finished = chunk_type.endswith(_RESPONSES_TERMINAL_SUFFIXES) or chunk_type == "response.error"
+        if is_finished and tool_use is None and self._tool_indices:
+            # An (empty) continuation of the last tool call keeps LiteLLM from opening an empty text content block
+            # after the tool_use block when it converts the final chunk to the Anthropic format
+            tool_use = _tool_use_delta("", len(self._tool_indices) - 1)
+        if chunk_type == "response.error" and not finish_reason:
+            finish_reason = "error"
+        elif is_finished and not finish_reason:
+            finish_reason = "stop"
 
-    except Exception as e:
-        raise ProxyError(f"Failed to convert to GenericStreamingChunk: {e}") from e
+        # Terminal cleanup: clear buffered tool state to avoid leaks across turns
+        if chunk_type in _RESPONSES_TERMINAL_EVENTS:
+            self._tool_state.clear()
+            self._adopted_item_id = None
+
+        provider_specific_fields: dict[str, Any] = {"responses_type": chunk_type}
+        for key in _RESPONSES_PROVIDER_FIELD_KEYS:
+            value = _get(chunk, key)
+            if value is not None:
+                provider_specific_fields[key] = value
+        if isinstance(chunk_delta, dict):
+            provider_specific_fields["delta"] = dict(chunk_delta)
+
+        return {  # TODO Wrap it into an actual GenericStreamingChunk object ?
+            "text": text,
+            "finish_reason": finish_reason,
+            "is_finished": is_finished,
+            "index": index,
+            "tool_use": tool_use,
+            "provider_specific_fields": provider_specific_fields,
+        }
 
-    return {
-        "text": text,
-        "is_finished": is_finished,
-        "finish_reason": finish_reason,
-        "usage": None,  # TODO Do we have to put anything in here ?
-        "index": index,
-        "tool_use": tool_use,
-        "provider_specific_fields": provider_specific_fields,
+    # Handlers of the Responses API events that carry tool calls (see `_EVENT_HANDLERS`). Every handler returns the
+    # tool_use to emit (if any).
+
+    def _on_output_item_added(self, chunk: Any, index: int) -> Optional[dict[str, Any]]:
+        # Responses tool/function call start event
+        # NOTE: The items are pydantic objects (not dicts) when they come from LiteLLM
+        item = _get(chunk, "item")
+        if item is None or _get(item, "type") not in _TOOL_ITEM_TYPES:
+            return None
+
+        name = _get(item, "name") or _get(item, "function_name")
+        call_id = _get(item, "id") or _get(item, "call_id") or _get(item, "tool_call_id")
+        # Track this function call by its item id
+        item_id = _get(item, "id")
+        state = self._tool_state.get(item_id)
+        if state is None:
+            state = _new_tool_state(item_id, index)
+            self._tool_state[item_id] = state
+
+        state["name"] = state.get("name") or (name if isinstance(name, str) else None)
+        state["id"] = state.get("id") or (call_id if isinstance(call_id, str) else None)
+        # The chunks are not modified after they are streamed, so no need to copy the item
+        state["raw_item"] = item
+        _log_responses_tool(f"output_item.added item_id={item_id} name={state.get('name')} call_id={state.get('id')}")
+        self.telemetry["saw_tool_items"] = self.telemetry.get("saw_tool_items", 0) + 1
+        if self._adopted_item_id is None and isinstance(item_id, str):
+            self.telemetry["adopted_item_id"] = item_id
+            self.telemetry["adopted_output_index"] = index
+        return self._maybe_start_streaming_tool(item_id) or self._maybe_emit_tool(item_id, default_index=index)
+
+    def _on_arguments_delta(self, chunk: Any, index: int) -> Optional[dict[str, Any]]:
+        # Accumulate streaming function_call arguments (some providers may stream JSON arguments via
+        # input_json.delta instead)
+        item_id = _get(chunk, "item_id")
+        delta_text = _get(chunk, "delta")
+        if not isinstance(item_id, str) or not isinstance(delta_text, str):
+            return None
+
+        state = self._tool_state.get(item_id)
+        if state is None:
+            state = _new_tool_state(item_id, index)
+            self._tool_state[item_id] = state
+        # Adopt the first item we see args for
+        if self._adopted_item_id is None:
+            self._adopted_item_id = item_id
+            _log_responses_tool(f"adopted tool item_id={item_id} via {_get(chunk, 'type')}")
+        state["arg_chunks"].append(delta_text)
+        if state.get("header_sent") and not state.get("emitted"):
+            state["streamed_len"] += len(delta_text)
+            return _tool_use_delta(delta_text, state["tool_index"])
+        return self._maybe_emit_tool(item_id, default_index=index)
+
+    def _on_arguments_done(self, chunk: Any, index: int) -> Optional[dict[str, Any]]:
+        # Finalize args on done
+        item_id = _get(chunk, "item_id")
+        if not isinstance(item_id, str) or item_id not in self._tool_state:
+            return None
+
+        # If we haven't adopted yet (no deltas ever), adopt now
+        if self._adopted_item_id is None:
+            self._adopted_item_id = item_id
+            _log_responses_tool(f"adopted tool item_id={item_id} via arguments.done")
+        state = self._tool_state[item_id]
+        if (self._adopted_item_id != item_id and not self.parallel_tool_calls) or state.get("emitted"):
+            return None
+
+        _apply_tool_identity(state)
+        final_args = _stringify_tool_arguments(_get(chunk, "arguments"))
+        if isinstance(final_args, str) and final_args:
+            state["arg_chunks"] = [final_args]
+        state["args_done"] = True
+        return self._maybe_emit_tool(item_id, default_index=index)
+
+    def _on_output_item_done(self, chunk: Any, index: int) -> Optional[dict[str, Any]]:
+        item = _get(chunk, "item")
+        if item is None or _get(item, "type") not in _TOOL_ITEM_TYPES:
+            return None
+        item_id = _get(item, "id")
+        if not isinstance(item_id, str) or item_id not in self._tool_state:
+            return None
+
+        tool_use = None
+        state = self._tool_state[item_id]
+        if not state.get("emitted"):
+            _apply_tool_identity(state, fallback=item)
+            final_args = _stringify_tool_arguments(_get(item, "arguments"))
+            if isinstance(final_args, str) and final_args:
+                state["arg_chunks"] = [final_args]
+            if not state.get("args_done"):
+                state["args_done"] = True
+            tool_use = self._maybe_emit_tool(item_id, default_index=index)
+        del self._tool_state[item_id]
+        # Clear adoption if it was this item
+        if self._adopted_item_id == item_id:
+            self._adopted_item_id = None
+        return tool_use
+
+    def _on_response_finished(self, chunk: Any, index: int) -> Optional[dict[str, Any]]:
+        # For completed responses, check response.output for tool calls (unless one was emitted already)
+        if self._tool_indices:
+            return None
+        response_obj = _get(chunk, "response")
+        if response_obj is None:
+            return None
+        output = _get(response_obj, "output")
+        if not isinstance(output, list):
+            return None
+
+        for item in output:
+            if _get(item, "type") not in _TOOL_ITEM_TYPES:
+                continue
+            name = _get(item, "name") or _get(item, "function_name")
+            arguments = _get(item, "arguments") or _get(item, "input") or _get(item, "input_json")
+            if arguments is not None and not isinstance(arguments, str):
+                try:
+                    arguments = str(arguments)
+                except Exception as exc:
+                    raise ProxyError("Failed to convert Responses output tool_call arguments to string") from exc
+            call_id = _get(item, "id") or _get(item, "call_id") or _get(item, "tool_call_id")
+            if self._adopted_item_id is None or self._adopted_item_id == _get(item, "id"):
+                final_args = arguments if isinstance(arguments, str) and arguments else "{}"
+                fallback_state = {
+                    "item_id": _get(item, "id"),
+                    "name": name if isinstance(name, str) else None,
+                    "id": call_id if isinstance(call_id, str) else None,
+                    "arg_chunks": [final_args],
+                    "args_done": True,
+                    "emitted": False,
+                    "index": index,
+                    "raw_item": item,
+                }
+                self._tool_state[_get(item, "id")] = fallback_state
+                return self._maybe_emit_tool(_get(item, "id"), default_index=index)
+            return None
+        return None
+
+    _EVENT_HANDLERS: dict[str, Callable[["StreamTranslator", Any, int], Optional[dict[str, Any]]]] = {
+        "response.output_item.added": _on_output_item_added,
+        "response.function_call_arguments.delta": _on_arguments_delta,
+        "response.input_json.delta": _on_arguments_delta,
+        "response.function_call_arguments.done": _on_arguments_done,
+        "response.output_item.done": _on_output_item_done,
+        "response.completed": _on_response_finished,
+        "response.failed": _on_response_finished,
+        "response.canceled": _on_response_finished,
+        "response.cancelled": _on_response_finished,
     }
 
 
+def to_generic_streaming_chunk(chunk: Any) -> GenericStreamingChunk:
+    """
+    Convert a single chunk into GenericStreamingChunk without keeping any state
+    between the chunks. Good enough for ChatCompletions streams - use a
+    StreamTranslator for Responses API streams (tool calls span many events).
+    """
+    return StreamTranslator().to_generic_streaming_chunk(chunk)
+
+
 _INPUT_TYPE_ALIASES = {
     "text": "input_text",
     "input_text": "input_text",
@@ -444,25 +958,81 @@ _FUNCTION_METADATA_KEYS = ("description", "parameters", "strict")
 
 _UNSUPPORTED_RESPONSES_PARAMS = {"stream_options"}
 
+# Claude Code resends the whole (growing) conversation on every turn. Already
+# converted Responses API input items are cached per conversation (keyed by a
+# hash of its first messages), so that only the messages appended since the
+# previous turn need to be converted.
+RESPAPI_MESSAGES_CACHE = LruCache(
+    name="respapi_messages",
+    max_entries=int(os.environ.get("RESPAPI_MESSAGES_CACHE_MAX_ENTRIES", "64")),
+    max_bytes=int(os.environ.get("RESPAPI_MESSAGES_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
+# How many messages from the beginning of the conversation identify it
+_RESPAPI_MESSAGES_CACHE_HEAD_LEN = 2
+
+
+class _ConvertedConversation(NamedTuple):
+    # The chat messages the items were converted from
+    source: tuple[Any, ...]
+    # The converted Responses API input items
+    items: tuple[dict[str, Any], ...]
+    # i-th checkpoint describes the conversion of source[:i + 1]
+    checkpoints: tuple["_ConversionCheckpoint", ...]
+
+
+class _ConversionCheckpoint(NamedTuple):
+    num_items: int
+    last_func_call_id: Optional[str]
+    # Estimated size of the source messages so far
+    size: int
+
+
+# Claude Code sends a byte-identical tool list for the whole session, so the
+# converted tool arrays are cached too
+RESPAPI_TOOLS_CACHE = LruCache(
+    name="respapi_tools",
+    max_entries=int(os.environ.get("RESPAPI_TOOLS_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.environ.get("RESPAPI_TOOLS_CACHE_MAX_MB", "16")) * 1024 * 1024,
+)
+
+
+class _ConvertedTools(NamedTuple):
+    # The inbound tool list the tools were converted from
+    source: Any
+    # The converted Responses API tools (shared between the requests, so they
+    # must not be mutated)
+    tools: tuple[dict[str, Any], ...]
+
+
+def convert_chat_params_to_respapi(
+    optional_params: dict[str, Any], *, parallel_tool_calls: bool = False
+) -> dict[str, Any]:
+    """
+    Return a copy of optional params adjusted for the Responses API.
 
-def convert_chat_params_to_respapi(optional_params: dict[str, Any]) -> dict[str, Any]:
-    """Return a copy of optional params adjusted for the Responses API."""
+    Parallel tool calls are disabled unless `parallel_tool_calls` is True (see
+    `PARALLEL_TOOL_CALLS_MODELS`).
+
+    NOTE: The copy is shallow (copy-on-write) - values that don't need to be
+    converted (tool JSON schemas, for example) are shared with
+    `optional_params` and must not be mutated in place.
+    """
 
     if optional_params is None:
         return {}
     if not isinstance(optional_params, dict):
         raise TypeError("optional_params must be a dictionary when targeting the Responses API")
 
-    params = deepcopy(optional_params)
+    params = dict(optional_params)
 
-    # Claude Code expects one tool call per turn; disable parallel tool calls
-    # at the request level for Responses API.
-    # Force disable parallel tool calls; Claude Code executes one tool per turn
-    params["parallel_tool_calls"] = False
+    # Unless enabled for the route, disable parallel tool calls at the request
+    # level for Responses API (the model is also instructed to make at most one
+    # tool call per response - see ENFORCE_ONE_TOOL_CALL_PER_RESPONSE)
+    params["parallel_tool_calls"] = parallel_tool_calls
 
     tools = params.get("tools")
     if tools is not None:
-        converted_tools = _convert_tools_list(tools)
+        converted_tools = _convert_tools_list_cached(tools)
         if converted_tools:
             params["tools"] = converted_tools
         else:
@@ -491,14 +1061,109 @@ def convert_chat_params_to_respapi(optional_params: dict[str, Any]) -> dict[str,
 
 
 def convert_chat_messages_to_respapi(messages: list[Any]) -> list[dict[str, Any]]:
-    """Convert Chat Completions style messages into Responses API compatible items."""
+    """
+    Convert Chat Completions style messages into Responses API compatible items.
+
+    NOTE: Only the message and content part containers that get rewritten are
+    copied, the rest is shared with `messages` (copy-on-write) and must not be
+    mutated in place.
+
+    The conversion is incremental: if the beginning of the same conversation
+    was converted before (see `RESPAPI_MESSAGES_CACHE`), only the remaining
+    messages are converted.
+    """
 
     if not isinstance(messages, list):
         raise TypeError("messages must be provided as a list")
 
+    if not RESPAPI_MESSAGES_CACHE.enabled or len(messages) <= _RESPAPI_MESSAGES_CACHE_HEAD_LEN:
+        converted, _ = _convert_chat_messages_slice(messages, start=0, converted=[], last_func_call_id=None)
+        return converted
+
+    try:
+        head = json.dumps(messages[:_RESPAPI_MESSAGES_CACHE_HEAD_LEN], separators=(",", ":"), default=str)
+        cache_key = hashlib.blake2b(head.encode("utf-8"), digest_size=16).digest()
+    except Exception:  # pylint: disable=broad-exception-caught
+        cache_key = None
+
+    start = 0
     converted: list[dict[str, Any]] = []
     last_func_call_id: Optional[str] = None
-    for idx, message in enumerate(messages):
+    prev_checkpoints: tuple[_ConversionCheckpoint, ...] = ()
+
+    cached: Optional[_ConvertedConversation] = RESPAPI_MESSAGES_CACHE.peek(cache_key) if cache_key else None
+    if cached is not None:
+        # Find how many leading messages are identical to the cached ones.
+        # (Comparing the messages is a lot cheaper than hashing them, since
+        # equal strings are compared with memcmp.)
+        max_len = min(len(messages), len(cached.checkpoints))
+        while start < max_len and messages[start] == cached.source[start]:
+            start += 1
+
+    if start > 0:
+        RESPAPI_MESSAGES_CACHE.record_hit()
+        checkpoint = cached.checkpoints[start - 1]
+        converted = list(cached.items[: checkpoint.num_items])
+        last_func_call_id = checkpoint.last_func_call_id
+        prev_checkpoints = cached.checkpoints[:start]
+    else:
+        RESPAPI_MESSAGES_CACHE.record_miss()
+
+    converted, new_checkpoints = _convert_chat_messages_slice(
+        messages, start=start, converted=converted, last_func_call_id=last_func_call_id
+    )
+
+    if cache_key is not None:
+        checkpoints = list(prev_checkpoints)
+        size = checkpoints[-1].size if checkpoints else 0
+        for idx, (num_items, checkpoint_last_func_call_id) in enumerate(new_checkpoints, start=start):
+            size += _estimate_size(messages[idx])
+            checkpoints.append(_ConversionCheckpoint(num_items, checkpoint_last_func_call_id, size))
+        if checkpoints:
+            RESPAPI_MESSAGES_CACHE.put(
+                cache_key,
+                _ConvertedConversation(
+                    source=tuple(messages[: len(checkpoints)]),
+                    items=tuple(converted[: checkpoints[-1].num_items]),
+                    checkpoints=tuple(checkpoints),
+                ),
+                size=checkpoints[-1].size,
+            )
+    return converted
+
+
+def _estimate_size(obj: Any) -> int:
+    """Roughly estimate the memory taken by a JSON-like object (strings dominate)."""
+    if isinstance(obj, str):
+        return len(obj) + 50
+    if isinstance(obj, dict):
+        return 100 + sum(_estimate_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return 60 + sum(_estimate_size(v) for v in obj)
+    return 30
+
+
+def _convert_chat_messages_slice(
+    messages: list[Any],
+    *,
+    start: int,
+    converted: list[dict[str, Any]],
+    last_func_call_id: Optional[str],
+) -> tuple[list[dict[str, Any]], list[tuple[int, Optional[str]]]]:
+    """
+    Convert `messages[start:]`, appending the resulting items to `converted`.
+
+    Returns the converted items and a list of checkpoints - one
+    `(num_items, last_func_call_id)` tuple per converted message - from which
+    the conversion can be continued later. Checkpoints stop at the first
+    message whose conversion depends on the messages that follow it (an
+    assistant tool call without an id that couldn't "borrow" it from a later
+    tool message).
+    """
+    checkpoints: list[tuple[int, Optional[str]]] = []
+    is_prefix_stable = True
+    for idx in range(start, len(messages)):
+        message = messages[idx]
         if not isinstance(message, dict):
             raise TypeError(f"Chat message at index {idx} must be a mapping")
 
@@ -531,6 +1196,8 @@ def convert_chat_messages_to_respapi(messages: list[Any]) -> list[dict[str, Any]
                                     peek_id = mj.get("tool_call_id") or mj.get("call_id")
                                     if peek_id:
                                         break
+                            if not peek_id:
+                                is_prefix_stable = False
                             call_id = peek_id or f"fc_{idx}"
                         converted.append(
                             {
@@ -565,12 +1232,14 @@ def convert_chat_messages_to_respapi(messages: list[Any]) -> list[dict[str, Any]
                     "output": output_str or "",
                 }
             )
+            if is_prefix_stable:
+                checkpoints.append((len(converted), last_func_call_id))
             continue
 
         # Drop tool_calls and function_call - Responses API doesn't support these in message content
         # We already emitted function_call / function_call_output items above.
         keys_to_exclude = {"content"} | _MESSAGE_KEYS_TO_DROP
-        new_message: dict[str, Any] = {k: deepcopy(v) for k, v in message.items() if k not in keys_to_exclude}
+        new_message: dict[str, Any] = {k: v for k, v in message.items() if k not in keys_to_exclude}
 
         # Responses API supports: assistant, system, developer, user
         normalized_role = role
@@ -578,8 +1247,10 @@ def convert_chat_messages_to_respapi(messages: list[Any]) -> list[dict[str, Any]
         content = message.get("content")
         new_message["content"] = _normalize_message_content(normalized_role, content)
         converted.append(new_message)
+        if is_prefix_stable:
+            checkpoints.append((len(converted), last_func_call_id))
 
-    return converted
+    return converted, checkpoints
 
 
 def _normalize_message_content(role: str, content: Any) -> list[Any]:
@@ -609,10 +1280,9 @@ def _convert_content_part(role: str, part: Any) -> dict[str, Any]:
     if not isinstance(part, dict):
         return {"type": _default_content_type_for_role(role), "text": str(part)}
 
-    new_part = deepcopy(part)
-    for key in list(new_part):
-        if key in _CONTENT_KEYS_TO_DROP:
-            new_part.pop(key, None)
+    # Only top-level keys of the part are rewritten below, so a shallow copy is
+    # enough
+    new_part = {k: v for k, v in part.items() if k not in _CONTENT_KEYS_TO_DROP}
     part_type = new_part.get("type")
     normalized_type = _normalize_type_by_role(role, part_type)
     if normalized_type is not None:
@@ -683,6 +1353,56 @@ def _is_anthropic_web_search_tool(tool: dict) -> bool:
     return False
 
 
+def _convert_tools_list_cached(tools: Any) -> list[dict[str, Any]]:
+    """Same as `_convert_tools_list()`, but reuses the tools converted for previous requests."""
+    cache_key = _tools_cache_key(tools) if RESPAPI_TOOLS_CACHE.enabled else None
+    if cache_key is None:
+        return _convert_tools_list(tools)
+
+    cached: Optional[_ConvertedTools] = RESPAPI_TOOLS_CACHE.peek(cache_key)
+    if cached is not None and cached.source == tools:
+        RESPAPI_TOOLS_CACHE.record_hit()
+        return list(cached.tools)
+
+    RESPAPI_TOOLS_CACHE.record_miss()
+    converted = _convert_tools_list(tools)
+    RESPAPI_TOOLS_CACHE.put(
+        cache_key,
+        _ConvertedTools(source=tools, tools=tuple(converted)),
+        size=_estimate_size(tools),
+    )
+    return converted
+
+
+def _tools_cache_key(tools: Any) -> Optional[tuple[Any, ...]]:
+    """
+    A cheap key for the tool list (tool names and description lengths). The
+    key alone doesn't guarantee that the tools are the same - the whole list
+    still has to be compared to the cached one (which is a lot cheaper than
+    hashing its content, since equal strings are compared with memcmp).
+    """
+    if isinstance(tools, dict):
+        tools = [tools]
+    if not isinstance(tools, list):
+        return None
+
+    key = []
+    for tool in tools:
+        if not isinstance(tool, dict):
+            return None
+        fn = tool.get("function")
+        if not isinstance(fn, dict):
+            fn = tool
+        description = fn.get("description")
+        key.append(
+            (
+                fn.get("name") or tool.get("name") or tool.get("type"),
+                len(description) if isinstance(description, str) else None,
+            )
+        )
+    return tuple(key)
+
+
 def _convert_tools_list(tools: Any) -> list[dict[str, Any]]:
     if tools is None:
         return []
@@ -713,7 +1433,7 @@ def _convert_tools_list(tools: Any) -> list[dict[str, Any]]:
         if tool.get("type") == "function" and "function" not in tool:
             name = tool.get("name")
             if isinstance(name, str) and name:
-                converted.append(deepcopy(tool))
+                converted.append(dict(tool))
             continue
 
         if tool.get("type") == "function" or "function" in tool:
@@ -722,18 +1442,18 @@ def _convert_tools_list(tools: Any) -> list[dict[str, Any]]:
             if not isinstance(name, str) or not name:
                 continue
 
-            new_tool = {k: deepcopy(v) for k, v in tool.items() if k not in {"function"}}
+            new_tool = {k: v for k, v in tool.items() if k != "function"}
             new_tool["type"] = "function"
             new_tool["name"] = name
 
             for key in _FUNCTION_METADATA_KEYS:
                 if key in fn_payload and key not in new_tool:
-                    new_tool[key] = deepcopy(fn_payload[key])
+                    new_tool[key] = fn_payload[key]
 
             converted.append(new_tool)
             continue
 
-        converted.append(deepcopy(tool))
+        converted.append(dict(tool))
 
     return converted
 
@@ -761,7 +1481,7 @@ def _convert_functions_list(functions: Any) -> list[dict[str, Any]]:
         tool_def: dict[str, Any] = {"type": "function", "name": name}
         for key in _FUNCTION_METADATA_KEYS:
             if key in fn:
-                tool_def[key] = deepcopy(fn[key])
+                tool_def[key] = fn[key]
 
         converted.append(tool_def)
 
@@ -787,9 +1507,9 @@ def _convert_tool_choice(tool_choice: Any) -> Optional[Any]:
 
             converted = {"type": "function", "name": name}
             if "arguments" in fn_payload:
-                converted["arguments"] = deepcopy(fn_payload["arguments"])
+                converted["arguments"] = fn_payload["arguments"]
             if "output" in fn_payload:
-                converted["output"] = deepcopy(fn_payload["output"])
+                converted["output"] = fn_payload["output"]
             return converted
 
         if tool_choice.get("type") == "function":
@@ -798,12 +1518,12 @@ def _convert_tool_choice(tool_choice: Any) -> Optional[Any]:
                 return None
             converted = {"type": "function", "name": name}
             if "arguments" in tool_choice:
-                converted["arguments"] = deepcopy(tool_choice["arguments"])
+                converted["arguments"] = tool_choice["arguments"]
             if "output" in tool_choice:
-                converted["output"] = deepcopy(tool_choice["output"])
+                converted["output"] = tool_choice["output"]
             return converted
 
-        return deepcopy(tool_choice)
+        return dict(tool_choice)
 
     return None
 
@@ -851,333 +1571,16 @@ def _default_content_type_for_role(role: str) -> str:
     return "input_text"
 
 
-def _try_parse_responses_chunk(chunk: Any) -> Optional[dict[str, Any]]:
-    global _RESPONSES_TOOL_ADOPTED
-
-    def _get(obj: Any, key: str, default: Any = None) -> Any:
-        if isinstance(obj, dict):
-            return obj.get(key, default)
-        return getattr(obj, key, default)
-
-    chunk_type = _get(chunk, "type")
-    if not isinstance(chunk_type, str) or not chunk_type:
-        chunk_type = _get(chunk, "event")
-    if not isinstance(chunk_type, str) or not chunk_type:
-        return None
-    if not chunk_type.startswith("response."):
-        return None
-
-    finish_reason = _get(chunk, "finish_reason")
-    if not isinstance(finish_reason, str):
-        finish_reason = ""
-
-    index = _get(chunk, "output_index")
-    if not isinstance(index, int):
-        candidate_index = _get(chunk, "index")
-        index = candidate_index if isinstance(candidate_index, int) else 0
-
-    # Only stream assistant text for explicit output_text.delta events
-    text = ""
-    chunk_delta = _get(chunk, "delta")
-    if chunk_type == "response.output_text.delta":
-        if isinstance(chunk_delta, str):
-            text = chunk_delta
-        elif isinstance(chunk_delta, dict):
-            delta_text = chunk_delta.get("text")
-            if isinstance(delta_text, str):
-                text = delta_text
-
-    # Do not pull text from generic 'text' or 'content' fields; only output_text.delta carries assistant text
-
-    # Never flatten aggregated output_text on structural events to avoid duplication
-
-    tool_use = None
-
-    def _extract_tool_identity(source: Any) -> tuple[Optional[str], Optional[str]]:
-        if not source:
-            return None, None
-        tool_name = None
-        call_id = None
-        try:
-            tool_name = _get(source, "name") or _get(source, "function_name") or _get(source, "tool_name")
-            call_id = _get(source, "call_id") or _get(source, "tool_call_id") or _get(source, "id")
-        except Exception:
-            tool_name = None
-            call_id = None
-        return (
-            tool_name if isinstance(tool_name, str) and tool_name else None,
-            call_id if isinstance(call_id, str) and call_id else None,
-        )
-
-    def _apply_tool_identity(state: dict[str, Any], fallback: Any = None) -> None:
-        if state is None:
-            return
-        raw_item = state.get("raw_item")
-        tool_name = state.get("name")
-        call_id = state.get("id")
-        for candidate in (raw_item, fallback):
-            if candidate is None:
-                continue
-            cand_name, cand_id = _extract_tool_identity(candidate)
-            if not tool_name and cand_name:
-                tool_name = cand_name
-            if not call_id and cand_id:
-                call_id = cand_id
-            if tool_name and call_id:
-                break
-        state["name"] = tool_name
-        state["id"] = call_id or state.get("item_id")
-
-    # Suppress assistant text for tool argument events
-    if chunk_type in {
-        "response.function_call_arguments.delta",
-        "response.function_call_arguments.done",
-        "response.input_json.delta",
-    }:
-        text = ""
-
-    # Handle Responses tool/function call start event: response.output_item.added
-    if chunk_type == "response.output_item.added":
-        item = _get(chunk, "item")
-        if isinstance(item, dict):
-            item_type = _get(item, "type")
-            if item_type in {"function_call", "tool_call"}:
-                name = _get(item, "name") or _get(item, "function_name")
-                call_id = _get(item, "id") or _get(item, "call_id") or _get(item, "tool_call_id")
-                # Track this function call by its item id
-                item_id_for_state = _get(item, "id")
-                if isinstance(item_id_for_state, str) and item_id_for_state:
-                    state = _RESPONSES_TOOL_STATE[item_id_for_state]
-                else:
-                    state = {
-                        "item_id": item_id_for_state,
-                        "name": None,
-                        "id": None,
-                        "args": "",
-                        "args_done": False,
-                        "emitted": False,
-                        "pending_emit": False,
-                        "index": index,
-                        "raw_item": None,
-                    }
-                    _RESPONSES_TOOL_STATE[item_id_for_state] = state
-
-                state["name"] = state.get("name") or (name if isinstance(name, str) else None)
-                state["id"] = state.get("id") or (call_id if isinstance(call_id, str) else None)
-                state["raw_item"] = deepcopy(item)
-                _log_responses_tool(
-                    f"output_item.added item_id={item_id_for_state} name={state.get('name')} call_id={state.get('id')}"
-                )
-                _RESPONSES_TELEMETRY["saw_tool_items"] = _RESPONSES_TELEMETRY.get("saw_tool_items", 0) + 1
-                if _RESPONSES_TOOL_ADOPTED is None and isinstance(item_id_for_state, str):
-                    _RESPONSES_TELEMETRY["adopted_item_id"] = item_id_for_state
-                    _RESPONSES_TELEMETRY["adopted_output_index"] = index
-                elif (
-                    _RESPONSES_TOOL_ADOPTED is not None
-                    and isinstance(item_id_for_state, str)
-                    and _RESPONSES_TOOL_ADOPTED != item_id_for_state
-                ):
-                    _RESPONSES_TELEMETRY["extra_tool_items_ignored"] = (
-                        _RESPONSES_TELEMETRY.get("extra_tool_items_ignored", 0) + 1
-                    )
-                tool_use = _maybe_emit_tool(item_id_for_state, default_index=index)
-
-    # Accumulate streaming function_call arguments
-    if chunk_type == "response.function_call_arguments.delta":
-        item_id = _get(chunk, "item_id")
-        delta_text = _get(chunk, "delta")
-        if isinstance(item_id, str) and isinstance(delta_text, str):
-            state = _RESPONSES_TOOL_STATE.get(item_id)
-            if state is None:
-                state = {
-                    "item_id": item_id,
-                    "name": None,
-                    "id": None,
-                    "args": "",
-                    "args_done": False,
-                    "emitted": False,
-                    "pending_emit": False,
-                    "index": index,
-                    "raw_item": None,
-                }
-                _RESPONSES_TOOL_STATE[item_id] = state
-            # Adopt the first item we see args for
-            if _RESPONSES_TOOL_ADOPTED is None:
-                _RESPONSES_TOOL_ADOPTED = item_id
-                _log_responses_tool(f"adopted tool item_id={item_id} via arguments.delta")
-            state["args"] = (state.get("args") or "") + delta_text
-            tool_use = _maybe_emit_tool(item_id, default_index=index)
-            tool_use = _maybe_emit_tool(item_id, default_index=index)
-
-    # Some providers may stream JSON arguments via input_json.delta
-    if chunk_type == "response.input_json.delta":
-        item_id = _get(chunk, "item_id")
-        delta_text = _get(chunk, "delta")
-        if isinstance(item_id, str) and isinstance(delta_text, str):
-            state = _RESPONSES_TOOL_STATE.get(item_id)
-            if state is None:
-                state = {
-                    "item_id": item_id,
-                    "name": None,
-                    "id": None,
-                    "args": "",
-                    "args_done": False,
-                    "emitted": False,
-                    "pending_emit": False,
-                    "index": index,
-                    "raw_item": None,
-                }
-                _RESPONSES_TOOL_STATE[item_id] = state
-            if _RESPONSES_TOOL_ADOPTED is None:
-                _RESPONSES_TOOL_ADOPTED = item_id
-                _log_responses_tool(f"adopted tool item_id={item_id} via input_json.delta")
-            state["args"] = (state.get("args") or "") + delta_text
-
-    # Finalize args on done
-    if chunk_type == "response.function_call_arguments.done":
-        item_id = _get(chunk, "item_id")
-        if isinstance(item_id, str) and item_id in _RESPONSES_TOOL_STATE:
-            # If we haven't adopted yet (no deltas ever), adopt now
-            if _RESPONSES_TOOL_ADOPTED is None:
-                _RESPONSES_TOOL_ADOPTED = item_id
-                _log_responses_tool(f"adopted tool item_id={item_id} via arguments.done")
-            state = _RESPONSES_TOOL_STATE[item_id]
-            if _RESPONSES_TOOL_ADOPTED == item_id and not state.get("emitted"):
-                _apply_tool_identity(state)
-                final_args = _get(chunk, "arguments")
-                if isinstance(final_args, (dict, list)):
-                    try:
-                        final_args = json.dumps(final_args)
-                    except Exception:
-                        final_args = str(final_args)
-                if isinstance(final_args, str) and final_args:
-                    state["args"] = final_args
-                if not isinstance(state.get("args"), str) or not state.get("args"):
-                    state["args"] = state.get("args", "")
-                state["args_done"] = True
-                tool_use = _maybe_emit_tool(item_id, default_index=index)
-
-    if chunk_type == "response.output_item.done":
-        item = _get(chunk, "item")
-        if isinstance(item, dict):
-            item_type = _get(item, "type")
-            if item_type in {"function_call", "tool_call"}:
-                item_id = _get(item, "id")
-                if isinstance(item_id, str) and item_id in _RESPONSES_TOOL_STATE:
-                    state = _RESPONSES_TOOL_STATE[item_id]
-                    if not state.get("emitted"):
-                        _apply_tool_identity(state, fallback=item)
-                        final_args = _get(item, "arguments")
-                        if isinstance(final_args, (dict, list)):
-                            try:
-                                final_args = json.dumps(final_args)
-                            except Exception:
-                                final_args = str(final_args)
-                        if isinstance(final_args, str) and final_args:
-                            state["args"] = final_args
-                        if not state.get("args_done"):
-                            state["args_done"] = True
-                        tool_use = _maybe_emit_tool(item_id, default_index=index)
-                    try:
-                        del _RESPONSES_TOOL_STATE[item_id]
-                    except Exception:
-                        pass
-                    # Clear adoption if it was this item
-                    if _RESPONSES_TOOL_ADOPTED == item_id:
-                        _RESPONSES_TOOL_ADOPTED = None
-
-    # Suppress generic function/tool_call emissions mid-stream; we only emit
-    # once on *.arguments.done / output_item.done / completed fallback.
-
-    # For completed responses, check response.output for tool calls
-    if tool_use is None and chunk_type in {
-        "response.completed",
-        "response.failed",
-        "response.canceled",
-        "response.cancelled",
-    }:
-        response_obj = _get(chunk, "response")
-        if response_obj is not None:
-            output = _get(response_obj, "output")
-            if isinstance(output, list):
-                for item in output:
-                    item_type = _get(item, "type")
-                    if item_type in {"function_call", "tool_call"}:
-                        name = _get(item, "name") or _get(item, "function_name")
-                        arguments = _get(item, "arguments") or _get(item, "input") or _get(item, "input_json")
-                        if arguments is not None and not isinstance(arguments, str):
-                            try:
-                                arguments = str(arguments)
-                            except Exception as exc:
-                                raise ProxyError(
-                                    "Failed to convert Responses output tool_call arguments to string"
-                                ) from exc
-                        call_id = _get(item, "id") or _get(item, "call_id") or _get(item, "tool_call_id")
-                        if _RESPONSES_TOOL_ADOPTED is None or _RESPONSES_TOOL_ADOPTED == _get(item, "id"):
-                            final_args = arguments if isinstance(arguments, str) and arguments else "{}"
-                            fallback_state = {
-                                "item_id": _get(item, "id"),
-                                "name": name if isinstance(name, str) else None,
-                                "id": call_id if isinstance(call_id, str) else None,
-                                "args": final_args,
-                                "args_done": True,
-                                "emitted": False,
-                                "index": index,
-                                "raw_item": deepcopy(item),
-                            }
-                            _RESPONSES_TOOL_STATE[_get(item, "id")] = fallback_state
-                            tool_use = _maybe_emit_tool(_get(item, "id"), default_index=index)
-                        break
-
-    terminal_suffixes = (".completed", ".failed", ".cancelled", ".canceled")
-    is_finished = any(chunk_type.endswith(suffix) for suffix in terminal_suffixes)
-    if chunk_type in {"response.completed", "response.error", "response.canceled", "response.cancelled"}:
-        is_finished = True
-
-    if chunk_type == "response.error" and not finish_reason:
-        finish_reason = "error"
-    elif is_finished and not finish_reason:
-        finish_reason = "stop"
-
-    # Terminal cleanup: clear buffered tool state to avoid leaks across turns
-    if chunk_type in {
-        "response.completed",
-        "response.failed",
-        "response.canceled",
-        "response.cancelled",
-        "response.error",
-    }:
-        try:
-            _RESPONSES_TOOL_STATE.clear()
-        except Exception:
-            pass
-        _RESPONSES_TOOL_ADOPTED = None
-
-    provider_specific_fields: dict[str, Any] = {"responses_type": chunk_type}
-    for key in ("response_id", "output_index", "item_id", "id", "status"):
-        value = _get(chunk, key)
-        if value is not None:
-            provider_specific_fields[key] = deepcopy(value)
-    if isinstance(chunk_delta, dict):
-        provider_specific_fields["delta"] = deepcopy(chunk_delta)
-    if not provider_specific_fields:
-        provider_specific_fields = None
-
-    if not isinstance(text, str):
-        text = ""
-
-    return {  # TODO Wrap it into an actual GenericStreamingChunk object ?
-        "text": text,
-        "finish_reason": finish_reason,
-        "is_finished": is_finished,
-        "index": index,
-        "tool_use": tool_use,
-        "provider_specific_fields": provider_specific_fields,
-    }
-
+def convert_respapi_to_model_response(
+    respapi_response: ResponsesAPIResponse, *, parallel_tool_calls: bool = False
+) -> ModelResponse:
+    """
+    Best-effort convert a LiteLLM ResponsesAPIResponse into a ModelResponse.
 
-def convert_respapi_to_model_response(respapi_response: ResponsesAPIResponse) -> ModelResponse:
-    """Best-effort convert a LiteLLM ResponsesAPIResponse into a ModelResponse."""
+    Only the first function call of the response is kept (as `function_call`)
+    unless `parallel_tool_calls` is True - then all of them are converted to
+    `tool_calls`.
+    """
 
     if respapi_response is None:
         raise ValueError("respapi_response cannot be None")
@@ -1233,6 +1636,13 @@ def convert_respapi_to_model_response(respapi_response: ResponsesAPIResponse) ->
                 maybe_tool = _convert_responses_tool_call(item_dict)
                 if maybe_tool is not None:
                     tool_calls.append(maybe_tool)
+            elif item_type == "function_call" and parallel_tool_calls:
+                item_dict = (
+                    item if isinstance(item, dict) else {k: _get(item, k) for k in dir(item) if not k.startswith("_")}
+                )
+                maybe_tool = _convert_responses_tool_call(item_dict)
+                if maybe_tool is not None:
+                    tool_calls.append(maybe_tool)
             elif item_type == "function_call" and function_call is None:
                 # Convert to dict for _convert_responses_tool_call if needed
                 item_dict = (
@@ -0,0 +1,137 @@
+import asyncio
+import base64
+import json
+import os
+
+import httpx
+import pytest
+
+from common import credentials, refresh
+from common.credentials import _ENV_KEYS, CREDENTIALS, Credentials
+
+
+def _jwt(payload: dict) -> str:
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode(payload)}.signature"
+
+
+NEW_ACCESS_TOKEN = _jwt(
+    {"client_id": "client-id", "exp": 2_000_000_000, "https://api.openai.com/auth": {"chatgpt_account_id": "acct"}}
+)
+
+
+@pytest.fixture(autouse=True)
+def old_credentials(monkeypatch):
+    for env_key in _ENV_KEYS.values():
+        monkeypatch.setenv(env_key, "")
+    monkeypatch.setattr(CREDENTIALS, "current", Credentials(refresh_token="old-refresh", client_id="client-id"))
+    monkeypatch.setattr(CREDENTIALS, "_env_file_values", None)
+    monkeypatch.setattr(refresh.HTTP_CLIENT_POOL, "get_sync_handler", lambda name: None)
+    monkeypatch.setattr(refresh.HTTP_CLIENT_POOL, "get_async_handler", lambda name: None)
+
+
+def _token_endpoint(request: httpx.Request) -> httpx.Response:
+    assert json.loads(request.content)["refresh_token"] == "old-refresh"
+    return httpx.Response(200, json={"access_token": NEW_ACCESS_TOKEN, "refresh_token": "new-refresh"})
+
+
+def _assert_refreshed(result: dict[str, str]) -> None:
+    assert result["OPENAI_REFRESH_KEY_SUBSCRIPTION"] == "new-refresh"
+    assert CREDENTIALS.current.access_token == NEW_ACCESS_TOKEN
+    assert CREDENTIALS.current.refresh_token == "new-refresh"
+    assert os.environ["OPENAI_REFRESH_KEY_SUBSCRIPTION"] == "new-refresh"
+
+
+def test_refresh_without_env_file_keeps_new_credentials(monkeypatch, tmp_path):
+    # The old refresh token is spent once the endpoint answered, the new one
+    # must be kept even if there is no .env to write it to
+    transport = httpx.MockTransport(_token_endpoint)
+    monkeypatch.setattr(
+        refresh.httpx, "post", lambda url, **kwargs: httpx.Client(transport=transport).post(url, **kwargs)
+    )
+
+    _assert_refreshed(refresh.refresh_openai_token(tmp_path / ".env"))
+    assert not (tmp_path / ".env").exists()
+
+
+def test_refresh_writes_env_file(monkeypatch, tmp_path):
+    env_path = tmp_path / ".env"
+    env_path.write_text("# comment\nOPENAI_REFRESH_KEY_SUBSCRIPTION=old-refresh\nOTHER=1\n", encoding="utf-8")
+    transport = httpx.MockTransport(_token_endpoint)
+    monkeypatch.setattr(
+        refresh.httpx, "post", lambda url, **kwargs: httpx.Client(transport=transport).post(url, **kwargs)
+    )
+
+    _assert_refreshed(refresh.refresh_openai_token(env_path))
+    content = env_path.read_text(encoding="utf-8")
+    assert content.startswith("# comment\nOPENAI_REFRESH_KEY_SUBSCRIPTION=new-refresh\nOTHER=1\n")
+    assert f"OPENAI_API_KEY_SUBSCRIPTION={NEW_ACCESS_TOKEN}\n" in content
+
+
+def test_async_refresh_without_env_file_keeps_new_credentials(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        refresh,
+        "_async_client",
+        lambda handler: httpx.AsyncClient(transport=httpx.MockTransport(_token_endpoint)),
+    )
+
+    _assert_refreshed(asyncio.run(refresh.refresh_openai_token_async(tmp_path / ".env")))
+    assert not (tmp_path / ".env").exists()
+
+
+def test_failed_env_write_is_not_reverted_by_a_later_refresh(monkeypatch, tmp_path):
+    # The .env still holds the spent refresh token after the failed write - a
+    # later 401 must refresh with the new one instead of reloading the old one
+    env_path = tmp_path / ".env"
+    old = Credentials(access_token="old-access", refresh_token="old-refresh", client_id="client-id", expires_at=1)
+    env_path.write_text("".join(f"{key}={value}\n" for key, value in old.to_env_values().items()), encoding="utf-8")
+    monkeypatch.setattr(CREDENTIALS, "current", old)
+
+    sent_refresh_tokens = []
+
+    def token_endpoint(request: httpx.Request) -> httpx.Response:
+        sent_refresh_tokens.append(json.loads(request.content)["refresh_token"])
+        access_token = _jwt(
+            {
+                "client_id": "client-id",
+                "exp": 2_000_000_000 + len(sent_refresh_tokens),
+                "https://api.openai.com/auth": {"chatgpt_account_id": "acct"},
+            }
+        )
+        return httpx.Response(
+            200, json={"access_token": access_token, "refresh_token": f"new-refresh-{len(sent_refresh_tokens)}"}
+        )
+
+    transport = httpx.MockTransport(token_endpoint)
+    monkeypatch.setattr(
+        refresh.httpx, "post", lambda url, **kwargs: httpx.Client(transport=transport).post(url, **kwargs)
+    )
+
+    def failing_write(path, updates):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(credentials, "write_env_file", failing_write)
+
+    refresh.on_auth_error(env_path, failed_token="old-access")
+    first_access_token = CREDENTIALS.current.access_token
+    assert CREDENTIALS.current.refresh_token == "new-refresh-1"
+
+    # A proactive check doesn't revert to the file either
+    assert refresh.ensure_token_fresh(env_path) is None
+    assert not refresh.needs_refresh()
+
+    refresh.on_auth_error(env_path, failed_token=first_access_token)
+    assert sent_refresh_tokens == ["old-refresh", "new-refresh-1"]
+    assert CREDENTIALS.current.refresh_token == "new-refresh-2"
+    assert CREDENTIALS.current.access_token != first_access_token
+
+
+def test_reload_picks_up_credentials_written_by_another_process(tmp_path):
+    env_path = tmp_path / ".env"
+    env_path.write_text("OPENAI_REFRESH_KEY_SUBSCRIPTION=old-refresh\n", encoding="utf-8")
+    CREDENTIALS.reload_from_env_file(env_path)
+
+    env_path.write_text("OPENAI_REFRESH_KEY_SUBSCRIPTION=other-refresh\n", encoding="utf-8")
+    assert CREDENTIALS.reload_from_env_file(env_path).refresh_token == "other-refresh"